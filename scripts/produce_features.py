@@ -0,0 +1,25 @@
+import os
+import json
+import time
+import random
+from kafka import KafkaProducer
+
+BROKERS = os.getenv("KAFKA_BROKERS", "redpanda:9092")
+TOPIC = os.getenv("PUSH_TOPIC", "features")
+SYMBOLS = os.getenv("SYMBOLS", "BTC").split(",")
+RATE_HZ = float(os.getenv("RATE_HZ", "10"))
+
+p = KafkaProducer(bootstrap_servers=[
+                  BROKERS], value_serializer=lambda v: json.dumps(v).encode("utf-8"))
+print(f"[producer] sending feature vectors for {SYMBOLS} to {TOPIC} on {BROKERS}. CTRL+C to stop.")
+try:
+    while True:
+        for symbol in SYMBOLS:
+            msg = {"symbol": symbol, "ts_ns": time.time_ns(), "freshness_ms": 1000,
+                   "features": [round(random.gauss(0.0, 1.0), 4) for _ in range(8)]}
+            # keyed by symbol so each symbol's vectors stay ordered on one partition
+            p.send(TOPIC, msg, key=symbol.encode("utf-8"))
+        p.flush()
+        time.sleep(1.0 / RATE_HZ)
+except KeyboardInterrupt:
+    print("bye")
@@ -17,7 +17,8 @@ try:
         spread = 3.5 + random.random() * 4.0
         msg = {"symbol": "BTC", "spread_bps": round(
             spread, 3), "ts": int(time.time()*1000)}
-        p.send(TOPIC, msg)
+        # keyed by symbol so one ingest worker owns each symbol's ticks
+        p.send(TOPIC, msg, key=msg["symbol"].encode("utf-8"))
         p.flush()
         print(f"[producer] {msg}")
         time.sleep(1.0)
@@ -0,0 +1,360 @@
+"""Replay historical features through the model versions and guardrails, offline.
+
+    python scripts/replay.py --input features.parquet --out replay_out/
+    python scripts/replay.py --input ticks.jsonl --versions 1,2 --conf-thresh 0.7
+    python scripts/replay.py --input postgres --since 2024-06-01 --until 2024-06-02
+
+Inputs are streamed in chunks of ``--chunk-rows``:
+- parquet files or directories (pyarrow dataset), e.g. an export of the
+  ``features`` topic or the Feast source ``feast_repo/data/microstructure.parquet``
+  joined with feature vectors
+- JSON lines of feature vectors (``/v1/score`` bodies) or of exported
+  Kafka records whose ``value`` is such a body (``rpk topic consume``)
+- ``postgres``: rows of ``audit.decisions`` that reached the guardrails. These
+  carry no feature vectors, so the recorded confidence and spread are re-run
+  through the guardrails. A row without a recorded spread counts as
+  ``stale_features`` only if it clears the confidence bar and its reason
+  did not already settle the spread check.
+
+Rows need ``symbol``, a timestamp (``ts_ns``, ``ts`` in ms or ``event_timestamp``)
+and features (a ``features`` list column or ``--feature-cols``). Without a
+``spread_bps`` column, spreads are joined point-in-time from ``--spreads``
+(default: the Feast parquet source). A row's spread is the latest one at
+or before its timestamp, no older than ``--spread-ttl-sec``. Rows without
+a spread abstain with ``stale_features``, like the API does.
+
+Each chunk is scored with onnxruntime for every version and decided with
+``guardrails.decide_batch``. The aggregates are written to ``--out``:
+``decision_counts.parquet`` (version, symbol, decision, reason, rows),
+``prob_hist.parquet`` and ``disagreement.parquet`` (decision confusion and
+mean |Δprob| of each version against the first).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "services" / "api"))
+
+from app.guardrails import CONF_THRESH, DECISIONS, REASONS, SPREAD_MAX_BPS, decide_batch
+
+MODEL_REPOSITORY = ROOT / "services" / "inference" / "model_repository"
+FEAST_SOURCE = ROOT / "feast_repo" / "data" / "microstructure.parquet"
+# replay-only outcome on top of guardrails' codes
+STALE = len(REASONS)
+OUTCOMES = [(d, r) for d, r in zip(DECISIONS, REASONS)] + [("ABSTAIN", "stale_features")]
+HIST_BINS = np.linspace(0.0, 1.0, 21)
+
+
+# ---------- sources ----------
+
+def read_parquet(path: str, chunk_rows: int, columns: Optional[List[str]] = None) -> Iterator[pa.RecordBatch]:
+    dataset = ds.dataset(path, format="parquet")
+    cols = [c for c in columns if c in dataset.schema.names] if columns else None
+    yield from dataset.to_batches(columns=cols, batch_size=chunk_rows)
+
+
+def read_jsonl(path: str, chunk_rows: int) -> Iterator[pa.RecordBatch]:
+    import orjson
+
+    def flush(rows):
+        return pa.RecordBatch.from_pylist(rows)
+
+    rows = []
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = orjson.loads(line)
+            if isinstance(rec.get("value"), str):  # exported Kafka record
+                rec = orjson.loads(rec["value"])
+            rows.append({"symbol": rec["symbol"], "ts_ns": int(rec["ts_ns"]), "features": rec["features"],
+                         **({"spread_bps": rec["spread_bps"]} if "spread_bps" in rec else {})})
+            if len(rows) >= chunk_rows:
+                yield flush(rows)
+                rows = []
+    if rows:
+        yield flush(rows)
+
+
+def read_audit(since: Optional[str], until: Optional[str], chunk_rows: int) -> Iterator[pa.RecordBatch]:
+    import psycopg
+    dsn = (f"host={os.getenv('POSTGRES_HOST', 'postgres')} port={os.getenv('POSTGRES_PORT', '5432')} "
+           f"dbname={os.getenv('POSTGRES_DB', 'te_audit')} user={os.getenv('POSTGRES_USER', 'teuser')} "
+           f"password={os.getenv('POSTGRES_PASSWORD', 'tepass')}")
+    # Only guardrail outcomes carry a model confidence; every other abstain (stale, ood,
+    # deadline, breaker, shed, ...) never reached the policy. Rows written before
+    # spread_bps was recorded keep their recorded spread outcome: wide_spread stays wide
+    # and ok stays narrow under any --spread-max, and low_conf rows have no known spread.
+    sql = ("SELECT ts, symbol, confidence, coalesce(spread_bps, CASE split_part(reason, '(', 1) "
+           "WHEN 'wide_spread' THEN 'Infinity'::float8 WHEN 'ok' THEN 0 END) FROM audit.decisions "
+           "WHERE ts >= coalesce(%s::timestamptz, '-infinity') AND ts < coalesce(%s::timestamptz, 'infinity') "
+           "AND split_part(reason, '(', 1) = ANY(%s) ORDER BY ts")
+    with psycopg.connect(dsn) as conn:
+        with conn.cursor(name="replay") as cur:  # server-side cursor: streams instead of buffering
+            cur.itersize = chunk_rows
+            cur.execute(sql, (since, until, list(REASONS)))
+            while rows := cur.fetchmany(chunk_rows):
+                ts, symbol, conf, spread = zip(*rows)
+                yield pa.RecordBatch.from_pydict({
+                    "event_timestamp": pa.array(ts, pa.timestamp("us", tz="UTC")),
+                    "symbol": list(symbol),
+                    "confidence": pa.array(conf, pa.float64()),
+                    "spread_bps": pa.array(spread, pa.float64()),
+                })
+
+
+# ---------- columns ----------
+
+def ts_ns(batch: pa.RecordBatch) -> np.ndarray:
+    names = batch.schema.names
+    if "ts_ns" in names:
+        return batch.column("ts_ns").to_numpy(zero_copy_only=False).astype(np.int64)
+    if "ts" in names:
+        return batch.column("ts").to_numpy(zero_copy_only=False).astype(np.int64) * 1_000_000
+    col = batch.column("event_timestamp").cast(pa.timestamp("ns", tz="UTC"))
+    return col.cast(pa.int64()).to_numpy(zero_copy_only=False)
+
+
+def feature_matrix(batch: pa.RecordBatch, feature_cols: Optional[List[str]]) -> Optional[np.ndarray]:
+    if feature_cols:
+        return np.column_stack([batch.column(c).to_numpy(zero_copy_only=False) for c in feature_cols]
+                               ).astype(np.float32, copy=False)
+    if "features" not in batch.schema.names:
+        return None
+    col = batch.column("features")
+    widths = pc.list_value_length(col).to_numpy(zero_copy_only=False)
+    if widths.size and (widths != widths[0]).any():
+        raise SystemExit("replay: rows in one chunk have different feature widths")
+    flat = pc.list_flatten(col).to_numpy(zero_copy_only=False).astype(np.float32, copy=False)
+    return flat.reshape(len(batch), int(widths[0]) if widths.size else 0)
+
+
+class SpreadIndex:
+    """Point-in-time spread lookup: per symbol, sorted event times and their spreads."""
+
+    def __init__(self, path: Path, ttl_sec: float):
+        table = pq.read_table(path, columns=["symbol", "event_timestamp", "spread_bps"])
+        ts = table.column("event_timestamp").cast(pa.timestamp("ns", tz="UTC")).cast(pa.int64()).to_numpy()
+        sym = table.column("symbol").to_numpy(zero_copy_only=False)
+        val = table.column("spread_bps").to_numpy(zero_copy_only=False).astype(np.float64)
+        order = np.lexsort((ts, sym))
+        ts, sym, val = ts[order], sym[order], val[order]
+        self.ttl_ns = int(ttl_sec * 1e9)
+        self.series: Dict[str, tuple] = {}
+        bounds = np.flatnonzero(sym[1:] != sym[:-1]) + 1
+        for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(sym)]):
+            if hi > lo:
+                self.series[sym[lo]] = (ts[lo:hi], val[lo:hi])
+
+    def lookup(self, symbols: np.ndarray, at_ns: np.ndarray) -> np.ndarray:
+        out = np.full(len(symbols), np.nan)
+        for s in np.unique(symbols):
+            series = self.series.get(s)
+            if series is None:
+                continue
+            rows = np.flatnonzero(symbols == s)
+            ts, val = series
+            i = np.searchsorted(ts, at_ns[rows], side="right") - 1
+            ok = (i >= 0) & (at_ns[rows] - ts[np.maximum(i, 0)] <= self.ttl_ns)
+            out[rows[ok]] = val[i[ok]]
+        return out
+
+
+# ---------- scoring ----------
+
+def load_models(repo: Path, model: str, versions: Optional[List[str]], threads: int):
+    import onnxruntime as ort
+    root = repo / model
+    if not versions:
+        versions = sorted((p.name for p in root.iterdir() if p.name.isdigit() and (p / "model.onnx").exists()), key=int)
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = threads
+    so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    models = {}
+    for v in versions:
+        sess = ort.InferenceSession(str(root / v / "model.onnx"), sess_options=so, providers=["CPUExecutionProvider"])
+        models[v] = (sess, sess.get_inputs()[0].name)
+    return models
+
+
+class Stats:
+    def __init__(self, versions: List[str]):
+        self.versions = versions
+        self.symbols: Dict[str, int] = {}
+        n = len(OUTCOMES)
+        self.counts = {v: np.zeros((0, n), dtype=np.int64) for v in versions}
+        self.hist = {v: np.zeros(len(HIST_BINS) - 1, dtype=np.int64) for v in versions}
+        self.confusion = {v: np.zeros((n, n), dtype=np.int64) for v in versions[1:]}
+        self.abs_delta = {v: np.zeros((n, n)) for v in versions[1:]}
+        self.rows = 0
+
+    def symbol_ids(self, symbols: np.ndarray) -> np.ndarray:
+        uniq, inv = np.unique(symbols, return_inverse=True)
+        ids = np.array([self.symbols.setdefault(s, len(self.symbols)) for s in uniq], dtype=np.int64)
+        grow = len(self.symbols) - next(iter(self.counts.values())).shape[0]
+        if grow > 0:
+            for v in self.versions:
+                self.counts[v] = np.vstack([self.counts[v], np.zeros((grow, len(OUTCOMES)), dtype=np.int64)])
+        return ids[inv]
+
+    def add(self, sym_ids: np.ndarray, outcome: Dict[str, np.ndarray], probs: Dict[str, np.ndarray]):
+        n = len(OUTCOMES)
+        self.rows += len(sym_ids)
+        for v in self.versions:
+            flat = np.bincount(sym_ids * n + outcome[v], minlength=self.counts[v].size)
+            self.counts[v] += flat.reshape(self.counts[v].shape)
+            self.hist[v] += np.histogram(probs[v], bins=HIST_BINS)[0]
+        base = self.versions[0]
+        for v in self.versions[1:]:
+            cell = outcome[base].astype(np.int64) * n + outcome[v]
+            self.confusion[v] += np.bincount(cell, minlength=n * n).reshape(n, n)
+            self.abs_delta[v] += np.bincount(cell, weights=np.abs(probs[v] - probs[base]),
+                                             minlength=n * n).reshape(n, n)
+
+    def write(self, out: Path):
+        out.mkdir(parents=True, exist_ok=True)
+        names = np.array(sorted(self.symbols, key=self.symbols.get), dtype=object)
+        cols = {k: [] for k in ("version", "symbol", "decision", "reason", "rows")}
+        for v in self.versions:
+            s, o = np.nonzero(self.counts[v])
+            cols["version"] += [v] * len(s)
+            cols["symbol"] += names[s].tolist()
+            cols["decision"] += [OUTCOMES[k][0] for k in o]
+            cols["reason"] += [OUTCOMES[k][1] for k in o]
+            cols["rows"] += self.counts[v][s, o].tolist()
+        pq.write_table(pa.table(cols), out / "decision_counts.parquet")
+        pq.write_table(pa.table({
+            "version": [v for v in self.versions for _ in self.hist[v]],
+            "bin_lo": np.tile(HIST_BINS[:-1], len(self.versions)),
+            "bin_hi": np.tile(HIST_BINS[1:], len(self.versions)),
+            "rows": np.concatenate([self.hist[v] for v in self.versions]),
+        }), out / "prob_hist.parquet")
+        cols = {k: [] for k in ("base_version", "version", "base_decision", "base_reason", "decision", "reason",
+                                "rows", "mean_abs_delta")}
+        for v in self.versions[1:]:
+            for a, b in zip(*np.nonzero(self.confusion[v])):
+                rows = int(self.confusion[v][a, b])
+                cols["base_version"].append(self.versions[0])
+                cols["version"].append(v)
+                cols["base_decision"].append(OUTCOMES[a][0])
+                cols["base_reason"].append(OUTCOMES[a][1])
+                cols["decision"].append(OUTCOMES[b][0])
+                cols["reason"].append(OUTCOMES[b][1])
+                cols["rows"].append(rows)
+                cols["mean_abs_delta"].append(float(self.abs_delta[v][a, b] / rows))
+        pq.write_table(pa.table(cols, schema=pa.schema([
+            ("base_version", pa.string()), ("version", pa.string()), ("base_decision", pa.string()),
+            ("base_reason", pa.string()), ("decision", pa.string()), ("reason", pa.string()),
+            ("rows", pa.int64()), ("mean_abs_delta", pa.float64())])), out / "disagreement.parquet")
+
+    def summary(self) -> dict:
+        out = {"rows": self.rows, "symbols": len(self.symbols), "versions": {}}
+        for v in self.versions:
+            totals = self.counts[v].sum(axis=0)
+            out["versions"][v] = {f"{d}:{r}": int(c) for (d, r), c in zip(OUTCOMES, totals) if c}
+        for v in self.versions[1:]:
+            conf = self.confusion[v]
+            out["versions"][v]["disagreement_rate"] = float(1 - np.trace(conf) / max(1, conf.sum()))
+        return out
+
+
+def batches(args) -> Iterator[pa.RecordBatch]:
+    for src in args.input:
+        if src == "postgres":
+            yield from read_audit(args.since, args.until, args.chunk_rows)
+        elif src.endswith((".jsonl", ".json", ".ndjson")):
+            yield from read_jsonl(src, args.chunk_rows)
+        else:
+            yield from read_parquet(src, args.chunk_rows)
+
+
+def replay(args) -> dict:
+    models = None
+    spreads = None
+    stats = None
+    t0 = time.perf_counter()
+    for batch in batches(args):
+        if not len(batch):
+            continue
+        x = feature_matrix(batch, args.feature_cols)
+        if models is None:
+            if x is not None:
+                models = load_models(Path(args.model_repository), args.model, args.versions, args.threads)
+            elif "confidence" in batch.schema.names:
+                models = {"recorded": None}
+            else:
+                raise SystemExit("replay: input has neither features nor a confidence column")
+            stats = Stats(list(models))
+        symbols = batch.column("symbol").to_numpy(zero_copy_only=False)
+        if "spread_bps" in batch.schema.names:
+            spread = batch.column("spread_bps").to_numpy(zero_copy_only=False).astype(np.float64)
+        else:
+            if spreads is None:
+                spreads = SpreadIndex(Path(args.spreads), args.spread_ttl_sec)
+            spread = spreads.lookup(symbols, ts_ns(batch))
+        stale = np.isnan(spread)
+        outcome, probs = {}, {}
+        for v, model in models.items():
+            if model is None:
+                p = batch.column("confidence").to_numpy(zero_copy_only=False).astype(np.float32)
+            else:
+                sess, input_name = model
+                p = sess.run(None, {input_name: x})[0][:, 1]
+            codes = decide_batch(spread, p, args.conf_thresh, args.spread_max)
+            if model is None:
+                # audit rows did get a spread lookup; without a recorded spread only
+                # rows that now clear the confidence bar are undecidable
+                codes[stale & (codes != REASONS.index("low_conf"))] = STALE
+            else:
+                codes[stale] = STALE
+            outcome[v], probs[v] = codes, p
+        stats.add(stats.symbol_ids(symbols), outcome, probs)
+    if stats is None:
+        raise SystemExit("replay: no rows read")
+    stats.write(Path(args.out))
+    elapsed = time.perf_counter() - t0
+    summary = stats.summary()
+    summary["seconds"] = round(elapsed, 3)
+    summary["rows_per_sec"] = round(stats.rows / elapsed) if elapsed else None
+    summary["policy"] = {"conf_thresh": args.conf_thresh, "spread_max_bps": args.spread_max}
+    return summary
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--input", action="append", required=True,
+                   help="parquet file/dir, .jsonl export, or 'postgres' (repeatable)")
+    p.add_argument("--out", default="replay_out")
+    p.add_argument("--chunk-rows", type=int, default=262_144)
+    p.add_argument("--feature-cols", type=lambda s: s.split(","), help="scalar feature columns, in model order")
+    p.add_argument("--spreads", default=str(FEAST_SOURCE), help="parquet with symbol, event_timestamp, spread_bps")
+    p.add_argument("--spread-ttl-sec", type=float, default=120.0, help="max spread age (Feast view TTL)")
+    p.add_argument("--model-repository", default=str(MODEL_REPOSITORY))
+    p.add_argument("--model", default="trade_eligibility")
+    p.add_argument("--versions", type=lambda s: s.split(","), help="default: every version in the repository")
+    p.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="onnxruntime intra-op threads")
+    p.add_argument("--conf-thresh", type=float, default=CONF_THRESH)
+    p.add_argument("--spread-max", type=float, default=SPREAD_MAX_BPS)
+    p.add_argument("--since", help="postgres source: lower ts bound (inclusive)")
+    p.add_argument("--until", help="postgres source: upper ts bound (exclusive)")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    summary = replay(parse_args(argv))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
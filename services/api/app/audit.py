@@ -0,0 +1,183 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional
+from prometheus_client import Counter, Gauge, Histogram
+from . import db
+from .db import write_decisions
+
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+AUDIT_BATCH_MAX = int(os.getenv("AUDIT_BATCH_MAX", "500"))
+AUDIT_FLUSH_MS = int(os.getenv("AUDIT_FLUSH_MS", "50"))
+AUDIT_DRAIN_TIMEOUT_SEC = float(os.getenv("AUDIT_DRAIN_TIMEOUT_SEC", "5"))
+# Daily partitions of audit.decisions: created ahead, dropped after the retention window
+AUDIT_PARTITION_DAYS_AHEAD = int(os.getenv("AUDIT_PARTITION_DAYS_AHEAD", "3"))
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "30"))
+AUDIT_ROLLUP_RETENTION_DAYS = int(os.getenv("AUDIT_ROLLUP_RETENTION_DAYS", "400"))
+AUDIT_MAINTENANCE_SEC = float(os.getenv("AUDIT_MAINTENANCE_SEC", "3600"))
+# Rows moved per transaction from a pre-partitioning audit.decisions_legacy
+AUDIT_MIGRATE_BATCH = int(os.getenv("AUDIT_MIGRATE_BATCH", "50000"))
+AUDIT_MIGRATE_PAUSE_SEC = float(os.getenv("AUDIT_MIGRATE_PAUSE_SEC", "0.5"))
+
+log = logging.getLogger("api.audit")
+
+AUDIT_QUEUED = Gauge("audit_queue_depth", "Audit rows waiting to be flushed", multiprocess_mode="livesum")
+AUDIT_WRITTEN = Counter("audit_rows_written_total", "Audit rows written to Postgres")
+AUDIT_DROPPED = Counter("audit_rows_dropped_total", "Audit rows dropped before reaching Postgres", ["reason"])
+AUDIT_BATCH = Histogram("audit_batch_rows", "Rows per audit flush",
+                        buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000))
+AUDIT_MIGRATED = Counter("audit_legacy_rows_migrated_total", "Legacy audit rows moved into the partitioned table")
+AUDIT_MAINTENANCE_FAILURES = Counter("audit_maintenance_failures_total", "Failed audit maintenance passes")
+AUDIT_FLUSH = Histogram("audit_flush_latency_ms", "Audit flush latency (ms)",
+                        buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144))
+
+
+class AuditWriter:
+    """Write-behind sink for audit.decisions.
+
+    Handlers call ``submit`` which never blocks; a background task drains the
+    queue and flushes with COPY once ``batch_max`` rows are pending or
+    ``flush_ms`` has elapsed since the first pending row.
+    """
+
+    def __init__(self, maxsize: int = AUDIT_QUEUE_MAX, batch_max: int = AUDIT_BATCH_MAX, flush_ms: int = AUDIT_FLUSH_MS):
+        self.maxsize = maxsize
+        self.batch_max = batch_max
+        self.flush_s = flush_ms / 1000.0
+        self._q: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._closing = False
+        self._q = asyncio.Queue(maxsize=self.maxsize)
+        self._task = asyncio.create_task(self._run(), name="audit-writer")
+
+    def submit(self, row: dict) -> bool:
+        if self._q is None or self._closing:
+            AUDIT_DROPPED.labels("not_running").inc()
+            return False
+        # stamp at decision time; the flush may land a few ms later
+        row.setdefault("ts", datetime.now(timezone.utc))
+        try:
+            self._q.put_nowait(row)
+        except asyncio.QueueFull:
+            AUDIT_DROPPED.labels("overflow").inc()
+            return False
+        AUDIT_QUEUED.set(self._q.qsize())
+        return True
+
+    def submit_many(self, rows: List[dict]) -> int:
+        return sum(1 for row in rows if self.submit(row))
+
+    async def _collect(self, loop) -> List[dict]:
+        batch = [await asyncio.wait_for(self._q.get(), self.flush_s)]
+        deadline = loop.time() + self.flush_s
+        while len(batch) < self.batch_max:
+            try:
+                batch.append(self._q.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                if self._closing:
+                    break
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._q.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not (self._closing and self._q.empty()):
+            try:
+                batch = await self._collect(loop)
+            except asyncio.TimeoutError:
+                continue
+            AUDIT_QUEUED.set(self._q.qsize())
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[dict]):
+        t0 = time.perf_counter()
+        try:
+            await asyncio.to_thread(write_decisions, batch)
+        except Exception:
+            AUDIT_DROPPED.labels("db_error").inc(len(batch))
+            log.exception("audit_flush_failed rows=%d", len(batch))
+            return
+        AUDIT_FLUSH.observe((time.perf_counter() - t0) * 1000)
+        AUDIT_BATCH.observe(len(batch))
+        AUDIT_WRITTEN.inc(len(batch))
+
+    async def stop(self, timeout: float = AUDIT_DRAIN_TIMEOUT_SEC):
+        if self._task is None:
+            return
+        self._closing = True
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            left = self._q.qsize()
+            if left:
+                AUDIT_DROPPED.labels("shutdown").inc(left)
+            log.warning("audit_drain_timeout dropped=%d", left)
+        finally:
+            self._task = None
+            AUDIT_QUEUED.set(0)
+
+
+class AuditMaintenance:
+    """Periodic partition upkeep for audit.decisions.
+
+    Every ``interval_sec`` it creates the coming days' partitions, drops
+    partitions and rollups past retention, then moves any legacy rows over in
+    ``migrate_batch`` sized transactions. Every worker runs it; Postgres
+    advisory locks let only one do the work at a time. A non-positive
+    interval disables it.
+    """
+
+    def __init__(self, interval_sec: float = AUDIT_MAINTENANCE_SEC, migrate_batch: int = AUDIT_MIGRATE_BATCH):
+        self.interval_sec = interval_sec
+        self.migrate_batch = migrate_batch
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and self.interval_sec > 0:
+            self._task = asyncio.create_task(self._run(), name="audit-maintenance")
+
+    async def run_once(self):
+        await asyncio.to_thread(db.maintain_audit, AUDIT_PARTITION_DAYS_AHEAD, AUDIT_RETENTION_DAYS,
+                                AUDIT_ROLLUP_RETENTION_DAYS)
+        while True:
+            moved = await asyncio.to_thread(db.migrate_legacy, self.migrate_batch)
+            if moved <= 0:
+                break
+            AUDIT_MIGRATED.inc(moved)
+            log.info("audit_legacy_migrated rows=%d", moved)
+            await asyncio.sleep(AUDIT_MIGRATE_PAUSE_SEC)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                AUDIT_MAINTENANCE_FAILURES.inc()
+                log.exception("audit_maintenance_failed")
+            await asyncio.sleep(self.interval_sec)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+writer = AuditWriter()
+maintenance = AuditMaintenance()
@@ -0,0 +1,90 @@
+import os
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Sequence, Tuple
+from prometheus_client import Gauge, Histogram
+from .inference import MODEL_VERSION, TRITON_MAX_BATCH
+from . import tracing
+
+# 0 disables coalescing: every call goes straight to the backend
+MICROBATCH_WINDOW_US = int(os.getenv("MICROBATCH_WINDOW_US", "300"))
+MICROBATCH_MAX = min(int(os.getenv("MICROBATCH_MAX", str(TRITON_MAX_BATCH))), TRITON_MAX_BATCH)
+
+MB_QUEUE = Gauge("microbatch_queue_depth", "Rows waiting to be coalesced into an infer call",
+                 multiprocess_mode="livesum")
+MB_SIZE = Histogram("microbatch_size", "Rows per coalesced infer call",
+                    buckets=(1, 2, 4, 8, 16, 24, 32))
+MB_WAIT = Histogram("microbatch_wait_ms", "Time a row waits for its batch to be dispatched (ms)",
+                    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 2, 5))
+
+InferFn = Callable[[Sequence[Sequence[float]], str], Awaitable[List[float]]]
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row infer calls into one batched call.
+
+    Rows are bucketed by (model version, width). A bucket is dispatched when
+    it reaches ``max_batch`` rows or ``window_us`` after its first row
+    arrived, whichever comes first; each caller gets its own row back.
+    """
+
+    def __init__(self, infer_fn: InferFn, window_us: int = MICROBATCH_WINDOW_US, max_batch: int = MICROBATCH_MAX):
+        self.infer_fn = infer_fn
+        self.window_s = window_us / 1_000_000
+        self.max_batch = max(1, max_batch)
+        self._pending: Dict[Tuple[str, int], list] = {}
+        self._timers: Dict[Tuple[str, int], asyncio.TimerHandle] = {}
+        self._inflight = set()
+        self._depth = 0
+
+    @property
+    def depth(self) -> int:
+        return self._depth
+
+    async def submit(self, row: Sequence[float], version: str = MODEL_VERSION) -> float:
+        if self.window_s <= 0 or self.max_batch == 1:
+            return (await self.infer_fn([row], version))[0]
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        key = (version, len(row))
+        bucket = self._pending.setdefault(key, [])
+        bucket.append((row, fut, time.perf_counter(), tracing.current_context()))
+        self._depth += 1
+        MB_QUEUE.set(self._depth)
+        if len(bucket) >= self.max_batch:
+            self._dispatch(key)
+        elif len(bucket) == 1:
+            self._timers[key] = loop.call_later(self.window_s, self._dispatch, key)
+        return await fut
+
+    def _dispatch(self, key: Tuple[str, int]):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        bucket = self._pending.pop(key, None)
+        if not bucket:
+            return
+        self._depth -= len(bucket)
+        MB_QUEUE.set(self._depth)
+        task = asyncio.get_running_loop().create_task(self._run(key[0], bucket))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, version: str, bucket: list):
+        now = time.perf_counter()
+        for _, _, t_enq, _ in bucket:
+            MB_WAIT.observe((now - t_enq) * 1000)
+        MB_SIZE.observe(len(bucket))
+        try:
+            # One span per coalesced call, linked to each sampled request it carries
+            with tracing.linked_span("microbatch", [ctx for _, _, _, ctx in bucket],
+                                     **{"model.version": version, "batch.size": len(bucket)}):
+                probs = await self.infer_fn([row for row, _, _, _ in bucket], version)
+        except Exception as e:
+            for _, fut, _, _ in bucket:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut, _, _), prob in zip(bucket, probs):
+            if not fut.done():
+                fut.set_result(prob)
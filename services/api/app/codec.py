@@ -0,0 +1,110 @@
+import json
+import email.message
+from typing import Any, Optional, Tuple, Union
+import msgspec
+import orjson
+from pydantic import ValidationError
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse, Response
+from .schemas import FeatureVector, FeatureVectorStruct, ScoreFrame
+
+MSGPACK = "application/msgpack"
+
+_json = msgspec.json.Decoder(FeatureVectorStruct)
+_msgpack = msgspec.msgpack.Decoder(FeatureVectorStruct)
+_msgpack_enc = msgspec.msgpack.Encoder()
+_json_frame = msgspec.json.Decoder(ScoreFrame)
+_msgpack_frame = msgspec.msgpack.Decoder(ScoreFrame)
+
+Payload = Union[FeatureVectorStruct, FeatureVector]
+
+
+def wants_msgpack(content_type: str, accept: str) -> bool:
+    return content_type.startswith(MSGPACK) or MSGPACK in accept
+
+
+def decode_score(body: bytes, content_type: str) -> Tuple[Payload, bool]:
+    """Decode a /v1/score body; returns (payload, is_msgpack).
+
+    JSON goes through the compiled msgspec decoder. On any rejection the
+    body is re-validated the way FastAPI would with FeatureVector, so
+    accepted inputs and 422 bodies are unchanged from the Pydantic route.
+    """
+    if content_type.startswith(MSGPACK):
+        try:
+            return _msgpack.decode(body), True
+        except (msgspec.ValidationError, msgspec.DecodeError) as e:
+            raise RequestValidationError([{"type": "value_error", "loc": ("body",), "msg": str(e),
+                                           "input": None}]) from e
+    if body and (not content_type or content_type.startswith("application/json")):
+        try:
+            return _json.decode(body), False
+        except (msgspec.ValidationError, msgspec.DecodeError):
+            pass
+    return _validate_like_fastapi(body, content_type), False
+
+
+def _validate_like_fastapi(body: bytes, content_type: str) -> FeatureVector:
+    if not body:
+        raise RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required",
+                                       "input": None}])
+    obj: Any = body
+    message = email.message.Message()
+    message["content-type"] = content_type
+    subtype = message.get_content_subtype()
+    if not content_type or (message.get_content_maintype() == "application"
+                            and (subtype == "json" or subtype.endswith("+json"))):
+        try:
+            obj = json.loads(body)
+        except json.JSONDecodeError as e:
+            raise RequestValidationError([{"type": "json_invalid", "loc": ("body", e.pos),
+                                           "msg": "JSON decode error", "input": {},
+                                           "ctx": {"error": e.msg}}], body=e.doc) from e
+        if obj is None:
+            raise RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required",
+                                           "input": None}])
+    try:
+        return FeatureVector.model_validate(obj, from_attributes=True)
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])}
+                                      for err in e.errors(include_url=False)], body=obj) from e
+
+
+def respond(content: dict, msgpack: bool) -> Response:
+    if msgpack:
+        return Response(_msgpack_enc.encode(content), media_type=MSGPACK)
+    return ORJSONResponse(content)
+
+
+class FrameError(ValueError):
+    def __init__(self, frame_id, detail):
+        super().__init__(frame_id, detail)
+        self.id = frame_id
+        self.detail = detail
+
+
+def decode_frame(data: Union[str, bytes], binary: bool) -> Tuple[Optional[Union[str, int]], Payload]:
+    """Decode one stream frame (JSON text or msgpack binary); returns (id, payload).
+
+    Like decode_score, rejected frames are re-validated with FeatureVector so
+    the accepted set matches /v1/score. Invalid frames raise FrameError.
+    """
+    try:
+        frame = _msgpack_frame.decode(data) if binary else _json_frame.decode(data)
+        return frame.id, frame
+    except (msgspec.ValidationError, msgspec.DecodeError):
+        pass
+    try:
+        obj = msgspec.msgpack.decode(data) if binary else json.loads(data)
+    except (msgspec.DecodeError, json.JSONDecodeError) as e:
+        raise FrameError(None, [{"type": "json_invalid" if not binary else "msgpack_invalid",
+                                 "loc": [], "msg": str(e)}]) from e
+    frame_id = obj.get("id") if isinstance(obj, dict) else None
+    try:
+        return frame_id, FeatureVector.model_validate(obj, from_attributes=True)
+    except ValidationError as e:
+        raise FrameError(frame_id, json.loads(e.json(include_url=False))) from e
+
+
+def encode_frame(content: dict, binary: bool) -> Union[str, bytes]:
+    return _msgpack_enc.encode(content) if binary else orjson.dumps(content).decode()
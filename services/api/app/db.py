@@ -1,5 +1,8 @@
 import os
+import threading
 from pathlib import Path
+from datetime import datetime, timezone
+from typing import List, Optional
 import psycopg
 from psycopg_pool import ConnectionPool
 
@@ -10,7 +13,34 @@ POSTGRES_HOST = os.getenv("POSTGRES_HOST", "postgres")
 POSTGRES_PORT = int(os.getenv("POSTGRES_PORT", "5432"))
 
 DSN = f"host={POSTGRES_HOST} port={POSTGRES_PORT} dbname={POSTGRES_DB} user={POSTGRES_USER} password={POSTGRES_PASSWORD}"
-pool = ConnectionPool(DSN, min_size=1, max_size=4, timeout=10)
+# Per worker process
+POSTGRES_POOL_MIN = int(os.getenv("POSTGRES_POOL_MIN", "1"))
+POSTGRES_POOL_MAX = int(os.getenv("POSTGRES_POOL_MAX", "4"))
+# Serializes ensure_schema across API workers starting together
+SCHEMA_LOCK_ID = 0x7465_6175
+
+_pool: Optional[ConnectionPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """This process's pool, opened on first use so forked workers never share connections."""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool(DSN, min_size=POSTGRES_POOL_MIN, max_size=POSTGRES_POOL_MAX, timeout=10, open=True)
+            _pool_pid = os.getpid()
+        return _pool
+
+def warm(timeout: float = 10.0):
+    """Block until the pool holds ``POSTGRES_POOL_MIN`` connections."""
+    get_pool().wait(timeout)
+
+def close():
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.close()
+    _pool = None
 
 SCHEMA_SQL_PATH = Path(os.getenv("SCHEMA_SQL_PATH", str(Path(__file__).resolve().parents[3] / "sql" / "create_audit_schema.sql")))
 
@@ -19,20 +49,81 @@ def ensure_schema():
         print(f"[warn] schema file not found: {SCHEMA_SQL_PATH}")
         return
     ddl = SCHEMA_SQL_PATH.read_text(encoding="utf-8")
-    with pool.connection() as conn:
+    with get_pool().connection() as conn:
         with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
             cur.execute(ddl)
         conn.commit()
 
-def write_decision(row: dict):
-    with pool.connection() as conn:
+AUDIT_COLUMNS = ("ts", "corr_id", "symbol", "decision", "confidence", "latency_ms", "reason",
+                 "model_tag", "feature_ms", "inference_ms", "policy_ms", "feature_source", "spread_bps")
+COPY_SQL = f"COPY audit.decisions ({', '.join(AUDIT_COLUMNS)}) FROM STDIN"
+
+def write_decisions(rows: List[dict]):
+    if not rows:
+        return
+    now = datetime.now(timezone.utc)
+    with get_pool().connection() as conn:
         with conn.cursor() as cur:
-            cur.execute(
-                '''
-                INSERT INTO audit.decisions
-                (corr_id, symbol, decision, confidence, latency_ms, reason, model_tag, feature_ms, inference_ms, policy_ms)
-                VALUES (%(corr_id)s, %(symbol)s, %(decision)s, %(confidence)s, %(latency_ms)s, %(reason)s, %(model_tag)s, %(feature_ms)s, %(inference_ms)s, %(policy_ms)s)
-                ''',
-                row,
-            )
+            with cur.copy(COPY_SQL) as copy:
+                for row in rows:
+                    copy.write_row((row.get("ts") or now,) + tuple(row.get(c) for c in AUDIT_COLUMNS[1:]))
+        conn.commit()
+
+def maintain_audit(days_ahead: int, keep_days: int, rollup_keep_days: int) -> bool:
+    """Create upcoming partitions and apply retention; False if another worker is doing it."""
+    with get_pool().connection() as conn:
+        ran = conn.execute("SELECT audit.maintain(%s, %s, %s)", (days_ahead, keep_days, rollup_keep_days)).fetchone()[0]
+        conn.commit()
+    return ran
+
+def migrate_legacy(batch_rows: int) -> int:
+    """Move one batch of pre-partitioning rows; 0 when none are left, -1 if another worker holds the lock."""
+    with get_pool().connection() as conn:
+        moved = conn.execute("SELECT audit.migrate_legacy(%s)", (batch_rows,)).fetchone()[0]
+        conn.commit()
+    return moved
+
+STATS_DECISIONS_SQL = '''
+SELECT model_tag, decision, reason, sum(n)::bigint
+FROM audit.decision_minute
+WHERE minute >= date_trunc('minute', %(since)s::timestamptz) AND minute < %(until)s
+  AND (%(model_tag)s::text IS NULL OR model_tag = %(model_tag)s)
+GROUP BY 1, 2, 3
+'''
+
+STATS_LATENCY_SQL = '''
+SELECT model_tag, stage, n, sum_ms::float8 / nullif(n, 0), max_ms,
+       least(audit.hist_quantile(buckets, 0.5), max_ms),
+       least(audit.hist_quantile(buckets, 0.9), max_ms),
+       least(audit.hist_quantile(buckets, 0.99), max_ms)
+FROM (
+  SELECT model_tag, stage, sum(n)::bigint AS n, sum(sum_ms) AS sum_ms, max(max_ms) AS max_ms,
+         audit.hist_sum(buckets) AS buckets
+  FROM audit.latency_minute
+  WHERE minute >= date_trunc('minute', %(since)s::timestamptz) AND minute < %(until)s
+    AND (%(model_tag)s::text IS NULL OR model_tag = %(model_tag)s)
+  GROUP BY 1, 2
+) s
+'''
+
+def audit_stats(since: datetime, until: datetime, model_tag: Optional[str] = None) -> dict:
+    """Decision counts and per-stage latency percentiles from the minute rollups.
+
+    Minutes are whole, so ``since`` is rounded down to the minute. Percentiles
+    are interpolated within histogram buckets (see ``audit.latency_bounds()``).
+    """
+    params = {"since": since, "until": until, "model_tag": model_tag}
+    with get_pool().connection() as conn:
+        decisions = conn.execute(STATS_DECISIONS_SQL, params).fetchall()
+        latency = conn.execute(STATS_LATENCY_SQL, params).fetchall()
         conn.commit()
+    out = {"total": 0, "decisions": {}, "reasons": {}, "latency_ms": {}}
+    for _, decision, reason, n in decisions:
+        out["total"] += n
+        out["decisions"][decision] = out["decisions"].get(decision, 0) + n
+        out["reasons"][reason] = out["reasons"].get(reason, 0) + n
+    for tag, stage, n, mean, max_ms, p50, p90, p99 in latency:
+        out["latency_ms"].setdefault(tag, {})[stage] = {
+            "n": n, "mean": mean, "p50": p50, "p90": p90, "p99": p99, "max": max_ms}
+    return out
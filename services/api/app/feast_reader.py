@@ -0,0 +1,104 @@
+import os
+import time
+import struct
+import functools
+from typing import Dict, List, Optional, Sequence, Tuple
+import mmh3
+from google.protobuf.timestamp_pb2 import Timestamp
+from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+
+FEAST_PROJECT = os.getenv("FEAST_PROJECT", "trade_eligibility")
+FEAST_FEATURE_VIEW = "microstructure"
+# Matches ttl on the microstructure FeatureView; overridden from the registry when available
+FEAST_FV_TTL_SEC = int(os.getenv("FEAST_FV_TTL_SEC", "120"))
+
+_STRING = 2  # feast ValueType.STRING
+
+
+def _mmh3(key: str) -> bytes:
+    # Same 4-byte little-endian murmur3 field name Feast's Redis store uses
+    return struct.pack("<I", mmh3.hash(key, signed=False))
+
+
+class FeastRedisReader:
+    """Reads Feast's Redis online-store encoding for one FeatureView directly.
+
+    Layout (feast.infra.online_stores.redis): one hash per entity at
+    ``serialize_entity_key(entity) + project``, with a field per feature at
+    ``mmh3("<view>:<feature>")`` holding a serialized ValueProto and
+    ``_ts:<view>`` holding the event timestamp. Field names are computed once;
+    entity keys are memoized per symbol. Values older than ``ttl_sec`` are
+    treated as missing, the same way the view's TTL bounds offline joins.
+    """
+
+    def __init__(self, project: str = FEAST_PROJECT, feature_view: str = FEAST_FEATURE_VIEW,
+                 features: Sequence[str] = ("spread_bps",), ttl_sec: int = FEAST_FV_TTL_SEC,
+                 join_key: str = "symbol", serialization_version: int = 2):
+        self.project = project.encode("utf-8")
+        self.features = list(features)
+        self.ttl_sec = ttl_sec
+        self.fields = [_mmh3(f"{feature_view}:{f}") for f in self.features] + [f"_ts:{feature_view}".encode()]
+        prefix = []
+        if serialization_version > 2:
+            prefix.append(struct.pack("<I", 1))
+        prefix.append(struct.pack("<I", _STRING))
+        if serialization_version > 2:
+            prefix.append(struct.pack("<I", len(join_key)))
+        prefix.append(join_key.encode("utf8"))
+        self._key_prefix = b"".join(prefix)
+        self.redis_key = functools.lru_cache(maxsize=65536)(self._redis_key)
+
+    @classmethod
+    def from_store(cls, store, feature_view: str = FEAST_FEATURE_VIEW) -> "FeastRedisReader":
+        fv = store.get_feature_view(feature_view)
+        ttl = int(fv.ttl.total_seconds()) if getattr(fv, "ttl", None) else 0
+        return cls(project=store.project, feature_view=feature_view,
+                   features=[f.name for f in fv.features], ttl_sec=ttl,
+                   join_key=fv.entity_columns[0].name if fv.entity_columns else "symbol",
+                   serialization_version=store.config.entity_key_serialization_version)
+
+    def _redis_key(self, symbol: str) -> bytes:
+        val = symbol.encode("utf8")
+        return b"".join((self._key_prefix, struct.pack("<I", _STRING), struct.pack("<I", len(val)), val, self.project))
+
+    def decode(self, values: List[Optional[bytes]], now: Optional[float] = None) -> Tuple[Optional[Dict[str, float]], Optional[int]]:
+        """Return ({feature: value}, event_ts_seconds) for one HMGET reply, or (None, None)."""
+        *vals, ts_bin = values
+        if not ts_bin:
+            return None, None
+        ts = Timestamp()
+        ts.ParseFromString(ts_bin)
+        if self.ttl_sec and (now if now is not None else time.time()) - ts.seconds > self.ttl_sec:
+            return None, ts.seconds
+        out = {}
+        for name, raw in zip(self.features, vals):
+            if not raw:
+                out[name] = None
+                continue
+            v = ValueProto()
+            v.ParseFromString(raw)
+            kind = v.WhichOneof("val")
+            out[name] = None if kind in (None, "null_val") else getattr(v, kind)
+        return out, ts.seconds
+
+    def read_many(self, client, symbols: Sequence[str], feature: str = "spread_bps") -> Dict[str, Optional[float]]:
+        with client.pipeline(transaction=False) as pipe:
+            for s in symbols:
+                pipe.hmget(self.redis_key(s), self.fields)
+            replies = pipe.execute()
+        return self._collect(symbols, replies, feature)
+
+    async def read_many_async(self, client, symbols: Sequence[str], feature: str = "spread_bps") -> Dict[str, Optional[float]]:
+        async with client.pipeline(transaction=False) as pipe:
+            for s in symbols:
+                pipe.hmget(self.redis_key(s), self.fields)
+            replies = await pipe.execute()
+        return self._collect(symbols, replies, feature)
+
+    def _collect(self, symbols, replies, feature):
+        now = time.time()
+        out = {}
+        for s, reply in zip(symbols, replies):
+            vals, _ = self.decode(reply, now)
+            out[s] = vals.get(feature) if vals else None
+        return out
@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from prometheus_client import Counter, Gauge, Histogram
+
+FEATURE_CACHE_ENABLED = os.getenv("FEATURE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+FEATURE_CACHE_MAX = int(os.getenv("FEATURE_CACHE_MAX", "10000"))
+FEATURE_CACHE_TTL_SEC = float(os.getenv("FEATURE_CACHE_TTL_SEC", "30"))
+SPREAD_CHANNEL = os.getenv("SPREAD_CHANNEL", "te:spread_bps")
+
+log = logging.getLogger("api.feature_cache")
+
+FCACHE_LOOKUPS = Counter("feature_cache_lookups_total", "L1 feature cache lookups", ["result"])
+FCACHE_UPDATES = Counter("feature_cache_updates_total", "L1 feature cache writes", ["source"])
+# Every worker caches the same symbols, so report the largest rather than the sum
+FCACHE_SIZE = Gauge("feature_cache_entries", "Symbols held in the L1 feature cache", multiprocess_mode="livemax")
+FCACHE_STALENESS = Histogram("feature_cache_staleness_ms", "Age of the cached tick at lookup (ms)",
+                             buckets=(1, 5, 10, 50, 100, 250, 500, 1000, 5000, 30000))
+
+
+class FeatureCache:
+    """Per-process LRU of symbol -> (spread_bps, event ts ms, ingest rolling aggregates).
+
+    Entries expire ``ttl_sec`` after they were last written, so a value that
+    stops being pushed falls back to Redis instead of being served forever.
+    Values read from Redis are only cached (``fill``) while pushed updates
+    are arriving (``live``), since nothing else would invalidate them.
+    """
+
+    def __init__(self, maxsize: int = FEATURE_CACHE_MAX, ttl_sec: float = FEATURE_CACHE_TTL_SEC):
+        self.maxsize = maxsize
+        self.ttl_sec = ttl_sec
+        self._data: "OrderedDict[str, Tuple[float, Optional[int], float, Optional[dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.live = False
+        # Bumped whenever the cache goes live or is cleared; a read that started
+        # in an earlier generation may predate updates the cache never saw
+        self.generation = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, symbol: str) -> Optional[Tuple[float, Optional[int]]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(symbol)
+            if entry is None:
+                FCACHE_LOOKUPS.labels("miss").inc()
+                return None
+            value, event_ts_ms, stored_at, _ = entry
+            if now - stored_at > self.ttl_sec:
+                del self._data[symbol]
+                FCACHE_LOOKUPS.labels("expired").inc()
+                return None
+            self._data.move_to_end(symbol)
+        FCACHE_LOOKUPS.labels("hit").inc()
+        if event_ts_ms is not None:
+            FCACHE_STALENESS.observe(max(0, time.time() * 1000 - event_ts_ms))
+        return value, event_ts_ms
+
+    def aggregates(self, symbol: str) -> Optional[Dict[str, float]]:
+        """Rolling aggregates pushed with the cached spread; no lookup metrics, no LRU bump."""
+        with self._lock:
+            entry = self._data.get(symbol)
+        if entry is None or time.monotonic() - entry[2] > self.ttl_sec:
+            return None
+        return entry[3]
+
+    def put(self, symbol: str, value: float, event_ts_ms: Optional[int] = None, source: str = "push",
+            aggregates: Optional[Dict[str, float]] = None):
+        """Store a pushed update, unless the entry already holds a newer event."""
+        with self._lock:
+            entry = self._data.get(symbol)
+            if entry is not None and event_ts_ms is not None and entry[1] is not None and entry[1] > event_ts_ms:
+                return
+            self._store(symbol, value, event_ts_ms, aggregates)
+        FCACHE_UPDATES.labels(source).inc()
+
+    def fill(self, symbol: str, value: float, generation: int, source: str = "redis"):
+        """Read-through from Redis: cached only while live, and never over a pushed value.
+
+        ``generation`` is ``self.generation`` from before the read started.
+        """
+        with self._lock:
+            if not self.live or generation != self.generation:
+                return
+            entry = self._data.get(symbol)
+            if entry is not None and time.monotonic() - entry[2] <= self.ttl_sec:
+                return
+            self._store(symbol, value, None, None)
+        FCACHE_UPDATES.labels(source).inc()
+
+    def _store(self, symbol: str, value: float, event_ts_ms: Optional[int], aggregates: Optional[dict]):
+        self._data[symbol] = (value, event_ts_ms, time.monotonic(), aggregates)
+        self._data.move_to_end(symbol)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        FCACHE_SIZE.set(len(self._data))
+
+    def mark_live(self):
+        """Pushed updates are flowing again; reads may fill the cache."""
+        with self._lock:
+            self.generation += 1
+            self.live = True
+
+    def clear(self):
+        """Drop every entry and stop read-through fills until ``mark_live``."""
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+            self.live = False
+        FCACHE_SIZE.set(0)
+
+
+class SpreadSubscriber:
+    """Applies spread updates published by the ingest service to a FeatureCache.
+
+    While disconnected the cache is cleared so lookups fall back to Redis
+    rather than serving values that are no longer being refreshed.
+    """
+
+    def __init__(self, cache: FeatureCache, redis_url: str, channel: str = SPREAD_CHANNEL):
+        self.cache = cache
+        self.redis_url = redis_url
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="spread-subscriber")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def apply(self, data: bytes):
+        # ingest publishes one list per flushed batch; a single object is accepted too
+        msg = json.loads(data)
+        for u in (msg if isinstance(msg, list) else (msg,)):
+            self.cache.put(u["symbol"], float(u["spread_bps"]), u.get("ts"), aggregates=u.get("features"))
+
+    async def _run(self):
+        import redis.asyncio as aioredis
+        backoff = 0.5
+        while True:
+            r = aioredis.from_url(self.redis_url, socket_connect_timeout=1.0)
+            try:
+                async with r.pubsub() as ps:
+                    await ps.subscribe(self.channel)
+                    self.cache.mark_live()
+                    log.info("subscribed to %s", self.channel)
+                    backoff = 0.5
+                    async for m in ps.listen():
+                        if m.get("type") != "message":
+                            continue
+                        try:
+                            self.apply(m["data"])
+                        except Exception:
+                            log.debug("bad spread update %r", m.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.warning("spread subscriber disconnected; retrying in %.1fs", backoff)
+            finally:
+                self.cache.clear()
+                await r.aclose()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 10.0)
+
+
+cache = FeatureCache()
@@ -1,9 +1,13 @@
 import os
-from typing import Optional
+from typing import Dict, List, Optional
 from feast import FeatureStore
+from .feast_reader import FeastRedisReader
 
 FEAST_REPO = os.getenv("FEAST_REPO", "/app/feast_repo")
+# Read Feast's Redis online store directly instead of through the SDK
+FEAST_DIRECT_READ = os.getenv("FEAST_DIRECT_READ", "true").lower() in ("1", "true", "yes")
 _store: Optional[FeatureStore] = None
+_reader: Optional[FeastRedisReader] = None
 
 def _get_store() -> FeatureStore:
     global _store
@@ -11,7 +15,21 @@ def _get_store() -> FeatureStore:
         _store = FeatureStore(repo_path=FEAST_REPO)
     return _store
 
+def get_feast_reader() -> FeastRedisReader:
+    global _reader
+    if _reader is None:
+        try:
+            _reader = FeastRedisReader.from_store(_get_store())
+        except Exception:
+            _reader = FeastRedisReader()
+    return _reader
+
 def get_spread_bps(symbol: str) -> Optional[float]:
+    if FEAST_DIRECT_READ:
+        return get_feast_reader().read_many(_r(), [symbol])[symbol]
+    return get_spread_bps_sdk(symbol)
+
+def get_spread_bps_sdk(symbol: str) -> Optional[float]:
     store = _get_store()
     resp = store.get_online_features(
         entity_rows=[{"symbol": symbol}],
@@ -25,21 +43,236 @@ def get_spread_bps(symbol: str) -> Optional[float]:
             return vals
     return None
 
+def get_spread_bps_many(symbols: List[str]) -> Dict[str, Optional[float]]:
+    if not symbols:
+        return {}
+    if FEAST_DIRECT_READ:
+        return get_feast_reader().read_many(_r(), symbols)
+    store = _get_store()
+    resp = store.get_online_features(
+        entity_rows=[{"symbol": s} for s in symbols],
+        features=["microstructure:spread_bps"],
+    ).to_dict()
+    for key in ("microstructure__spread_bps", "spread_bps", "microstructure:spread_bps"):
+        if key in resp:
+            return dict(zip(symbols, resp[key]))
+    return {s: None for s in symbols}
+
 
 # Optional streaming fallback via simple Redis key populated by ingest service
 import redis as _redis
 import functools
+from .feature_cache import FEATURE_CACHE_ENABLED, cache as _l1
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://:redispassword@redis:6379/0")
 
 @functools.lru_cache(maxsize=1)
 def _r() -> _redis.Redis:
-    url = os.getenv("REDIS_URL","redis://:redispassword@redis:6379/0")
-    return _redis.from_url(url, socket_connect_timeout=0.3, socket_timeout=0.5)
+    return _redis.from_url(REDIS_URL, socket_connect_timeout=0.3, socket_timeout=0.5)
 
 def get_spread_bps_stream(symbol: str):
+    if FEATURE_CACHE_ENABLED:
+        hit = _l1.get(symbol)
+        if hit is not None:
+            return hit[0]
+    gen = _l1.generation
     try:
         val = _r().get(f"te:spread_bps:{symbol}")
         if val is None:
             return None
-        return float(val)
+        val = float(val)
+    except Exception:
+        return None
+    if FEATURE_CACHE_ENABLED:
+        _l1.fill(symbol, val, gen)
+    return val
+
+def get_spread_bps_stream_many(symbols: List[str]) -> Dict[str, Optional[float]]:
+    out: Dict[str, Optional[float]] = {}
+    missing = []
+    for s in symbols:
+        hit = _l1.get(s) if FEATURE_CACHE_ENABLED else None
+        if hit is not None:
+            out[s] = hit[0]
+        else:
+            missing.append(s)
+    if not missing:
+        return out
+    gen = _l1.generation
+    try:
+        vals = _r().mget([f"te:spread_bps:{s}" for s in missing])
+    except Exception:
+        vals = [None] * len(missing)
+    for s, v in zip(missing, vals):
+        out[s] = float(v) if v is not None else None
+        if FEATURE_CACHE_ENABLED and v is not None:
+            _l1.fill(s, out[s], gen)
+    return out
+
+def get_stream_features(symbol: str) -> Optional[Dict[str, float]]:
+    """Rolling aggregates precomputed by ingest (te:features:{symbol}), one HGETALL."""
+    try:
+        raw = _r().hgetall(f"te:features:{symbol}")
+    except Exception:
+        return None
+    return {k.decode(): float(v) for k, v in raw.items()} if raw else None
+
+
+# Async retrieval: stream first, Feast hedged, all under one deadline
+import asyncio
+import time
+import redis.asyncio as _aredis
+from typing import Awaitable, Callable, Tuple
+from .resilience import CircuitBreaker, breaker
+
+FEATURE_DEADLINE_MS = float(os.getenv("FEATURE_DEADLINE_MS", "20"))
+# Start the Feast lookup if the stream hasn't produced a value within this long
+FEAST_HEDGE_MS = float(os.getenv("FEAST_HEDGE_MS", "1"))
+# Lookups slower than this count against the stream / Feast breakers' slow-call rate
+FEATURE_SLOW_MS = float(os.getenv("FEATURE_SLOW_MS", "10"))
+_stream_cb = breaker("stream", FEATURE_SLOW_MS)
+_feast_cb = breaker("feast", FEATURE_SLOW_MS)
+# Cancel message for the leg of a hedged lookup that lost the race; any other
+# cancellation means the deadline ran out and counts against the breaker
+HEDGE_LOST = "hedge_lost"
+
+@functools.lru_cache(maxsize=1)
+def _ar() -> _aredis.Redis:
+    return _aredis.from_url(REDIS_URL, socket_connect_timeout=0.3, socket_timeout=0.5)
+
+async def _guarded(cb: CircuitBreaker, make: Callable[[], Awaitable]):
+    """Await ``make()`` under ``cb``; None when the breaker refuses or the call fails."""
+    if not cb.acquire():
+        return None
+    t0 = time.perf_counter()
+    try:
+        val = await make()
+    except asyncio.CancelledError as e:
+        if e.args == (HEDGE_LOST,):
+            cb.record(True, (time.perf_counter() - t0) * 1000)
+        else:
+            cb.record_timeout()
+        raise
     except Exception:
+        cb.record(False, (time.perf_counter() - t0) * 1000)
         return None
+    cb.record(True, (time.perf_counter() - t0) * 1000)
+    return val
+
+def features_available() -> bool:
+    """False while both the stream and Feast breakers are open."""
+    return not (_stream_cb.is_open() and _feast_cb.is_open())
+
+async def _feast_async_or_none(symbol: str) -> Optional[float]:
+    if FEAST_DIRECT_READ:
+        vals = await _guarded(_feast_cb, lambda: get_feast_reader().read_many_async(_ar(), [symbol]))
+    else:
+        vals = await _guarded(_feast_cb, lambda: asyncio.to_thread(get_spread_bps_many, [symbol]))
+    return vals.get(symbol) if vals else None
+
+def _feast_future(symbol: str) -> asyncio.Future:
+    return asyncio.ensure_future(_feast_async_or_none(symbol))
+
+async def _stream_or_none(symbol: str) -> Optional[float]:
+    gen = _l1.generation
+    val = await _guarded(_stream_cb, lambda: _ar().get(f"te:spread_bps:{symbol}"))
+    if val is None:
+        return None
+    val = float(val)
+    if FEATURE_CACHE_ENABLED:
+        _l1.fill(symbol, val, gen)
+    return val
+
+async def fetch_spread_bps(symbol: str, deadline_ms: float = FEATURE_DEADLINE_MS,
+                           hedge_ms: float = FEAST_HEDGE_MS) -> Tuple[Optional[float], Optional[str]]:
+    """Return (spread_bps, source) with source in cache|stream|feast, or (None, None|"timeout"|"breaker_open").
+
+    The stream value wins whenever it exists. Feast is only consulted if the
+    stream misses, or hedged once the stream has taken ``hedge_ms``; whatever
+    is known when ``deadline_ms`` expires is returned.
+    """
+    if FEATURE_CACHE_ENABLED:
+        hit = _l1.get(symbol)
+        if hit is not None:
+            return hit[0], "cache"
+    if not features_available():
+        return None, "breaker_open"
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + deadline_ms / 1000
+    stream = asyncio.ensure_future(_stream_or_none(symbol))
+    feast = None
+    answered = False
+    try:
+        await asyncio.wait({stream}, timeout=min(hedge_ms, deadline_ms) / 1000)
+        if stream.done() and stream.result() is not None:
+            return stream.result(), "stream"
+        feast = _feast_future(symbol)
+        pending = {feast} if stream.done() else {stream, feast}
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if stream in done and stream.result() is not None:
+                answered = True
+                return stream.result(), "stream"
+            if feast.done() and stream.done() and feast.result() is not None:
+                return feast.result(), "feast"
+        # deadline: a Feast answer is still better than nothing if the stream is slow
+        if feast.done() and feast.result() is not None:
+            return feast.result(), "feast"
+        return None, (None if not pending else "timeout")
+    finally:
+        for fut in (stream, feast):
+            if fut is not None and not fut.done():
+                fut.cancel(HEDGE_LOST if answered else None)
+
+async def fetch_spread_bps_many(symbols: List[str], deadline_ms: float = FEATURE_DEADLINE_MS
+                                ) -> Dict[str, Tuple[Optional[float], Optional[str]]]:
+    """Bulk variant: L1 cache, then one MGET, then one Feast call for the remaining misses."""
+    out: Dict[str, Tuple[Optional[float], Optional[str]]] = {}
+    missing = []
+    for s in symbols:
+        hit = _l1.get(s) if FEATURE_CACHE_ENABLED else None
+        if hit is not None:
+            out[s] = (hit[0], "cache")
+        else:
+            missing.append(s)
+    if not missing:
+        return out
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + deadline_ms / 1000
+    gen = _l1.generation
+    vals = None
+    if deadline_ms > 0:
+        try:
+            vals = await asyncio.wait_for(
+                _guarded(_stream_cb, lambda: _ar().mget([f"te:spread_bps:{s}" for s in missing])), deadline_ms / 1000)
+        except asyncio.TimeoutError:
+            pass
+    if vals is None:
+        vals = [None] * len(missing)
+    feast_syms = []
+    for s, v in zip(missing, vals):
+        if v is None:
+            feast_syms.append(s)
+            continue
+        out[s] = (float(v), "stream")
+        if FEATURE_CACHE_ENABLED:
+            _l1.fill(s, out[s][0], gen)
+    if feast_syms:
+        feast_vals = {}
+        remaining = deadline - loop.time()
+        if remaining > 0:
+            if FEAST_DIRECT_READ:
+                make = lambda: get_feast_reader().read_many_async(_ar(), feast_syms)
+            else:
+                make = lambda: asyncio.to_thread(get_spread_bps_many, feast_syms)
+            try:
+                feast_vals = await asyncio.wait_for(_guarded(_feast_cb, make), remaining) or {}
+            except asyncio.TimeoutError:
+                feast_vals = {}
+        for s in feast_syms:
+            v = feast_vals.get(s)
+            out[s] = (float(v), "feast") if v is not None else (None, None)
+    return out
@@ -1,13 +1,30 @@
 from typing import List
+import numpy as np
 CONF_THRESH = 0.62
 Z_MAX = 3.5
+SPREAD_MAX_BPS = 5
+
+# decide_batch codes index both tuples: each decision has exactly one reason
+DECISIONS = ("TRADE", "NO_TRADE", "ABSTAIN")
+REASONS = ("ok", "wide_spread", "low_conf")
 
 def quick_ood(zscores: List[float]) -> bool:
     return any(abs(z) > Z_MAX for z in zscores)
 
+def ood_mask(zscores: np.ndarray) -> np.ndarray:
+    """Vectorized quick_ood over the rows of a (batch, features) z-score matrix."""
+    return (np.abs(zscores) > Z_MAX).any(axis=1)
+
 def decide(spread_bps: float, prob_trade: float):
     if prob_trade < CONF_THRESH:
         return "ABSTAIN", prob_trade, "low_conf"
-    if spread_bps > 5:
+    if spread_bps > SPREAD_MAX_BPS:
         return "NO_TRADE", prob_trade, "wide_spread"
     return "TRADE", prob_trade, "ok"
+
+def decide_batch(spread_bps: np.ndarray, prob_trade: np.ndarray, conf_thresh: float = CONF_THRESH,
+                 spread_max: float = SPREAD_MAX_BPS) -> np.ndarray:
+    """Vectorized decide: int8 codes into DECISIONS / REASONS; confidence is prob_trade as in decide."""
+    codes = np.where(spread_bps > spread_max, 1, 0).astype(np.int8)
+    codes[prob_trade < conf_thresh] = 2
+    return codes
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import asyncio
+from typing import List, Optional, Sequence
+import httpx
+import numpy as np
+from .resilience import BreakerOpen, breaker
+
+# triton: remote Triton over HTTP; local: in-process onnxruntime (no network hop)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "triton").lower()
+TRITON_URL = os.getenv("TRITON_URL", "http://triton:8000")
+MODEL_NAME = "trade_eligibility"
+MODEL_VERSION = "1"
+MODEL_TAG = f"{MODEL_NAME}@{MODEL_VERSION}"
+# Must not exceed max_batch_size in the model's config.pbtxt
+TRITON_MAX_BATCH = int(os.getenv("TRITON_MAX_BATCH", "32"))
+TRITON_TIMEOUT = httpx.Timeout(connect=0.3, read=2.0, write=0.5, pool=0.5)
+# KServe v2 binary tensor extension; set to false to fall back to JSON tensors
+TRITON_BINARY = os.getenv("TRITON_BINARY", "true").lower() in ("1", "true", "yes")
+# Needs the h2 package and an HTTP/2 capable endpoint (e.g. a proxy in front of Triton)
+TRITON_HTTP2 = os.getenv("TRITON_HTTP2", "false").lower() in ("1", "true", "yes")
+TRITON_MAX_CONNECTIONS = int(os.getenv("TRITON_MAX_CONNECTIONS", "32"))
+# Infer calls slower than this count against the breaker's slow-call rate
+INFERENCE_SLOW_MS = float(os.getenv("INFERENCE_SLOW_MS", "25"))
+
+HEADER_LEN = "Inference-Header-Content-Length"
+
+
+def infer_url(version: str = MODEL_VERSION) -> str:
+    return f"{TRITON_URL}/v2/models/{MODEL_NAME}/versions/{version}/infer"
+
+
+TRITON_INFER = infer_url(MODEL_VERSION)
+
+
+def build_request(rows: Sequence[Sequence[float]]) -> dict:
+    return {
+        "inputs": [{"name": "input", "shape": [len(rows), len(rows[0])], "datatype": "FP32", "data": [list(r) for r in rows]}],
+        "outputs": [{"name": "prob", "parameters": {"binary_data": False}}],
+    }
+
+
+def parse_probs(out: dict, n: int) -> List[float]:
+    """Return P(trade) (column 1 of ``prob``) for each of the ``n`` rows."""
+    outputs = out.get("outputs", [])
+    vals = outputs[0].get("data") if outputs else None
+    if vals is None:
+        raise RuntimeError("Triton JSON missing 'data'")
+    if vals and isinstance(vals[0], list):
+        probs = [float(v[1]) for v in vals]
+    else:
+        probs = [float(v) for v in vals[1::2]]
+    if len(probs) != n:
+        raise RuntimeError(f"Triton returned {len(probs)} rows, expected {n}")
+    return probs
+
+
+def build_binary_request(rows: Sequence[Sequence[float]]):
+    """Encode ``rows`` as a JSON header followed by the raw FP32 input buffer."""
+    x = np.asarray(rows, dtype=np.float32)
+    header = json.dumps({
+        "inputs": [{"name": "input", "shape": list(x.shape), "datatype": "FP32",
+                    "parameters": {"binary_data_size": x.nbytes}}],
+        "outputs": [{"name": "prob", "parameters": {"binary_data": True}}],
+    }, separators=(",", ":")).encode()
+    headers = {HEADER_LEN: str(len(header)), "Content-Type": "application/octet-stream"}
+    return header + x.tobytes(), headers
+
+
+def parse_binary_probs(body: bytes, header_len: int, n: int) -> List[float]:
+    header = json.loads(body[:header_len])
+    outputs = header.get("outputs", [])
+    if not outputs:
+        raise RuntimeError("Triton response missing outputs")
+    out = outputs[0]
+    size = (out.get("parameters") or {}).get("binary_data_size")
+    if size is None:
+        return parse_probs(header, n)
+    probs = np.frombuffer(body, dtype=np.float32, count=size // 4, offset=header_len)
+    probs = probs.reshape(out.get("shape") or (n, -1))
+    if probs.shape[0] != n:
+        raise RuntimeError(f"Triton returned {probs.shape[0]} rows, expected {n}")
+    return probs[:, 1].tolist()
+
+
+class TritonClient:
+    """Long-lived pooled HTTP client for Triton's v2 infer endpoint.
+
+    The connection pool is opened once (at app startup, or lazily on first
+    use) and reused across requests so calls don't pay connection setup.
+    """
+
+    def __init__(self, binary: bool = TRITON_BINARY, http2: bool = TRITON_HTTP2,
+                 max_connections: int = TRITON_MAX_CONNECTIONS):
+        self.binary = binary
+        self.http2 = http2
+        self.max_connections = max_connections
+        self._http: Optional[httpx.AsyncClient] = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=TRITON_TIMEOUT,
+                http2=self.http2,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._http
+
+    async def start(self):
+        self.http
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def infer(self, rows: Sequence[Sequence[float]], version: str = MODEL_VERSION) -> List[float]:
+        if not self.binary:
+            r = await self.http.post(infer_url(version), json=build_request(rows))
+            r.raise_for_status()
+            return parse_probs(r.json(), len(rows))
+        body, headers = build_binary_request(rows)
+        r = await self.http.post(infer_url(version), content=body, headers=headers)
+        r.raise_for_status()
+        header_len = r.headers.get(HEADER_LEN)
+        if header_len is None:
+            return parse_probs(r.json(), len(rows))
+        return parse_binary_probs(r.content, int(header_len), len(rows))
+
+
+client = TritonClient()
+local = None
+if INFERENCE_BACKEND == "local":
+    from .local_model import LocalModelRepository
+    local = LocalModelRepository(model_name=MODEL_NAME)
+
+
+async def start():
+    if local is not None:
+        await local.start()
+    else:
+        await client.start()
+
+
+async def close():
+    await client.close()
+    if local is not None:
+        await local.close()
+
+
+async def infer_probs(rows: Sequence[Sequence[float]], version: str = MODEL_VERSION) -> List[float]:
+    """One inference call for up to TRITON_MAX_BATCH rows of equal width.
+
+    Guarded by one circuit breaker per model version; raises BreakerOpen
+    without calling the backend while it is open.
+    """
+    cb = breaker(f"inference@{version}", INFERENCE_SLOW_MS)
+    if not cb.acquire():
+        raise BreakerOpen(cb.name)
+    t0 = time.perf_counter()
+    try:
+        probs = await (local.infer(rows, version) if local is not None else client.infer(rows, version))
+    except asyncio.CancelledError:
+        cb.record_timeout()
+        raise
+    except Exception:
+        cb.record(False, (time.perf_counter() - t0) * 1000)
+        raise
+    cb.record(True, (time.perf_counter() - t0) * 1000)
+    return probs
@@ -0,0 +1,130 @@
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import onnxruntime as ort
+
+MODEL_REPOSITORY = Path(os.getenv("MODEL_REPOSITORY", str(Path(__file__).resolve().parents[3] / "services" / "inference" / "model_repository")))
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "1"))
+ORT_WORKERS = int(os.getenv("ORT_WORKERS", "2"))
+MODEL_POLL_SEC = float(os.getenv("MODEL_POLL_SEC", "5"))
+
+log = logging.getLogger("api.local_model")
+
+
+def _session_options() -> ort.SessionOptions:
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = ORT_INTRA_OP_THREADS
+    so.inter_op_num_threads = 1
+    so.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return so
+
+
+class LocalModel:
+    """One ONNX model version with per-thread, per-batch-size I/O bindings.
+
+    Input and output buffers are allocated once per (thread, batch size) and
+    bound to the session, so a call only copies rows in and reads probs out.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.mtime = path.stat().st_mtime
+        self.session = ort.InferenceSession(str(path), sess_options=_session_options(),
+                                            providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_name = self.session.get_outputs()[0].name
+        self._local = threading.local()
+
+    def _binding(self, n: int, width: int):
+        cache = getattr(self._local, "bindings", None)
+        if cache is None:
+            cache = self._local.bindings = {}
+        b = cache.get((n, width))
+        if b is None:
+            x = np.zeros((n, width), dtype=np.float32)
+            y = np.zeros((n, 2), dtype=np.float32)
+            io = self.session.io_binding()
+            io.bind_cpu_input(self.input_name, x)
+            io.bind_output(self.output_name, "cpu", 0, np.float32, list(y.shape), y.ctypes.data)
+            b = cache[(n, width)] = (io, x, y)
+        return b
+
+    def run(self, rows: Sequence[Sequence[float]]) -> List[float]:
+        io, x, y = self._binding(len(rows), len(rows[0]))
+        x[...] = rows
+        self.session.run_with_iobinding(io)
+        return y[:, 1].tolist()
+
+
+class LocalModelRepository:
+    """Triton-free inference over ``<root>/<model_name>/<version>/model.onnx``.
+
+    Every numeric version directory is loaded, so the primary and canary
+    versions are served side by side. A background task rescans the
+    repository every ``poll_sec`` and loads new or rewritten versions.
+    """
+
+    def __init__(self, root: Path = MODEL_REPOSITORY, model_name: str = "trade_eligibility",
+                 workers: int = ORT_WORKERS, poll_sec: float = MODEL_POLL_SEC):
+        self.root = Path(root) / model_name
+        self.poll_sec = poll_sec
+        self._models: Dict[str, LocalModel] = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ort")
+        self._poll_task: Optional[asyncio.Task] = None
+
+    def versions(self) -> List[str]:
+        return sorted(self._models, key=int)
+
+    def scan(self) -> List[str]:
+        """Load versions that are new or whose model.onnx changed; return them."""
+        loaded = []
+        if not self.root.exists():
+            log.warning("model repository not found: %s", self.root)
+            return loaded
+        for d in self.root.iterdir():
+            path = d / "model.onnx"
+            if not (d.is_dir() and d.name.isdigit() and path.exists()):
+                continue
+            current = self._models.get(d.name)
+            if current is not None and current.mtime == path.stat().st_mtime:
+                continue
+            try:
+                self._models[d.name] = LocalModel(path)
+                loaded.append(d.name)
+            except Exception:
+                log.exception("model_load_failed version=%s", d.name)
+        if loaded:
+            log.info("loaded model versions %s from %s", loaded, self.root)
+        return loaded
+
+    async def start(self):
+        await asyncio.get_running_loop().run_in_executor(self._pool, self.scan)
+        if self._poll_task is None and self.poll_sec > 0:
+            self._poll_task = asyncio.create_task(self._poll(), name="model-poll")
+
+    async def _poll(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.poll_sec)
+            try:
+                await loop.run_in_executor(self._pool, self.scan)
+            except Exception:
+                log.exception("model_scan_failed")
+
+    async def close(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        self._pool.shutdown(wait=False)
+
+    async def infer(self, rows: Sequence[Sequence[float]], version: str) -> List[float]:
+        model = self._models.get(version)
+        if model is None:
+            raise RuntimeError(f"model version {version} not loaded from {self.root}")
+        return await asyncio.get_running_loop().run_in_executor(self._pool, model.run, rows)
@@ -2,23 +2,53 @@ from prometheus_client import Counter, Histogram
 import os
 import time
 import uuid
+import asyncio
 import logging
-import httpx
-from fastapi import FastAPI, Request, Query
-from fastapi.responses import PlainTextResponse
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-from .schemas import FeatureVector
-from .guardrails import quick_ood, decide
-from .db import ensure_schema, write_decision
-from .features import get_spread_bps, get_spread_bps_stream
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+import numpy as np
+from fastapi import FastAPI, Request, Query, WebSocket
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from prometheus_client import (REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+                               multiprocess, CONTENT_TYPE_LATEST)
+from prometheus_client.openmetrics import exposition as openmetrics
+from .schemas import FeatureVector, ScoreBatch
+from .guardrails import decide
+from .db import ensure_schema
+from . import db
+from .audit import maintenance as audit_maintenance, writer as audit_writer
+from .features import (FEAST_REPO, FEATURE_DEADLINE_MS, REDIS_URL, _get_store, _r, fetch_spread_bps,
+                       fetch_spread_bps_many, features_available, get_feast_reader, get_stream_features)
+from . import features
+from .feature_cache import FEATURE_CACHE_ENABLED, SpreadSubscriber, cache as feature_cache
+from .inference import (TRITON_INFER, TRITON_MAX_BATCH, MODEL_TAG, MODEL_VERSION, INFERENCE_BACKEND,
+                        INFERENCE_SLOW_MS, build_request, infer_probs, client as triton)
+from . import inference
+from .batcher import MicroBatcher
+from .shadow import CANARY_ENABLED, CANARY_VERSION, ShadowScorer
+from .ood import OOD_ENABLED, guard as ood_guard
+from . import tracing
+from .resilience import (DEADLINE_HEADER, INFERENCE_RESERVE_MS, POLICY_RESERVE_MS, SHED, BreakerOpen,
+                         ConcurrencyLimiter, Deadline, breaker)
+from .warmup import WARMUP_WAIT_SEC, Warmup, warm_inference
+from .codec import (MSGPACK, FrameError, Payload, decode_frame, decode_score, encode_frame, respond,
+                    wants_msgpack)
 
-TRITON_URL = os.getenv("TRITON_URL", "http://triton:8000")
-TRITON_INFER = f"{TRITON_URL}/v2/models/trade_eligibility/versions/1/infer"
+# Frames scored concurrently per /v1/score/stream connection before reads pause
+WS_MAX_INFLIGHT = int(os.getenv("WS_MAX_INFLIGHT", "64"))
+# Set by gunicorn.conf.py when it runs more than one worker: every worker records into shared files that /metrics merges
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# Default /v1/audit/stats windows are capped at a week of minute rollups
+AUDIT_STATS_MAX_MINUTES = int(os.getenv("AUDIT_STATS_MAX_MINUTES", "10080"))
 
-CANARY_ENABLED = os.getenv(
-    "CANARY_ENABLED", "false").lower() in ("1", "true", "yes")
-CANARY_VERSION = os.getenv("CANARY_VERSION", "2")
-TRITON_INFER_CANARY = f"{TRITON_URL}/v2/models/trade_eligibility/versions/{CANARY_VERSION}/infer"
+# Concurrent /v1/score calls share Triton round trips through this
+batcher = MicroBatcher(infer_probs)
+# Canary scoring is sampled and shed first whenever primary rows are already queuing
+shadow = ShadowScorer(under_pressure=lambda: batcher.depth >= batcher.max_batch)
+spread_subscriber = SpreadSubscriber(feature_cache, REDIS_URL)
+# Sheds requests beyond MAX_INFLIGHT_REQUESTS instead of letting the batcher and pools queue them
+limiter = ConcurrencyLimiter()
+inference_breaker = breaker(f"inference@{MODEL_VERSION}", INFERENCE_SLOW_MS)
 
 
 logging.basicConfig(level=logging.INFO)
@@ -36,26 +66,71 @@ FEAT = Histogram("feature_latency_ms", "Feature latency (ms)",
                  buckets=(1, 2, 3, 5, 8, 13, 21, 34))
 POL = Histogram("policy_latency_ms", "Policy latency (ms)",
                 buckets=(1, 2, 3, 5, 8, 13, 21, 34))
+WS_CONNS = Gauge("ws_connections", "Open /v1/score/stream connections", multiprocess_mode="livesum")
+WS_INFLIGHT = Gauge("ws_inflight_frames", "Stream frames being scored", multiprocess_mode="livesum")
+WS_REJECTED = Counter("ws_frames_rejected_total", "Stream frames that failed validation")
+
+
+async def _warm_features():
+    await asyncio.to_thread(get_feast_reader)
+    await features._ar().ping()
+    await asyncio.to_thread(features._r().ping)
+
+
+async def _warm_postgres():
+    await asyncio.to_thread(ensure_schema)
+    await asyncio.to_thread(db.warm)
+
+
+# Audit writes are buffered off the request path, so Postgres is warmed but not required for readiness
+warmup = Warmup({
+    "inference": lambda: warm_inference(infer_probs, [MODEL_VERSION] + ([CANARY_VERSION] if CANARY_ENABLED else [])),
+    "features": _warm_features,
+    "postgres": _warm_postgres,
+}, required=("inference", "features"))
 
 
 @app.on_event("startup")
-def _startup():
-    try:
-        ensure_schema()
-        log.info("Audit schema ensured")
-    except Exception:
-        log.exception("ensure_schema_failed")
-    try:
-        infer_req = {
-            "inputs": [{"name": "input", "shape": [1, 8], "datatype": "FP32", "data": [[0.0]*8]}],
-            "outputs": [{"name": "prob", "parameters": {"binary_data": False}}],
-        }
-        with httpx.Client(timeout=httpx.Timeout(connect=0.3, read=2.0, write=0.5, pool=0.5)) as client:
-            r = client.post(TRITON_INFER, json=infer_req)
-            r.raise_for_status()
-        log.info("Triton warmup succeeded")
-    except Exception:
-        log.warning("Triton warmup failed (continuing)")
+async def _startup():
+    await inference.start()
+    warmup.start()
+    # Hold this worker out of the accept loop while it warms; warmup keeps retrying after the wait
+    if await warmup.wait(WARMUP_WAIT_SEC):
+        log.info("Warmup finished (backend=%s)", INFERENCE_BACKEND)
+    else:
+        log.warning("Not warm after %ss (backend=%s); serving, /readyz fails until warm: %s",
+                    WARMUP_WAIT_SEC, INFERENCE_BACKEND, warmup.errors)
+
+
+@app.on_event("startup")
+async def _start_background():
+    tracing.setup()
+    audit_writer.start()
+    audit_maintenance.start()
+    if CANARY_ENABLED:
+        shadow.start()
+    if FEATURE_CACHE_ENABLED:
+        spread_subscriber.start()
+    if OOD_ENABLED:
+        await ood_guard.start()
+
+
+@app.on_event("shutdown")
+async def _stop_background():
+    if OOD_ENABLED:
+        await ood_guard.stop()
+    await spread_subscriber.stop()
+    await shadow.stop()
+    await audit_writer.stop()
+    await audit_maintenance.stop()
+    await warmup.stop()
+    await asyncio.to_thread(db.close)
+    tracing.shutdown()
+
+
+@app.on_event("shutdown")
+async def _stop_inference():
+    await inference.close()
 
 
 @app.get("/healthz")
@@ -63,171 +138,470 @@ async def healthz():
     return {"status": "ok"}
 
 
+@app.get("/readyz")
+async def readyz():
+    """Passes once this worker's Triton, Redis and Feast clients are warm."""
+    return JSONResponse(warmup.status(), status_code=200 if warmup.ready else 503)
+
+
+def _registry():
+    if not MULTIPROC_DIR:
+        return REGISTRY
+    # Merged from every worker's files on each scrape; exemplars are not kept in this mode
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, MULTIPROC_DIR)
+    return registry
+
+
 @app.get("/metrics")
-async def metrics():
-    return PlainTextResponse(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+async def metrics(request: Request):
+    registry = _registry()
+    # Exemplars (corr_id / trace_id) are only exposed in the OpenMetrics format
+    if "application/openmetrics-text" in request.headers.get("accept", ""):
+        return Response(openmetrics.generate_latest(registry), media_type=openmetrics.CONTENT_TYPE_LATEST)
+    return PlainTextResponse(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
 
 
-@app.post("/v1/score")
-async def score(payload: FeatureVector, request: Request):
-    corr_id = request.headers.get("x-corr-id", str(uuid.uuid4()))
+# The body is decoded by app.codec (msgspec, optional msgpack) rather than by FastAPI;
+# the schema is still published for clients.
+@app.post("/v1/score", openapi_extra={"requestBody": {"required": True, "content": {
+    "application/json": {"schema": FeatureVector.model_json_schema()},
+    MSGPACK: {"schema": FeatureVector.model_json_schema()}}}})
+async def score(request: Request):
+    headers = request.headers
+    content_type = headers.get("content-type", "")
+    payload, _ = decode_score(await request.body(), content_type)
+    corr_id = headers.get("x-corr-id")
+    if corr_id is None:
+        corr_id = str(uuid.uuid4())
+    deadline = Deadline.from_header(headers.get(DEADLINE_HEADER))
+    with tracing.request_span("score", corr_id, symbol=payload.symbol):
+        result = await _score(payload, corr_id, deadline)
+    return respond(result, wants_msgpack(content_type, headers.get("accept", "")))
+
+
+def _stream_features(symbol: str) -> Optional[Dict[str, float]]:
+    """Ingest's rolling aggregates, only when pushed into the L1 cache: no extra Redis read per request."""
+    return feature_cache.aggregates(symbol) if FEATURE_CACHE_ENABLED else None
+
+
+def _abstain(reason: str, payload: Payload, corr_id: str, t0: float, ex, audit: bool = True, **audit_fields):
+    FALLBACK.labels(reason).inc()
+    REQS.labels("/v1/score", "abstain").inc()
+    e2e_elapsed = (time.perf_counter() - t0) * 1000
+    E2E.observe(e2e_elapsed, ex)
+    if audit:
+        audit_writer.submit({
+            "corr_id": corr_id, "symbol": payload.symbol, "decision": "ABSTAIN",
+            "confidence": 0.0, "latency_ms": int(e2e_elapsed), "reason": reason, "model_tag": MODEL_TAG,
+            "feature_ms": None, "inference_ms": None, "policy_ms": None, **audit_fields
+        })
+    return {"decision": "ABSTAIN", "conf": 0.0, "corr_id": corr_id, "reason": reason}
+
+
+async def _score(payload: Payload, corr_id: str, deadline: Optional[Deadline] = None):
     t0 = time.perf_counter()
+    ex = tracing.exemplar(corr_id)
+    if not limiter.try_acquire():
+        SHED.labels("/v1/score").inc()
+        return _abstain("shed", payload, corr_id, t0, ex, audit=False)
+    try:
+        return await _score_admitted(payload, corr_id, deadline or Deadline(start=t0), t0, ex)
+    finally:
+        limiter.release()
 
-    now_ns = time.time_ns()
-    age_ms = max(0, int((now_ns - int(payload.ts_ns)) / 1_000_000))
+
+async def _score_admitted(payload: Payload, corr_id: str, deadline: Deadline, t0: float, ex):
+
+    with tracing.span("freshness"):
+        now_ns = time.time_ns()
+        age_ms = max(0, int((now_ns - int(payload.ts_ns)) / 1_000_000))
     log.debug(f"event_age_ms={age_ms} freshness_ms={payload.freshness_ms}")
     if age_ms > int(payload.freshness_ms):
         FALLBACK.labels("stale_features").inc()
         REQS.labels("/v1/score", "abstain").inc()
-        E2E.observe((time.perf_counter() - t0) * 1000)
-        try:
-            write_decision({
+        E2E.observe((time.perf_counter() - t0) * 1000, ex)
+        audit_writer.submit({
+            "corr_id": corr_id, "symbol": payload.symbol, "decision": "ABSTAIN",
+            "confidence": 0.0, "latency_ms": int((time.perf_counter() - t0)*1000),
+            "reason": f"stale_event(age_ms={age_ms})", "model_tag": MODEL_TAG,
+            "feature_ms": None, "inference_ms": None, "policy_ms": None
+        })
+        return {"decision": "ABSTAIN", "conf": 0.0, "corr_id": corr_id, "reason": "stale_event"}
+
+    # OOD: abstain before spending a feature lookup or inference on unfamiliar inputs
+    if OOD_ENABLED:
+        with tracing.span("ood"):
+            is_ood = ood_guard.check([payload.features], MODEL_VERSION)[0]
+        if is_ood:
+            FALLBACK.labels("ood").inc()
+            REQS.labels("/v1/score", "abstain").inc()
+            E2E.observe((time.perf_counter() - t0) * 1000, ex)
+            audit_writer.submit({
                 "corr_id": corr_id, "symbol": payload.symbol, "decision": "ABSTAIN",
                 "confidence": 0.0, "latency_ms": int((time.perf_counter() - t0)*1000),
-                "reason": f"stale_event(age_ms={age_ms})", "model_tag": "trade_eligibility@1",
-                "feature_ms": 0, "inference_ms": 0, "policy_ms": 0
+                "reason": "ood", "model_tag": MODEL_TAG,
+                "feature_ms": None, "inference_ms": None, "policy_ms": None
             })
-        except Exception:
-            pass
-        return {"decision": "ABSTAIN", "conf": 0.0, "corr_id": corr_id, "reason": "stale_event"}
+            return {"decision": "ABSTAIN", "conf": 0.0, "corr_id": corr_id, "reason": "ood"}
 
-    # Feast
-    # t_feat = time.perf_counter()
-    # spread = None
-    # try:
-    #     spread = get_spread_bps(payload.symbol)
-    # except Exception:
-    #     spread = None
-    # FEAT.observe((time.perf_counter() - t_feat) * 1000)
-    # # streaming fallback
-    # if spread is None:
-    #     spread = get_spread_bps_stream(payload.symbol)
-    #     if spread is None:
-    #         FALLBACK.labels("stale_features").inc()
-    #         REQS.labels("/v1/score", "abstain").inc()
-    #         E2E.observe((time.perf_counter() - t0) * 1000)
-    #         return {"decision": "ABSTAIN", "conf": -0.1, "corr_id": corr_id, "reason": "stale_features_2"}
-    # spread_bps = float(spread)
-
-    t_feat = time.perf_counter()
-    feast_spread = None
-    try:
-        feast_spread = get_spread_bps(payload.symbol)  # Feast online
-    except Exception:
-        feast_spread = None
-    stream_spread = get_spread_bps_stream(payload.symbol)  # Redis stream
-    FEAT.observe((time.perf_counter() - t_feat) * 1000)
-
-    # Prefer streaming when available; else fall back to Feast
-    source = None
-    if stream_spread is not None:
-        spread_bps = float(stream_spread)
-        source = "stream"
-    elif feast_spread is not None:
-        spread_bps = float(feast_spread)
-        source = "feast"
-    else:
-        FALLBACK.labels("stale_features").inc()
-        REQS.labels("/v1/score", "abstain").inc()
-        E2E.observe((time.perf_counter() - t0) * 1000)
-        return {"decision": "ABSTAIN", "conf": 0.0, "corr_id": corr_id, "reason": "stale_features"}
+    # Nothing downstream can answer: abstain before spending the feature lookup
+    if inference_breaker.is_open():
+        return _abstain("breaker_open_inference", payload, corr_id, t0, ex)
+    # Features get what is left after reserving time for inference and policy
+    feat_budget = min(FEATURE_DEADLINE_MS, deadline.remaining_ms(INFERENCE_RESERVE_MS + POLICY_RESERVE_MS))
+    if feat_budget <= 0:
+        return _abstain("deadline_features", payload, corr_id, t0, ex)
+
+    # Features: stream (L1 cache / Redis) preferred, Feast only on a miss or as a hedge
+    with tracing.span("features") as sp:
+        t_feat = time.perf_counter()
+        spread, source = await fetch_spread_bps(payload.symbol, deadline_ms=feat_budget)
+        sp.set_attribute("feature.source", str(source))
+    feat_elapsed = (time.perf_counter() - t_feat) * 1000
+    feat_ms = int(feat_elapsed)
+    FEAT.observe(feat_elapsed, ex)
+    if spread is None:
+        if source == "timeout":
+            reason = "feature_timeout" if feat_budget >= FEATURE_DEADLINE_MS else "deadline_features"
+        elif source == "breaker_open":
+            reason = "breaker_open_features"
+        else:
+            reason = "stale_features"
+        return _abstain(reason, payload, corr_id, t0, ex, feature_ms=feat_ms)
+    spread_bps = float(spread)
 
     log.debug(
         f"Symbol {payload.symbol} spread_bps={spread_bps} source={source}")
 
-    # Triton infer
-    infer_req = {
-        "inputs": [{"name": "input", "shape": [1, len(payload.features)], "datatype": "FP32", "data": [payload.features]}],
-        "outputs": [{"name": "prob", "parameters": {"binary_data": False}}]
-    }
+    # Triton infer, bounded by what is left of the request budget
+    inf_budget = deadline.remaining_ms(POLICY_RESERVE_MS)
+    if inf_budget <= 0:
+        return _abstain("deadline_inference", payload, corr_id, t0, ex, feature_ms=feat_ms, feature_source=source)
     prob_trade, inf_ms = 0.0, 0
+    t_inf = time.perf_counter()
     try:
-        t_inf = time.perf_counter()
-        async with httpx.AsyncClient(timeout=httpx.Timeout(connect=0.3, read=2.0, write=0.5, pool=0.5)) as client:
-            r = await client.post(TRITON_INFER, json=infer_req)
-            r.raise_for_status()
-            out = r.json()
-        outputs = out.get("outputs", [])
-        vals = outputs[0].get("data") if outputs else None
-        if vals is None:
-            raise RuntimeError("Triton JSON missing 'data'")
-        vec = vals[0] if (isinstance(vals, list)
-                          and vals and isinstance(vals[0], list)) else vals
-        prob_trade = float(vec[1])
+        with tracing.span("inference", **{"model.version": MODEL_VERSION, "model.backend": INFERENCE_BACKEND}):
+            async with asyncio.timeout(inf_budget / 1000):
+                prob_trade = await batcher.submit(payload.features)
+        inf_elapsed = (time.perf_counter() - t_inf) * 1000
+        inf_ms = int(inf_elapsed)
+        INF.observe(inf_elapsed, ex)
+    except Exception as e:
         inf_ms = int((time.perf_counter() - t_inf) * 1000)
-        INF.observe(inf_ms)
-    except Exception:
-        FALLBACK.labels("infer_error").inc()
-        REQS.labels("/v1/score", "abstain").inc()
-        E2E.observe((time.perf_counter() - t0) * 1000)
-        try:
-            write_decision({
-                "corr_id": corr_id, "symbol": payload.symbol, "decision": "ABSTAIN",
-                "confidence": 0.0, "latency_ms": int((time.perf_counter() - t0)*1000),
-                "reason": "infer_error", "model_tag": "trade_eligibility@1",
-                "feature_ms": 0, "inference_ms": inf_ms, "policy_ms": 0
-            })
-        except Exception:
-            pass
-        return {"decision": "ABSTAIN", "conf": 0.0, "corr_id": corr_id, "reason": "infer_error"}
-
-    # Canary (non-blocking for decision; but we await here to record metrics)
-    if CANARY_ENABLED:
-        log.debug("Canary enabled, invoking")
-        try:
-            async with httpx.AsyncClient(timeout=httpx.Timeout(connect=0.3, read=2.0, write=0.5, pool=0.5)) as client:
-                cr = await client.post(TRITON_INFER_CANARY, json=infer_req)
-                if cr.status_code == 200:
-                    cout = cr.json()
-                    cvals = cout.get("outputs", [])[0].get("data")
-                    cvec = cvals[0] if (isinstance(
-                        cvals, list) and cvals and isinstance(cvals[0], list)) else cvals
-                    canary_prob = float(cvec[1])
-                    from math import fabs
-                    CANARY_DELTA.observe(abs(prob_trade - canary_prob))
-                    # decision disagreement?
-                    from .guardrails import decide as dec2
-                    cdec, _, _ = dec2(spread_bps=spread_bps,
-                                      prob_trade=canary_prob)
-                    if cdec != decision:
-                        CANARY_DISAGREE.inc()
-                else:
-                    pass
-        except Exception:
-            pass
+        if isinstance(e, TimeoutError):
+            reason = "deadline_inference"
+        elif isinstance(e, BreakerOpen):
+            reason, inf_ms = "breaker_open_inference", None
+        else:
+            reason = "infer_error"
+        return _abstain(reason, payload, corr_id, t0, ex, feature_ms=feat_ms, inference_ms=inf_ms,
+                        feature_source=source)
 
     # Policy
-    t_pol = time.perf_counter()
-    decision, conf, reason = decide(
-        spread_bps=spread_bps, prob_trade=prob_trade)
+    with tracing.span("policy"):
+        t_pol = time.perf_counter()
+        decision, conf, reason = decide(
+            spread_bps=spread_bps, prob_trade=prob_trade)
+        pol_elapsed = (time.perf_counter() - t_pol) * 1000
     log.debug(f"Decision {decision} conf {conf} reason {reason}")
-    pol_ms = int((time.perf_counter() - t_pol) * 1000)
-    POL.observe(pol_ms)
+    pol_ms = int(pol_elapsed)
+    POL.observe(pol_elapsed, ex)
+
+    # Canary comparison happens in the background against the final decision
+    shadow.offer(payload.features, spread_bps, prob_trade, decision)
 
     REQS.labels("/v1/score", decision.lower()).inc()
-    e2e_ms = int((time.perf_counter() - t0) * 1000)
-    E2E.observe(e2e_ms)
+    e2e_elapsed = (time.perf_counter() - t0) * 1000
+    e2e_ms = int(e2e_elapsed)
+    E2E.observe(e2e_elapsed, ex)
 
-    try:
-        write_decision({
+    with tracing.span("audit_enqueue"):
+        audit_writer.submit({
             "corr_id": corr_id, "symbol": payload.symbol, "decision": decision,
             "confidence": conf, "latency_ms": e2e_ms, "reason": reason,
-            "model_tag": "trade_eligibility@1", "feature_ms": 0, "inference_ms": inf_ms, "policy_ms": pol_ms
+            "model_tag": MODEL_TAG, "feature_ms": feat_ms, "inference_ms": inf_ms, "policy_ms": pol_ms,
+            "feature_source": source, "spread_bps": spread_bps
         })
-    except Exception:
-        pass
 
-    return {"decision": decision, "conf": conf, "corr_id": corr_id, "spread_bps": spread_bps, "latency_ms": e2e_ms, "reason": reason}
+    return {"decision": decision, "conf": conf, "corr_id": corr_id, "spread_bps": spread_bps, "latency_ms": e2e_ms,
+            "reason": reason, "stream_features": _stream_features(payload.symbol)}
+
+
+@app.websocket("/v1/score/stream")
+async def score_stream(ws: WebSocket):
+    """Score a stream of frames on one connection.
+
+    Each text (JSON) or binary (msgpack) frame is a FeatureVector plus an
+    optional ``id``; the decision comes back in the same encoding with that
+    ``id``, in completion order. At most WS_MAX_INFLIGHT frames are scored at
+    once; beyond that the socket is not read, so TCP pushes back on the
+    client. Concurrent frames share Triton calls through the micro-batcher.
+    """
+    await ws.accept()
+    conn_id = ws.headers.get("x-corr-id") or str(uuid.uuid4())
+    # X-Deadline-Ms on the handshake sets the budget of every frame
+    budget_header = ws.headers.get(DEADLINE_HEADER)
+    slots = asyncio.Semaphore(WS_MAX_INFLIGHT)
+    outbox = asyncio.Queue(maxsize=WS_MAX_INFLIGHT)
+    inflight = set()
+
+    async def _send():
+        closed = False
+        while (item := await outbox.get()) is not None:
+            if closed:
+                continue  # keep draining so scoring tasks never block on a dead socket
+            data, binary = item
+            try:
+                await (ws.send_bytes(data) if binary else ws.send_text(data))
+            except Exception:
+                closed = True
+
+    async def _one(frame_id, payload, binary):
+        corr_id = f"{conn_id}:{frame_id}"
+        try:
+            with tracing.request_span("score_stream", corr_id, symbol=payload.symbol):
+                result = await _score(payload, corr_id, Deadline.from_header(budget_header))
+        except Exception:
+            log.exception("stream_score_failed")
+            result = {"decision": "ABSTAIN", "conf": 0.0, "corr_id": corr_id, "reason": "internal_error"}
+        result["id"] = frame_id
+        try:
+            await outbox.put((encode_frame(result, binary), binary))
+        finally:
+            slots.release()
+            WS_INFLIGHT.dec()
+
+    WS_CONNS.inc()
+    writer = asyncio.create_task(_send())
+    try:
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            binary = msg.get("bytes") is not None
+            try:
+                frame_id, payload = decode_frame(msg["bytes"] if binary else msg["text"], binary)
+            except FrameError as e:
+                WS_REJECTED.inc()
+                await outbox.put((encode_frame({"id": e.id, "error": "invalid_frame", "detail": e.detail}, binary),
+                                  binary))
+                continue
+            await slots.acquire()
+            WS_INFLIGHT.inc()
+            task = asyncio.create_task(_one(frame_id, payload, binary))
+            inflight.add(task)
+            task.add_done_callback(inflight.discard)
+    finally:
+        # Let scored frames finish (and reach the audit log) before closing the writer
+        if inflight:
+            await asyncio.gather(*inflight, return_exceptions=True)
+        await outbox.put(None)
+        await writer
+        WS_CONNS.dec()
+
+
+@app.post("/v1/score:batch")
+async def score_batch(batch: ScoreBatch, request: Request):
+    corr_id = request.headers.get("x-corr-id", str(uuid.uuid4()))
+    deadline = Deadline.from_header(request.headers.get(DEADLINE_HEADER))
+    with tracing.request_span("score_batch", corr_id, **{"batch.size": len(batch.items)}):
+        return await _score_batch(batch, corr_id, deadline)
+
+
+async def _score_batch(batch: ScoreBatch, corr_id: str, deadline: Optional[Deadline] = None):
+    t0 = time.perf_counter()
+    ex = tracing.exemplar(corr_id)
+    items = batch.items
+    if not limiter.try_acquire():
+        SHED.labels("/v1/score:batch").inc()
+        FALLBACK.labels("shed").inc(len(items))
+        E2E.observe((time.perf_counter() - t0) * 1000, ex)
+        results = []
+        for i in range(len(items)):
+            REQS.labels("/v1/score:batch", "abstain").inc()
+            results.append({"decision": "ABSTAIN", "conf": 0.0, "reason": "shed", "corr_id": f"{corr_id}:{i}"})
+        return {"corr_id": corr_id, "results": results, "latency_ms": int((time.perf_counter() - t0) * 1000)}
+    try:
+        return await _score_batch_admitted(items, corr_id, deadline or Deadline(start=t0), t0, ex)
+    finally:
+        limiter.release()
+
+
+async def _score_batch_admitted(items, corr_id: str, deadline: Deadline, t0: float, ex):
+    results = [None] * len(items)
+    audit = {}  # index -> (reason, inference_ms, policy_ms); None for stages that did not run
+
+    now_ns = time.time_ns()
+    fresh = []
+    for i, p in enumerate(items):
+        age_ms = max(0, int((now_ns - int(p.ts_ns)) / 1_000_000))
+        if age_ms > int(p.freshness_ms):
+            FALLBACK.labels("stale_features").inc()
+            results[i] = {"decision": "ABSTAIN", "conf": 0.0, "reason": "stale_event"}
+            audit[i] = (f"stale_event(age_ms={age_ms})", None, None)
+        else:
+            fresh.append(i)
+
+    # OOD: one vectorized check per feature width over the whole batch
+    if OOD_ENABLED and fresh:
+        by_width = {}
+        for i in fresh:
+            by_width.setdefault(len(items[i].features), []).append(i)
+        flagged = set()
+        for idx in by_width.values():
+            mask = ood_guard.check([items[i].features for i in idx], MODEL_VERSION)
+            flagged.update(idx[k] for k in np.flatnonzero(mask))
+        for i in flagged:
+            results[i] = {"decision": "ABSTAIN", "conf": 0.0, "reason": "ood"}
+            audit[i] = ("ood", None, None)
+        if flagged:
+            FALLBACK.labels("ood").inc(len(flagged))
+            fresh = [i for i in fresh if i not in flagged]
+
+    # Abstain early when inference cannot answer or no time is left for features
+    feat_budget = min(FEATURE_DEADLINE_MS, deadline.remaining_ms(INFERENCE_RESERVE_MS + POLICY_RESERVE_MS))
+    early = None
+    if inference_breaker.is_open():
+        early = "breaker_open_inference"
+    elif not features_available():
+        early = "breaker_open_features"
+    elif feat_budget <= 0:
+        early = "deadline_features"
+    if early and fresh:
+        FALLBACK.labels(early).inc(len(fresh))
+        for i in fresh:
+            results[i] = {"decision": "ABSTAIN", "conf": 0.0, "reason": early}
+            audit[i] = (early, None, None)
+        fresh = []
+
+    # One bulk lookup per source for the distinct symbols; Feast only for stream misses
+    looked_up = set(fresh)
+    symbols = sorted({items[i].symbol for i in fresh})
+    with tracing.span("features", **{"feature.symbols": len(symbols)}):
+        t_feat = time.perf_counter()
+        fetched = await fetch_spread_bps_many(symbols, deadline_ms=feat_budget)
+    spreads = {sym: v for sym, (v, _) in fetched.items()}
+    feat_elapsed = (time.perf_counter() - t_feat) * 1000
+    feat_ms = int(feat_elapsed)
+    FEAT.observe(feat_elapsed, ex)
+
+    # Triton batches must share a width; chunk each width group to max_batch_size
+    groups = {}
+    for i in fresh:
+        if spreads.get(items[i].symbol) is None:
+            FALLBACK.labels("stale_features").inc()
+            results[i] = {"decision": "ABSTAIN", "conf": 0.0, "reason": "stale_features"}
+            audit[i] = ("stale_features", None, None)
+        else:
+            groups.setdefault(len(items[i].features), []).append(i)
+    chunks = [idx[k:k + TRITON_MAX_BATCH]
+              for idx in groups.values() for k in range(0, len(idx), TRITON_MAX_BATCH)]
+
+    inf_budget = deadline.remaining_ms(POLICY_RESERVE_MS)
+    # per chunk, set once inference starts: failed chunks are audited with it too, as in /v1/score
+    chunk_inf_ms = [None] * len(chunks)
+
+    async def _run(k, chunk):
+        if inf_budget <= 0:
+            raise TimeoutError
+        with tracing.span("inference", **{"model.version": MODEL_VERSION, "batch.size": len(chunk)}):
+            t_inf = time.perf_counter()
+            try:
+                async with asyncio.timeout(inf_budget / 1000):
+                    probs = await infer_probs([items[i].features for i in chunk])
+            finally:
+                chunk_inf_ms[k] = int((time.perf_counter() - t_inf) * 1000)
+        inf_elapsed = (time.perf_counter() - t_inf) * 1000
+        INF.observe(inf_elapsed, ex)
+        return probs, int(inf_elapsed)
+
+    outs = await asyncio.gather(*(_run(k, c) for k, c in enumerate(chunks)), return_exceptions=True)
+    for k, (chunk, out) in enumerate(zip(chunks, outs)):
+        if isinstance(out, BaseException):
+            inf_ms = chunk_inf_ms[k]
+            if isinstance(out, TimeoutError):
+                reason = "deadline_inference"
+            elif isinstance(out, BreakerOpen):
+                reason, inf_ms = "breaker_open_inference", None
+            else:
+                reason = "infer_error"
+            FALLBACK.labels(reason).inc(len(chunk))
+            for i in chunk:
+                results[i] = {"decision": "ABSTAIN", "conf": 0.0, "reason": reason}
+                audit[i] = (reason, inf_ms, None)
+            continue
+        probs, inf_ms = out
+        for i, prob_trade in zip(chunk, probs):
+            spread_bps = float(spreads[items[i].symbol])
+            t_pol = time.perf_counter()
+            decision, conf, reason = decide(
+                spread_bps=spread_bps, prob_trade=prob_trade)
+            pol_elapsed = (time.perf_counter() - t_pol) * 1000
+            pol_ms = int(pol_elapsed)
+            POL.observe(pol_elapsed, ex)
+            shadow.offer(items[i].features, spread_bps, prob_trade, decision)
+            results[i] = {"decision": decision, "conf": conf, "spread_bps": spread_bps, "reason": reason,
+                          "stream_features": _stream_features(items[i].symbol)}
+            audit[i] = (reason, inf_ms, pol_ms)
+
+    e2e_elapsed = (time.perf_counter() - t0) * 1000
+    e2e_ms = int(e2e_elapsed)
+    E2E.observe(e2e_elapsed, ex)
+    rows = []
+    for i, res in enumerate(results):
+        res["corr_id"] = f"{corr_id}:{i}"
+        res["latency_ms"] = e2e_ms
+        REQS.labels("/v1/score:batch", res["decision"].lower()).inc()
+        if i in audit:
+            reason, inf_ms, pol_ms = audit[i]
+            source = fetched.get(items[i].symbol, (None, None))[1] if i in looked_up else None
+            rows.append({
+                "corr_id": res["corr_id"], "symbol": items[i].symbol, "decision": res["decision"],
+                "confidence": res["conf"], "latency_ms": e2e_ms, "reason": reason,
+                "model_tag": MODEL_TAG, "feature_ms": feat_ms if i in looked_up else None, "inference_ms": inf_ms,
+                "policy_ms": pol_ms, "feature_source": source,
+                "spread_bps": spreads.get(items[i].symbol) if i in looked_up else None
+            })
+    with tracing.span("audit_enqueue", **{"audit.rows": len(rows)}):
+        audit_writer.submit_many(rows)
+
+    return {"corr_id": corr_id, "results": results, "latency_ms": e2e_ms}
+
+
+@app.get("/v1/audit/stats")
+async def audit_stats(minutes: int = Query(60, ge=1, le=AUDIT_STATS_MAX_MINUTES),
+                      since: Optional[datetime] = None, until: Optional[datetime] = None,
+                      model_tag: Optional[str] = None):
+    """Decision mix and per-stage latency over a window, answered from the minute rollups.
+
+    The window is ``[since, until)`` when given, otherwise the last ``minutes``.
+    """
+    until = _utc(until) if until else datetime.now(timezone.utc)
+    since = _utc(since) if since else until - timedelta(minutes=minutes)
+    if since >= until:
+        return JSONResponse({"error": "since must be before until"}, status_code=422)
+    t0 = time.perf_counter()
+    try:
+        stats = await asyncio.to_thread(db.audit_stats, since, until, model_tag)
+    except Exception as e:
+        log.warning("audit_stats_failed: %r", e)
+        return JSONResponse({"error": str(e)}, status_code=503)
+    return {"window": {"since": since.isoformat(), "until": until.isoformat()}, "model_tag": model_tag,
+            **stats, "query_ms": round((time.perf_counter() - t0) * 1000, 2)}
+
+
+def _utc(ts: datetime) -> datetime:
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
 
 # Debug endpoints
 
 
 @app.get("/debug/features")
 async def debug_features(symbol: str = Query(..., pattern=r"^[A-Z.]{1,15}$")):
-    from feast import FeatureStore
     import redis as _redis
-    feast_repo = os.getenv("FEAST_REPO", "/app/feast_repo")
-    store = FeatureStore(repo_path=feast_repo)
+    feast_repo = FEAST_REPO
+    store = _get_store()
     online = store.get_online_features(
         entity_rows=[{"symbol": symbol}],
         features=["microstructure:spread_bps"],
@@ -248,28 +622,24 @@ async def debug_features(symbol: str = Query(..., pattern=r"^[A-Z.]{1,15}$")):
     except Exception as e:
         redis_ok = False
         redis_error = str(e)
-    return {"symbol": symbol, "feast_repo": feast_repo, "online_result": online, "ttl_seconds": ttl_seconds, "redis": {"url": redis_url, "ok": redis_ok, "error": redis_error}}
+    try:
+        direct = get_feast_reader().read_many(_r(), [symbol])[symbol]
+    except Exception as e:
+        direct = {"error": str(e)}
+    return {"symbol": symbol, "feast_repo": feast_repo, "online_result": online, "direct_result": direct,
+            "stream_features": get_stream_features(symbol), "ttl_seconds": ttl_seconds, "redis": {"url": redis_url, "ok": redis_ok, "error": redis_error}}
 
 
 @app.get("/debug/triton")
 async def debug_triton(n: int = Query(8, ge=1, le=64)):
     import time
     t0 = time.perf_counter()
-    payload = {
-        "inputs": [{"name": "input", "shape": [1, n], "datatype": "FP32", "data": [[0.0]*n]}],
-        "outputs": [{"name": "prob", "parameters": {"binary_data": False}}],
-    }
+    payload = build_request([[0.0]*n])
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(connect=0.3, read=2.0, write=0.5, pool=0.5)) as client:
-            r = await client.post(TRITON_INFER, json=payload)
-            body = r.json() if r.headers.get("content-type",
-                                             "").startswith("application/json") else r.text
-            ok = r.status_code == 200
+        r = await triton.http.post(TRITON_INFER, json=payload)
+        body = r.json() if r.headers.get("content-type",
+                                         "").startswith("application/json") else r.text
+        ok = r.status_code == 200
     except Exception as e:
         ok, body = False, {"error": str(e)}
     return {"ok": ok, "elapsed_ms": int((time.perf_counter()-t0)*1000), "infer_url": TRITON_INFER, "response": body}
-
-CANARY_DELTA = Histogram("canary_abs_delta", "Abs difference between primary and canary prob", buckets=(
-    0.0, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0))
-CANARY_DISAGREE = Counter("canary_disagree_total",
-                          "Count of decision disagreement between primary and canary")
@@ -0,0 +1,162 @@
+import os
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import numpy as np
+from prometheus_client import Counter
+from .guardrails import ood_mask
+
+OOD_ENABLED = os.getenv("OOD_ENABLED", "true").lower() in ("1", "true", "yes")
+# Rows seen before the guard starts abstaining; earlier rows only train the stats
+OOD_MIN_COUNT = int(os.getenv("OOD_MIN_COUNT", "1000"))
+OOD_SNAPSHOT_PATH = Path(os.getenv("OOD_SNAPSHOT_PATH", "/tmp/rt-tec/ood_stats.npz"))
+OOD_SNAPSHOT_SEC = float(os.getenv("OOD_SNAPSHOT_SEC", "60"))
+
+log = logging.getLogger("api.ood")
+
+OOD_ROWS = Counter("ood_rows_total", "Rows checked by the OOD guard", ["result"])
+_OOD_FLAGGED = OOD_ROWS.labels("ood")
+_OOD_OK = OOD_ROWS.labels("ok")
+
+
+class RunningStats:
+    """Per-feature running mean/variance (Welford, merged a batch at a time).
+
+    The reciprocal std used for z-scores is refreshed every ``refresh`` rows;
+    once warm the statistics move far less than that between refreshes.
+    """
+
+    def __init__(self, width: int, refresh: int = 64):
+        self.n = 0
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+        self.refresh = refresh
+        self._inv_std = np.zeros(width)
+        self._inv_std_n = -refresh
+
+    def update(self, x: np.ndarray):
+        nb = x.shape[0]
+        if nb == 1:
+            delta = x[0] - self.mean
+            self.n += 1
+            self.mean += delta / self.n
+            self.m2 += delta * (x[0] - self.mean)
+            return
+        if nb == 0:
+            return
+        mb = x.mean(axis=0)
+        delta = mb - self.mean
+        total = self.n + nb
+        self.mean += delta * (nb / total)
+        self.m2 += ((x - mb) ** 2).sum(axis=0) + delta ** 2 * (self.n * nb / total)
+        self.n = total
+
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.m2 / max(self.n - 1, 1))
+
+    def zscores(self, x: np.ndarray) -> np.ndarray:
+        if self.n - self._inv_std_n >= self.refresh:
+            std = self.std()
+            # constant features never count as out of distribution
+            self._inv_std = np.divide(1.0, std, out=np.zeros_like(std), where=std > 0)
+            self._inv_std_n = self.n
+        return (x - self.mean) * self._inv_std
+
+
+class OODGuard:
+    """Flags rows whose features sit more than Z_MAX standard deviations from the running mean.
+
+    Statistics are kept per (model version, feature width). Each call scores
+    the whole batch with the statistics accumulated so far, then folds in the
+    rows it did not flag, so repeated outliers cannot drag the mean and
+    variance toward themselves and stop being flagged. They are snapshotted to ``path`` periodically and on shutdown
+    so a restart doesn't start cold.
+    """
+
+    def __init__(self, min_count: int = OOD_MIN_COUNT, path: Path = OOD_SNAPSHOT_PATH,
+                 snapshot_sec: float = OOD_SNAPSHOT_SEC):
+        self.min_count = min_count
+        self.path = Path(path)
+        self.snapshot_sec = snapshot_sec
+        self._stats: Dict[Tuple[str, int], RunningStats] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def check(self, x, version: str) -> np.ndarray:
+        """Return a boolean mask over the rows of ``x`` that are out of distribution."""
+        x = np.asarray(x, dtype=np.float64)
+        key = (version, x.shape[1])
+        with self._lock:
+            st = self._stats.get(key)
+            if st is None:
+                st = self._stats[key] = RunningStats(x.shape[1])
+            if st.n >= self.min_count:
+                mask = ood_mask(st.zscores(x))
+            else:
+                mask = np.zeros(x.shape[0], dtype=bool)
+            flagged = int(mask.sum())
+            st.update(x[~mask] if flagged else x)
+        if flagged:
+            _OOD_FLAGGED.inc(flagged)
+        _OOD_OK.inc(x.shape[0] - flagged)
+        return mask
+
+    def snapshot(self):
+        with self._lock:
+            arrays = {}
+            for (version, width), st in self._stats.items():
+                arrays[f"{version}:{width}:n"] = np.array(st.n)
+                arrays[f"{version}:{width}:mean"] = st.mean.copy()
+                arrays[f"{version}:{width}:m2"] = st.m2.copy()
+        if not arrays:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # per-process temp file: API workers snapshot to the same path
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, self.path)
+
+    def load(self):
+        if not self.path.exists():
+            return
+        with np.load(self.path) as data:
+            for name in data.files:
+                version, width, field = name.rsplit(":", 2)
+                key = (version, int(width))
+                st = self._stats.setdefault(key, RunningStats(int(width)))
+                if field == "n":
+                    st.n = int(data[name])
+                else:
+                    setattr(st, field, data[name].astype(np.float64))
+        log.info("loaded OOD stats for %s from %s", sorted(self._stats), self.path)
+
+    async def start(self):
+        try:
+            await asyncio.to_thread(self.load)
+        except Exception:
+            log.exception("ood_snapshot_load_failed path=%s", self.path)
+        if self._task is None and self.snapshot_sec > 0:
+            self._task = asyncio.create_task(self._run(), name="ood-snapshot")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.snapshot_sec)
+            try:
+                await asyncio.to_thread(self.snapshot)
+            except Exception:
+                log.exception("ood_snapshot_failed path=%s", self.path)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await asyncio.to_thread(self.snapshot)
+        except Exception:
+            log.exception("ood_snapshot_failed path=%s", self.path)
+
+
+guard = OODGuard()
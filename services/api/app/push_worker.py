@@ -0,0 +1,352 @@
+"""Push-mode scoring: consume feature vectors from Kafka, publish decisions.
+
+Run with ``python -m app.push_worker``. Each poll is scored as one
+micro-batch with the same freshness, OOD, feature, inference and
+guardrails steps as ``/v1/score:batch``. Decisions go to the ``decisions``
+topic, keyed by symbol and carrying the ``audit.decisions`` columns, and
+are bulk-written to the audit table. Offsets are committed only after both
+succeed, and a batch that fails is rewound and polled again, so delivery
+is at-least-once. Throughput scales by running more workers in the same
+consumer group, up to the partition count.
+"""
+import os
+import time
+import asyncio
+import logging
+import signal
+from collections import defaultdict, namedtuple
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+import msgspec
+import numpy as np
+import orjson
+from prometheus_client import Counter, Histogram, start_http_server
+from .schemas import FeatureVectorStruct
+from .guardrails import decide
+from .features import REDIS_URL, fetch_spread_bps_many, get_feast_reader
+from .feature_cache import FEATURE_CACHE_ENABLED, SpreadSubscriber, cache as feature_cache
+from .inference import MODEL_TAG, MODEL_VERSION, TRITON_MAX_BATCH, infer_probs
+from . import inference
+from .ood import OOD_ENABLED, guard as ood_guard
+from .resilience import BreakerOpen
+from .db import write_decisions
+
+BROKERS = os.getenv("KAFKA_BROKERS", "redpanda:9092")
+PUSH_TOPIC = os.getenv("PUSH_TOPIC", "features")
+DECISIONS_TOPIC = os.getenv("DECISIONS_TOPIC", "decisions")
+PUSH_GROUP = os.getenv("PUSH_GROUP", "scorer-1")
+PUSH_BATCH_MAX = int(os.getenv("PUSH_BATCH_MAX", "512"))
+PUSH_POLL_TIMEOUT_MS = int(os.getenv("PUSH_POLL_TIMEOUT_MS", "50"))
+# Standing subscriptions: only these symbols are scored (empty = every symbol on the topic)
+PUSH_SYMBOLS = frozenset(s for s in os.getenv("PUSH_SYMBOLS", "").replace(" ", "").split(",") if s)
+PUSH_METRICS_PORT = int(os.getenv("PUSH_METRICS_PORT", "9101"))
+
+log = logging.getLogger("api.push")
+
+PUSH_RECORDS = Counter("push_records_total", "Feature records consumed", ["result"])
+PUSH_DECISIONS = Counter("push_decisions_total", "Decisions published", ["decision"])
+PUSH_ERRORS = Counter("push_errors_total", "Push scoring errors", ["kind"])
+PUSH_BATCH = Histogram("push_batch_rows", "Rows scored per poll",
+                       buckets=(1, 8, 32, 64, 128, 256, 512, 1024))
+PUSH_LATENCY = Histogram("push_batch_latency_ms", "Poll-to-commit latency per batch (ms)",
+                         buckets=(1, 2, 5, 10, 20, 50, 100, 250, 500, 1000))
+
+Record = namedtuple("Record", "topic partition offset key value")
+
+
+class MemoryBroker:
+    """In-process stand-in for the Kafka consumer/producer pair, for tests and local runs.
+
+    One partition per topic; ``commit`` marks everything returned by
+    ``poll`` as consumed, and uncommitted records are redelivered by
+    ``rewind`` (what a restart or rebalance does with Kafka).
+    """
+
+    def __init__(self, topic: str = PUSH_TOPIC):
+        self.topics: Dict[str, List[Record]] = defaultdict(list)
+        self.topic = topic
+        self.committed = 0
+        self.position = 0
+
+    def send(self, topic: str, value: bytes, key: Optional[bytes] = None):
+        part = self.topics[topic]
+        part.append(Record(topic, 0, len(part), key, value))
+
+    def flush(self):
+        pass
+
+    def poll(self, max_records: int, timeout_ms: int) -> List[Record]:
+        recs = self.topics[self.topic][self.position:self.position + max_records]
+        self.position += len(recs)
+        return recs
+
+    def commit(self):
+        self.committed = self.position
+
+    def rewind(self):
+        self.position = self.committed
+
+    def close(self):
+        pass
+
+
+class KafkaBroker:
+    """Consumer/producer pair; ``rewind`` seeks back to the first uncommitted record polled."""
+
+    def __init__(self, brokers: str = BROKERS, topic: str = PUSH_TOPIC, group: str = PUSH_GROUP):
+        from kafka import KafkaConsumer, KafkaProducer
+        self.consumer = KafkaConsumer(
+            topic,
+            bootstrap_servers=[brokers],
+            group_id=group,
+            client_id=f"scorer-{os.getpid()}",
+            auto_offset_reset="latest",
+            enable_auto_commit=False,
+            max_poll_records=PUSH_BATCH_MAX,
+            api_version_auto_timeout_ms=5000,
+        )
+        self.producer = KafkaProducer(bootstrap_servers=[brokers], linger_ms=1, acks=1)
+        self._uncommitted = {}  # TopicPartition -> first offset polled since the last commit
+
+    def send(self, topic: str, value: bytes, key: Optional[bytes] = None):
+        self.producer.send(topic, value, key=key)
+
+    def flush(self):
+        self.producer.flush()
+
+    def poll(self, max_records: int, timeout_ms: int) -> List[Record]:
+        polled = self.consumer.poll(timeout_ms=timeout_ms, max_records=max_records)
+        for tp, recs in polled.items():
+            if recs:
+                self._uncommitted.setdefault(tp, recs[0].offset)
+        return [rec for recs in polled.values() for rec in recs]
+
+    def commit(self):
+        self.consumer.commit()
+        self._uncommitted.clear()
+
+    def rewind(self):
+        assigned = self.consumer.assignment()
+        for tp, offset in self._uncommitted.items():
+            if tp in assigned:
+                self.consumer.seek(tp, offset)
+        self._uncommitted.clear()
+
+    def close(self):
+        self.producer.close()
+        self.consumer.close()
+
+
+_decode = msgspec.json.Decoder(FeatureVectorStruct)
+
+
+class PushScorer:
+    def __init__(self, broker, write_audit: Callable[[List[dict]], None] = write_decisions,
+                 out_topic: str = DECISIONS_TOPIC, symbols: Sequence[str] = PUSH_SYMBOLS,
+                 batch_max: int = PUSH_BATCH_MAX, poll_timeout_ms: int = PUSH_POLL_TIMEOUT_MS):
+        self.broker = broker
+        self.write_audit = write_audit
+        self.out_topic = out_topic
+        self.symbols = frozenset(symbols)
+        self.batch_max = batch_max
+        self.poll_timeout_ms = poll_timeout_ms
+        self.stop: Optional[asyncio.Event] = None
+
+    def decode(self, records: List[Record]):
+        items, ids = [], []
+        for rec in records:
+            try:
+                item = _decode.decode(rec.value)
+            except (msgspec.ValidationError, msgspec.DecodeError):
+                PUSH_RECORDS.labels("invalid").inc()
+                continue
+            if self.symbols and item.symbol not in self.symbols:
+                PUSH_RECORDS.labels("skipped").inc()
+                continue
+            items.append(item)
+            ids.append(f"{rec.topic}:{rec.partition}:{rec.offset}")
+        return items, ids
+
+    async def score(self, items: List[FeatureVectorStruct], corr_ids: List[str]) -> List[dict]:
+        """Score a micro-batch; returns one audit-shaped decision row per item."""
+        t0 = time.perf_counter()
+        rows = [None] * len(items)
+        now_ns = time.time_ns()
+        live = []
+        for i, p in enumerate(items):
+            age_ms = max(0, (now_ns - int(p.ts_ns)) // 1_000_000)
+            if age_ms > p.freshness_ms:
+                rows[i] = ("ABSTAIN", 0.0, f"stale_event(age_ms={age_ms})", None, None)
+            else:
+                live.append(i)
+
+        if OOD_ENABLED and live:
+            by_width = defaultdict(list)
+            for i in live:
+                by_width[len(items[i].features)].append(i)
+            flagged = set()
+            for idx in by_width.values():
+                mask = ood_guard.check([items[i].features for i in idx], MODEL_VERSION)
+                flagged.update(idx[k] for k in np.flatnonzero(mask))
+            for i in flagged:
+                rows[i] = ("ABSTAIN", 0.0, "ood", None, None)
+            live = [i for i in live if i not in flagged]
+
+        looked_up = set(live)
+        t_feat = time.perf_counter()
+        fetched = await fetch_spread_bps_many(sorted({items[i].symbol for i in live}))
+        feat_ms = int((time.perf_counter() - t_feat) * 1000)
+
+        groups = defaultdict(list)
+        for i in live:
+            if fetched.get(items[i].symbol, (None, None))[0] is None:
+                rows[i] = ("ABSTAIN", 0.0, "stale_features", None, None)
+            else:
+                groups[len(items[i].features)].append(i)
+        chunks = [idx[k:k + TRITON_MAX_BATCH] for idx in groups.values()
+                  for k in range(0, len(idx), TRITON_MAX_BATCH)]
+
+        async def _run(chunk):
+            t_inf = time.perf_counter()
+            probs = await infer_probs([items[i].features for i in chunk])
+            return probs, int((time.perf_counter() - t_inf) * 1000)
+
+        outs = await asyncio.gather(*(_run(c) for c in chunks), return_exceptions=True)
+        for chunk, out in zip(chunks, outs):
+            if isinstance(out, BreakerOpen):
+                for i in chunk:
+                    rows[i] = ("ABSTAIN", 0.0, "breaker_open_inference", None, None)
+                continue
+            if isinstance(out, BaseException):
+                PUSH_ERRORS.labels("infer").inc()
+                for i in chunk:
+                    rows[i] = ("ABSTAIN", 0.0, "infer_error", None, None)
+                continue
+            probs, inf_ms = out
+            for i, prob_trade in zip(chunk, probs):
+                t_pol = time.perf_counter()
+                decision, conf, reason = decide(spread_bps=float(fetched[items[i].symbol][0]),
+                                                prob_trade=prob_trade)
+                rows[i] = (decision, conf, reason, inf_ms, int((time.perf_counter() - t_pol) * 1000))
+
+        ts = datetime.now(timezone.utc)
+        latency_ms = int((time.perf_counter() - t0) * 1000)
+        out = []
+        for i, (item, corr_id, (decision, conf, reason, inf_ms, pol_ms)) in enumerate(zip(items, corr_ids, rows)):
+            spread, source = fetched.get(item.symbol, (None, None)) if i in looked_up else (None, None)
+            out.append({
+                "ts": ts, "corr_id": corr_id, "symbol": item.symbol, "decision": decision,
+                "confidence": conf, "latency_ms": latency_ms, "reason": reason, "model_tag": MODEL_TAG,
+                "feature_ms": feat_ms if i in looked_up else None, "inference_ms": inf_ms,
+                "policy_ms": pol_ms, "feature_source": source, "spread_bps": spread,
+            })
+        return out
+
+    async def deliver(self, decisions: List[dict]):
+        """Publish then audit, retrying whichever step has not succeeded yet.
+
+        Gives up with the last error once ``stop`` is set, leaving the batch
+        uncommitted for the next consumer.
+        """
+        published = audited = False
+        backoff = 0.1
+        while True:
+            try:
+                if not published:
+                    await asyncio.to_thread(self._publish, decisions)
+                    published = True
+                if not audited:
+                    await asyncio.to_thread(self.write_audit, decisions)
+                    audited = True
+                return
+            except Exception as e:
+                PUSH_ERRORS.labels("audit" if published else "publish").inc()
+                if self.stopping():
+                    raise
+                log.warning("delivery failed (%s); retrying in %.1fs", e, backoff)
+                await self._pause(backoff)
+                backoff = min(backoff * 2, 5.0)
+
+    def stopping(self) -> bool:
+        return self.stop is not None and self.stop.is_set()
+
+    async def _pause(self, seconds: float):
+        """Sleep, waking early on ``stop``."""
+        if self.stop is None:
+            await asyncio.sleep(seconds)
+            return
+        try:
+            await asyncio.wait_for(self.stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def _publish(self, decisions: List[dict]):
+        for d in decisions:
+            self.broker.send(self.out_topic, orjson.dumps(d), key=d["symbol"].encode())
+        self.broker.flush()
+
+    async def step(self) -> int:
+        """Poll once, then score, publish, audit and commit; returns records consumed."""
+        records = await asyncio.to_thread(self.broker.poll, self.batch_max, self.poll_timeout_ms)
+        if not records:
+            return 0
+        t0 = time.perf_counter()
+        items, corr_ids = self.decode(records)
+        if items:
+            try:
+                decisions = await self.score(items, corr_ids)
+                await self.deliver(decisions)
+            except BaseException:
+                # the position is past these records; seek back so they are polled again
+                await asyncio.to_thread(self.broker.rewind)
+                raise
+            PUSH_RECORDS.labels("scored").inc(len(items))
+            PUSH_BATCH.observe(len(items))
+            for d in decisions:
+                PUSH_DECISIONS.labels(d["decision"]).inc()
+        await asyncio.to_thread(self.broker.commit)
+        PUSH_LATENCY.observe((time.perf_counter() - t0) * 1000)
+        return len(records)
+
+    async def run(self, stop: asyncio.Event):
+        self.stop = stop
+        while not stop.is_set():
+            try:
+                await self.step()
+            except Exception:
+                PUSH_ERRORS.labels("step").inc()
+                log.exception("push_step_failed")
+                await self._pause(1.0)
+
+
+async def _main():
+    start_http_server(PUSH_METRICS_PORT)
+    try:
+        await asyncio.to_thread(get_feast_reader)
+    except Exception:
+        log.warning("Feast reader init failed (continuing)")
+    if OOD_ENABLED:
+        # read-only: the API owns the snapshot file
+        await asyncio.to_thread(ood_guard.load)
+    subscriber = SpreadSubscriber(feature_cache, REDIS_URL)
+    if FEATURE_CACHE_ENABLED:
+        subscriber.start()
+    await inference.start()
+    broker = await asyncio.to_thread(KafkaBroker)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    log.info("scoring %s -> %s as %s (symbols=%s)", PUSH_TOPIC, DECISIONS_TOPIC, PUSH_GROUP,
+             ",".join(sorted(PUSH_SYMBOLS)) or "all")
+    try:
+        await PushScorer(broker).run(stop)
+    finally:
+        await asyncio.to_thread(broker.close)
+        await subscriber.stop()
+        await inference.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
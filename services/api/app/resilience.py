@@ -0,0 +1,188 @@
+import os
+import math
+import time
+from collections import deque
+from typing import Dict, Optional
+from prometheus_client import Counter, Gauge
+
+# Budget for a whole request unless the client sends X-Deadline-Ms (capped at the max)
+REQUEST_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "50"))
+REQUEST_DEADLINE_MAX_MS = float(os.getenv("REQUEST_DEADLINE_MAX_MS", "1000"))
+DEADLINE_HEADER = "x-deadline-ms"
+# Held back from earlier stages so later ones still get a chance to run
+INFERENCE_RESERVE_MS = float(os.getenv("INFERENCE_RESERVE_MS", "5"))
+POLICY_RESERVE_MS = float(os.getenv("POLICY_RESERVE_MS", "0.5"))
+
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "50"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "20"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+BREAKER_OPEN_SEC = float(os.getenv("BREAKER_OPEN_SEC", "5"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "3"))
+
+# Requests scored at once per worker before new ones are shed
+MAX_INFLIGHT_REQUESTS = int(os.getenv("MAX_INFLIGHT_REQUESTS", "512"))
+
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+STATE_NAMES = {CLOSED: "closed", HALF_OPEN: "half_open", OPEN: "open"}
+
+BREAKER_STATE = Gauge("circuit_breaker_state", "0 closed, 1 half-open, 2 open", ["breaker"],
+                      multiprocess_mode="livemax")
+BREAKER_TRANSITIONS = Counter("circuit_breaker_transitions_total", "Breaker state changes", ["breaker", "state"])
+INFLIGHT = Gauge("requests_inflight", "Requests being scored", multiprocess_mode="livesum")
+SHED = Counter("requests_shed_total", "Requests rejected by the concurrency limiter", ["route"])
+
+
+class Deadline:
+    """Absolute deadline for one request, on the perf_counter clock."""
+
+    __slots__ = ("at",)
+
+    def __init__(self, budget_ms: float = REQUEST_DEADLINE_MS, start: Optional[float] = None):
+        self.at = (time.perf_counter() if start is None else start) + budget_ms / 1000
+
+    @classmethod
+    def from_header(cls, value: Optional[str], start: Optional[float] = None) -> "Deadline":
+        budget = REQUEST_DEADLINE_MS
+        if value:
+            try:
+                requested = float(value)
+            except ValueError:
+                requested = math.nan
+            # nan would compare false against every budget check and never expire
+            if math.isfinite(requested):
+                budget = min(max(requested, 0.0), REQUEST_DEADLINE_MAX_MS)
+        return cls(budget, start)
+
+    def remaining_ms(self, reserve_ms: float = 0.0) -> float:
+        return (self.at - time.perf_counter()) * 1000 - reserve_ms
+
+
+class BreakerOpen(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"circuit breaker {name} is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """Count-based breaker over the last ``window`` calls.
+
+    Trips to open once at least ``min_calls`` outcomes are known and the
+    error rate or the slow-call rate (calls over ``slow_ms``) reaches its
+    threshold. After ``open_sec`` it lets ``probes`` calls through
+    (half-open): all succeeding closes it, any failed or slow probe opens
+    it again.
+    Not thread-safe; used from the event loop only.
+    """
+
+    def __init__(self, name: str, slow_ms: float, window: int = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 error_rate: float = BREAKER_ERROR_RATE, slow_rate: float = BREAKER_SLOW_RATE,
+                 open_sec: float = BREAKER_OPEN_SEC, probes: int = BREAKER_HALF_OPEN_PROBES):
+        self.name = name
+        self.slow_ms = slow_ms
+        self.min_calls = min(min_calls, window)
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.open_sec = open_sec
+        self.probes = max(1, probes)
+        self._outcomes = deque(maxlen=window)  # (failed, slow)
+        self._failed = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probes_out = 0
+        self._probes_ok = 0
+        self._gauge = BREAKER_STATE.labels(name)
+        self.state = CLOSED
+        self._gauge.set(CLOSED)
+
+    def _set(self, state: int):
+        if state == self.state:
+            return
+        self.state = state
+        self._gauge.set(state)
+        BREAKER_TRANSITIONS.labels(self.name, STATE_NAMES[state]).inc()
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state != CLOSED:
+            self._outcomes.clear()
+            self._failed = self._slow = 0
+        self._probes_out = self._probes_ok = 0
+
+    def reset(self):
+        self._set(CLOSED)
+        self._outcomes.clear()
+        self._failed = self._slow = 0
+
+    def is_open(self) -> bool:
+        """True while calls are refused outright; moves to half-open once ``open_sec`` has passed."""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_sec:
+            self._set(HALF_OPEN)
+        return self.state == OPEN
+
+    def acquire(self) -> bool:
+        """Whether a call may go out now; every True must be followed by ``record``."""
+        if self.is_open():
+            return False
+        if self.state == HALF_OPEN:
+            if self._probes_out >= self.probes:
+                return False
+            self._probes_out += 1
+        return True
+
+    def record(self, ok: bool, elapsed_ms: float):
+        """Outcome of a call let through by ``acquire``; see also ``record_timeout``."""
+        if self.state == HALF_OPEN:
+            if not ok or elapsed_ms > self.slow_ms:
+                self._set(OPEN)
+                return
+            self._probes_ok += 1
+            if self._probes_ok >= self.probes:
+                self._set(CLOSED)
+            return
+        if self.state == OPEN:  # a call that started before the trip
+            return
+        failed, slow = not ok, elapsed_ms > self.slow_ms
+        if len(self._outcomes) == self._outcomes.maxlen:
+            old_failed, old_slow = self._outcomes[0]
+            self._failed -= old_failed
+            self._slow -= old_slow
+        self._outcomes.append((failed, slow))
+        self._failed += failed
+        self._slow += slow
+        n = len(self._outcomes)
+        if n >= self.min_calls and (self._failed / n >= self.error_rate or self._slow / n >= self.slow_rate):
+            self._set(OPEN)
+
+    def record_timeout(self):
+        """A call abandoned at its deadline counts as slow, however short the budget was."""
+        self.record(True, math.inf)
+
+
+class ConcurrencyLimiter:
+    """Non-blocking cap on requests in flight: over the limit they are shed, never queued."""
+
+    def __init__(self, limit: int = MAX_INFLIGHT_REQUESTS):
+        self.limit = limit
+        self.inflight = 0
+
+    def try_acquire(self) -> bool:
+        if self.limit > 0 and self.inflight >= self.limit:
+            return False
+        self.inflight += 1
+        INFLIGHT.inc()
+        return True
+
+    def release(self):
+        self.inflight -= 1
+        INFLIGHT.dec()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker(name: str, slow_ms: float) -> CircuitBreaker:
+    """Process-wide breaker for a dependency, created on first use."""
+    b = _breakers.get(name)
+    if b is None:
+        b = _breakers[name] = CircuitBreaker(name, slow_ms)
+    return b
@@ -1,4 +1,5 @@
-from typing import List
+from typing import Annotated, List, Optional, Union
+import msgspec
 from pydantic import BaseModel, Field
 
 class FeatureVector(BaseModel):
@@ -6,3 +7,23 @@ class FeatureVector(BaseModel):
     ts_ns: int
     features: List[float] = Field(..., min_length=8, max_length=64)
     freshness_ms: int = 0
+
+class ScoreBatch(BaseModel):
+    items: List[FeatureVector] = Field(..., min_length=1, max_length=1024)
+
+class FeatureVectorStruct(msgspec.Struct, gc=False):
+    """Wire twin of FeatureVector for the /v1/score fast path.
+
+    Strict typing accepts a subset of what the Pydantic model accepts (no
+    string or bool coercion); anything it rejects is re-checked against
+    FeatureVector, so the set of valid payloads is the same. ``\\Z`` matches
+    Pydantic's ``$``, which does not allow a trailing newline.
+    """
+    symbol: Annotated[str, msgspec.Meta(pattern=r"^[A-Z.]{1,15}\Z")]
+    ts_ns: int
+    features: Annotated[List[float], msgspec.Meta(min_length=8, max_length=64)]
+    freshness_ms: int = 0
+
+class ScoreFrame(FeatureVectorStruct, gc=False):
+    """One /v1/score/stream message; ``id`` is echoed on the matching decision."""
+    id: Optional[Union[str, int]] = None
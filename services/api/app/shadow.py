@@ -0,0 +1,104 @@
+import os
+import random
+import asyncio
+import logging
+from typing import Callable, List, Optional, Sequence
+from prometheus_client import Counter, Gauge, Histogram
+from .guardrails import decide
+from .inference import TRITON_MAX_BATCH, infer_probs
+
+CANARY_ENABLED = os.getenv(
+    "CANARY_ENABLED", "false").lower() in ("1", "true", "yes")
+CANARY_VERSION = os.getenv("CANARY_VERSION", "2")
+CANARY_SAMPLE_RATE = float(os.getenv("CANARY_SAMPLE_RATE", "1.0"))
+SHADOW_QUEUE_MAX = int(os.getenv("SHADOW_QUEUE_MAX", "1000"))
+
+log = logging.getLogger("api.shadow")
+
+CANARY_DELTA = Histogram("canary_abs_delta", "Abs difference between primary and canary prob", buckets=(
+    0.0, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0))
+CANARY_DISAGREE = Counter("canary_disagree_total",
+                          "Count of decision disagreement between primary and canary")
+SHADOW_SCORED = Counter("shadow_scored_total", "Rows scored by the canary model")
+SHADOW_DROPPED = Counter("shadow_dropped_total", "Shadow rows dropped instead of queued", ["reason"])
+SHADOW_QUEUED = Gauge("shadow_queue_depth", "Shadow rows waiting for the canary model", multiprocess_mode="livesum")
+
+
+class ShadowScorer:
+    """Scores a sample of primary traffic against the canary model in the background.
+
+    ``offer`` never waits: rows are sampled, then dropped if the primary path
+    reports pressure or the queue is full. The worker drains whatever is
+    queued (up to ``batch_max`` rows) into one canary infer call and compares
+    each row with the primary decision and probability.
+    """
+
+    def __init__(self, version: str = CANARY_VERSION, sample_rate: float = CANARY_SAMPLE_RATE,
+                 maxsize: int = SHADOW_QUEUE_MAX, batch_max: int = TRITON_MAX_BATCH,
+                 under_pressure: Optional[Callable[[], bool]] = None):
+        self.version = version
+        self.sample_rate = sample_rate
+        self.maxsize = maxsize
+        self.batch_max = batch_max
+        self.under_pressure = under_pressure
+        self._q: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._q = asyncio.Queue(maxsize=self.maxsize)
+        self._task = asyncio.create_task(self._run(), name="shadow-scorer")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        SHADOW_QUEUED.set(0)
+
+    def offer(self, features: Sequence[float], spread_bps: float, prob_trade: float, decision: str) -> bool:
+        if self._q is None:
+            return False
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self.under_pressure is not None and self.under_pressure():
+            SHADOW_DROPPED.labels("pressure").inc()
+            return False
+        try:
+            self._q.put_nowait((features, spread_bps, prob_trade, decision))
+        except asyncio.QueueFull:
+            SHADOW_DROPPED.labels("overflow").inc()
+            return False
+        SHADOW_QUEUED.set(self._q.qsize())
+        return True
+
+    async def _run(self):
+        while True:
+            batch = [await self._q.get()]
+            while len(batch) < self.batch_max and not self._q.empty():
+                batch.append(self._q.get_nowait())
+            SHADOW_QUEUED.set(self._q.qsize())
+            groups = {}
+            for item in batch:
+                groups.setdefault(len(item[0]), []).append(item)
+            for items in groups.values():
+                await self._score(items)
+
+    async def _score(self, items: List[tuple]):
+        try:
+            probs = await infer_probs([f for f, _, _, _ in items], version=self.version)
+        except Exception:
+            SHADOW_DROPPED.labels("infer_error").inc(len(items))
+            log.debug("canary_infer_failed rows=%d", len(items), exc_info=True)
+            return
+        SHADOW_SCORED.inc(len(items))
+        for (_, spread_bps, prob_trade, decision), canary_prob in zip(items, probs):
+            CANARY_DELTA.observe(abs(prob_trade - canary_prob))
+            cdec, _, _ = decide(spread_bps=spread_bps, prob_trade=canary_prob)
+            if cdec != decision:
+                CANARY_DISAGREE.inc()
@@ -0,0 +1,121 @@
+import os
+import random
+import logging
+from typing import Dict
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+# Fraction of requests traced; unsampled requests skip span creation entirely
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+OTEL_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://otel-collector:4317")
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "trade-eligibility-api")
+TRACE_FLUSH_TIMEOUT_MS = int(os.getenv("TRACE_FLUSH_TIMEOUT_MS", "2000"))
+
+log = logging.getLogger("api.tracing")
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.context import Context
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+except ImportError:  # tracing is optional; spans become no-ops
+    trace = None
+
+
+class _NoopSpan:
+    """Stands in for both the span and its context manager when not tracing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def is_recording(self) -> bool:
+        return False
+
+
+NOOP = _NoopSpan()
+_tracer = None
+_provider = None
+
+
+def setup():
+    """Install the OTLP exporter once per process; safe to call when OpenTelemetry is absent."""
+    global _tracer, _provider
+    if _tracer is not None or not TRACING_ENABLED or TRACE_SAMPLE_RATE <= 0:
+        return
+    if trace is None:
+        log.info("opentelemetry not installed; tracing disabled")
+        return
+    try:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        log.warning("OTLP exporter not installed; tracing disabled")
+        return
+    _provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}), shutdown_on_exit=False)
+    _provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=OTEL_ENDPOINT, insecure=True)))
+    _tracer = _provider.get_tracer("app")
+    log.info("Tracing to %s (sample_rate=%s)", OTEL_ENDPOINT, TRACE_SAMPLE_RATE)
+
+
+def shutdown():
+    """Flush queued spans for at most TRACE_FLUSH_TIMEOUT_MS.
+
+    The provider is not shut down: its exporter retries with backoff for
+    minutes when the collector is unreachable, and the export thread is a
+    daemon, so exiting without it never blocks.
+    """
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.force_flush(TRACE_FLUSH_TIMEOUT_MS)
+    _tracer = _provider = None
+
+
+def request_span(name: str, corr_id: str, **attrs):
+    """Root span for one request, or ``NOOP`` when tracing is off or the request is not sampled."""
+    if _tracer is None or random.random() >= TRACE_SAMPLE_RATE:
+        return NOOP
+    attrs["corr_id"] = corr_id
+    return _tracer.start_as_current_span(name, attributes=attrs)
+
+
+def span(name: str, **attrs):
+    """Child stage span; only recorded inside a sampled request span."""
+    if _tracer is None or not trace.get_current_span().is_recording():
+        return NOOP
+    return _tracer.start_as_current_span(name, attributes=attrs)
+
+
+def current_context():
+    """Span context of a sampled request, for linking work done on its behalf elsewhere."""
+    if _tracer is None:
+        return None
+    ctx = trace.get_current_span().get_span_context()
+    return ctx if ctx.trace_flags.sampled else None
+
+
+def linked_span(name: str, contexts, **attrs):
+    """Span for shared work (e.g. one micro-batch) linked to the sampled requests it served."""
+    if _tracer is None:
+        return NOOP
+    links = [trace.Link(c) for c in contexts if c is not None]
+    if not links:
+        return NOOP
+    # A fresh root: the batch belongs to no single request's trace
+    return _tracer.start_as_current_span(name, context=Context(), links=links, attributes=attrs)
+
+
+def exemplar(corr_id: str) -> Dict[str, str]:
+    """Exemplar labels for histogram observations: corr_id, plus trace_id when sampled.
+
+    OpenMetrics caps exemplar labels at 128 characters, so corr_id is truncated.
+    """
+    ex = {"corr_id": corr_id[:64]}
+    ctx = current_context()
+    if ctx is not None:
+        ex["trace_id"] = format(ctx.trace_id, "032x")
+    return ex
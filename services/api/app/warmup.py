@@ -0,0 +1,100 @@
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+from prometheus_client import Counter, Gauge
+from .batcher import MICROBATCH_MAX
+from .inference import TRITON_MAX_BATCH
+
+# Row counts sent to each model version at startup: every power of two the
+# micro-batcher produces plus the full /v1/score:batch chunk
+WARMUP_BATCH_SIZES = sorted({int(s) for s in os.getenv("WARMUP_BATCH_SIZES", "").split(",") if s.strip()}
+                            or {min(2 ** i, MICROBATCH_MAX) for i in range(MICROBATCH_MAX.bit_length())}
+                            | {MICROBATCH_MAX, TRITON_MAX_BATCH})
+WARMUP_WIDTH = int(os.getenv("WARMUP_WIDTH", "8"))
+WARMUP_RETRY_SEC = float(os.getenv("WARMUP_RETRY_SEC", "2"))
+# Startup waits this long for warmup before serving; the rest finishes in the background
+WARMUP_WAIT_SEC = float(os.getenv("WARMUP_WAIT_SEC", "10"))
+
+log = logging.getLogger("api.warmup")
+
+# livesum across workers: the number of warm worker processes
+WORKER_READY = Gauge("api_worker_ready", "1 once this worker passed warmup", multiprocess_mode="livesum")
+WARMUP_FAILURES = Counter("warmup_failures_total", "Failed warmup attempts", ["step"])
+
+Step = Callable[[], Awaitable[None]]
+
+
+class Warmup:
+    """Runs named warmup steps concurrently, retrying each until it succeeds.
+
+    The worker is ready once every step in ``required`` has succeeded; the
+    other steps are warmed best-effort and only reported.
+    """
+
+    def __init__(self, steps: Dict[str, Step], required: Iterable[str], retry_sec: float = WARMUP_RETRY_SEC):
+        self.steps = steps
+        self.required = set(required)
+        self.retry_sec = retry_sec
+        self.done: Dict[str, bool] = {name: False for name in steps}
+        self.errors: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def status(self) -> dict:
+        return {"ready": self.ready, "steps": dict(self.done), "errors": dict(self.errors)}
+
+    def start(self):
+        if self._task is None:
+            self._ready = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def wait(self, timeout: float = WARMUP_WAIT_SEC) -> bool:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        WORKER_READY.set(0)
+
+    async def _run(self):
+        await asyncio.gather(*(self._step(name, fn) for name, fn in self.steps.items()))
+
+    async def _step(self, name: str, fn: Step):
+        attempt = 0
+        while True:
+            try:
+                await fn()
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                WARMUP_FAILURES.labels(name).inc()
+                self.errors[name] = repr(e)
+                if attempt == 0:
+                    log.warning("Warmup step %s failed (retrying every %ss): %r", name, self.retry_sec, e)
+                attempt += 1
+                await asyncio.sleep(self.retry_sec)
+        self.done[name] = True
+        self.errors.pop(name, None)
+        log.info("Warmup step %s done", name)
+        if all(self.done[r] for r in self.required) and not self.ready:
+            self._ready.set()
+            WORKER_READY.set(1)
+            log.info("Worker %d ready", os.getpid())
+
+
+async def warm_inference(infer_fn, versions: List[str], sizes: List[int] = WARMUP_BATCH_SIZES,
+                         width: int = WARMUP_WIDTH):
+    """One infer call per (version, batch size), all in flight at once."""
+    await asyncio.gather(*(infer_fn([[0.0] * width] * n, v) for v in versions for n in sizes))
@@ -0,0 +1,39 @@
+"""Multi-worker serving: ``gunicorn -c gunicorn.conf.py app.main:app``.
+
+Workers import the app after the fork (no preload), so each opens its own
+Triton, Redis and Postgres clients and warms them before it accepts requests.
+With more than one worker, metrics from all of them are merged on /metrics
+through prometheus_client's multiprocess mode, which does not keep exemplars.
+A single worker keeps the in-process registry, exemplars included.
+"""
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("API_WORKERS", str(os.cpu_count() or 1)))
+
+# Must be set before any worker imports prometheus_client
+if workers > 1:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/api-prometheus")
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = False
+# Leaves room for warmup (WARMUP_WAIT_SEC) on a cold Triton
+timeout = int(os.getenv("API_WORKER_TIMEOUT_SEC", "60"))
+graceful_timeout = int(os.getenv("API_GRACEFUL_TIMEOUT_SEC", "30"))
+keepalive = 5
+
+
+def on_starting(server):
+    if not MULTIPROC_DIR:
+        return
+    # Files from a previous run would be merged into the new counters
+    shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if not MULTIPROC_DIR:
+        return
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,91 @@
+"""Per-symbol rolling microstructure state for the ingest service.
+
+Memory budget: each symbol holds two ``array('d')`` rings of ``AGG_WINDOW``
+doubles (spread and tick time) plus a ``__slots__`` object, i.e. roughly
+``2 * 8 * AGG_WINDOW + ~350`` bytes. With the default window of 64 that is
+about 1.4 KB per symbol, so the default cap of ``AGG_MAX_SYMBOLS=50000``
+stays under ~70 MB; the least recently ticked symbol is evicted beyond the
+cap. ``tests/test_ingest_aggregates.py`` measures this and fails if a symbol
+costs more than ``BYTES_PER_SYMBOL_BUDGET``.
+"""
+import os
+import math
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional
+
+AGG_WINDOW = int(os.getenv("AGG_WINDOW", "64"))
+AGG_EWMA_ALPHA = float(os.getenv("AGG_EWMA_ALPHA", "0.1"))
+AGG_MAX_SYMBOLS = int(os.getenv("AGG_MAX_SYMBOLS", "50000"))
+BYTES_PER_SYMBOL_BUDGET = 16 * AGG_WINDOW + 1024
+
+
+class SymbolState:
+    __slots__ = ("spreads", "times", "idx", "count", "ewma", "last")
+
+    def __init__(self, window: int):
+        self.spreads = array("d", bytes(8 * window))
+        self.times = array("d", bytes(8 * window))
+        self.idx = 0
+        self.count = 0
+        self.ewma = 0.0
+        self.last = 0.0
+
+    def update(self, spread: float, ts_ms: float, alpha: float):
+        self.ewma = spread if self.count == 0 else alpha * spread + (1.0 - alpha) * self.ewma
+        self.spreads[self.idx] = spread
+        self.times[self.idx] = ts_ms
+        self.idx = (self.idx + 1) % len(self.spreads)
+        self.count += 1
+        self.last = spread
+
+    def features(self) -> Dict[str, float]:
+        window = len(self.spreads)
+        n = min(self.count, window)
+        buf = self.spreads if n == window else self.spreads[:n]
+        mean = math.fsum(buf) / n
+        var = math.fsum((x - mean) ** 2 for x in buf) / n
+        vol = math.sqrt(var)
+        newest = self.times[(self.idx - 1) % window]
+        oldest = self.times[self.idx % window] if n == window else self.times[0]
+        span_s = (newest - oldest) / 1000.0
+        return {
+            "spread_bps": self.last,
+            "ewma_spread_bps": self.ewma,
+            "vol_bps": vol,
+            "tick_rate_hz": (n - 1) / span_s if span_s > 0 else 0.0,
+            "zscore": (self.last - mean) / vol if vol > 0 else 0.0,
+            "n": n,
+            "ts": newest,
+        }
+
+
+class RollingAggregates:
+    """Bounded map of symbol -> SymbolState with least-recently-ticked eviction."""
+
+    def __init__(self, window: int = AGG_WINDOW, alpha: float = AGG_EWMA_ALPHA, max_symbols: int = AGG_MAX_SYMBOLS):
+        self.window = window
+        self.alpha = alpha
+        self.max_symbols = max_symbols
+        self._states: "OrderedDict[str, SymbolState]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._states)
+
+    def update(self, symbol: str, spread: float, ts_ms: Optional[float] = None):
+        st = self._states.get(symbol)
+        if st is None:
+            st = self._states[symbol] = SymbolState(self.window)
+            if len(self._states) > self.max_symbols:
+                self._states.popitem(last=False)
+        else:
+            self._states.move_to_end(symbol)
+            # late ticks would make the rolling state disagree with the coalesced spread
+            if ts_ms is not None and ts_ms < st.times[(st.idx - 1) % self.window]:
+                return
+        st.update(spread, ts_ms if ts_ms is not None else time.time() * 1000.0, self.alpha)
+
+    def features(self, symbol: str) -> Optional[Dict[str, float]]:
+        st = self._states.get(symbol)
+        return st.features() if st is not None else None
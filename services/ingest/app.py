@@ -1,47 +1,310 @@
 import os
+import sys
 import json
 import time
-from kafka import KafkaConsumer
+import shutil
+import signal
+from typing import Dict, Iterable, Tuple
+
+# Worker processes share metrics through prometheus_client's multiprocess mode,
+# which has to be configured before prometheus_client is imported.
+WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+if WORKERS > 1:
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        # first (supervisor) import only; spawned workers inherit the variable
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = "/tmp/ingest-prometheus"
+        shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+import multiprocessing as mp
+import orjson
+from kafka import ConsumerRebalanceListener, KafkaConsumer
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess, start_http_server
 import redis
+from aggregates import RollingAggregates
 
 BROKERS = os.getenv("KAFKA_BROKERS", "redpanda:9092")
 TOPIC = os.getenv("KAFKA_TOPIC", "ticks")
 GROUP = os.getenv("KAFKA_GROUP", "ingest-1")
 REDIS_URL = os.getenv("REDIS_URL", "redis://:redispassword@redis:6379/0")
 TTL = int(os.getenv("SPREAD_TTL_SEC", "180"))
+# API processes subscribe here to keep their in-process spread cache current
+SPREAD_CHANNEL = os.getenv("SPREAD_CHANNEL", "te:spread_bps")
+BATCH_MAX = int(os.getenv("INGEST_BATCH_MAX", "5000"))
+POLL_TIMEOUT_MS = int(os.getenv("INGEST_POLL_TIMEOUT_MS", "100"))
+# Coalesce across polls for at most this long before writing to Redis
+FLUSH_MS = int(os.getenv("INGEST_FLUSH_MS", "50"))
+# Redis retries per flush (backoff 0.1s doubling); keeps a stuck flush well inside max.poll.interval.ms
+FLUSH_RETRIES = int(os.getenv("INGEST_FLUSH_RETRIES", "4"))
+# Print one summary line per this many consumed records (0 = never)
+LOG_EVERY = int(os.getenv("INGEST_LOG_EVERY", "10000"))
+LAG_INTERVAL_SEC = float(os.getenv("INGEST_LAG_INTERVAL_SEC", "5"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+# Publish rolling per-symbol features to te:features:{SYMBOL}
+AGGREGATES_ENABLED = os.getenv("AGGREGATES_ENABLED", "true").lower() in ("1", "true", "yes")
 
-r = redis.from_url(REDIS_URL, socket_connect_timeout=1.0, socket_timeout=1.0)
+CONSUMED = Counter("ingest_records_total", "Tick records consumed from Kafka")
+WRITTEN = Counter("ingest_symbols_written_total", "Symbol spreads written to Redis (after coalescing)")
+ERRORS = Counter("ingest_errors_total", "Ingest errors", ["kind"])
+REBALANCES = Counter("ingest_rebalances_total", "Partition assignment changes", ["event"])
+BATCH = Histogram("ingest_batch_records", "Records per Redis flush",
+                  buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+FLUSH = Histogram("ingest_flush_latency_ms", "Redis flush latency per batch (ms)",
+                  buckets=(0.5, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+TICK_TO_REDIS = Histogram("ingest_tick_to_redis_ms", "Tick ts to Redis write, per flushed symbol (ms)",
+                          buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 30000))
+# Each partition has one owner; the revoking worker zeroes its value so max is the live owner's
+LAG = Gauge("ingest_consumer_lag", "Records behind the partition high-water mark", ["partition"],
+            multiprocess_mode="livemax")
 
 
-def write_spread(symbol: str, spread: float):
-    key = f"te:spread_bps:{symbol}"
-    pipe = r.pipeline()
-    pipe.set(key, spread, ex=TTL)
-    pipe.execute()
+class _Rebalance(ConsumerRebalanceListener):
+    def __init__(self, worker: "Worker"):
+        self.worker = worker
 
+    def on_partitions_revoked(self, revoked):
+        self.worker.on_revoked(revoked)
 
-def main():
-    # Auto-create topics is on by default in Redpanda in dev
-    consumer = KafkaConsumer(
-        TOPIC,
-        bootstrap_servers=[BROKERS],
-        group_id=GROUP,
-        value_deserializer=lambda m: json.loads(m.decode("utf-8")),
-        auto_offset_reset="earliest",
-        enable_auto_commit=True,
-        api_version_auto_timeout_ms=5000,
-    )
-    print(
-        f"[ingest] consuming {TOPIC} from {BROKERS}; writing spreads with TTL={TTL}s")
-    for msg in consumer:
+    def on_partitions_assigned(self, assigned):
+        self.worker.on_assigned(assigned)
+
+
+class Worker:
+    """One consumer-group member with its own Redis pool and coalescing buffer.
+
+    Ticks are coalesced per symbol across polls and flushed (one pipeline)
+    once ``BATCH_MAX`` records or ``FLUSH_MS`` have accumulated. Offsets are
+    committed only after a flush, and pending writes are flushed and
+    committed before partitions are given up in a rebalance or on ``stop``.
+    """
+
+    def __init__(self, worker_id: int = 0):
+        self.worker_id = worker_id
+        self.r = redis.from_url(REDIS_URL, socket_connect_timeout=1.0, socket_timeout=1.0)
+        self.aggs = RollingAggregates() if AGGREGATES_ENABLED else None
+        self.consumer = None
+        self.pending: Dict[str, Tuple[float, object]] = {}
+        self.pending_records = 0
+        self.pending_since = 0.0
+        self.seen = 0
+        self.next_log = LOG_EVERY
+        self.stopping = False
+
+    def log(self, msg: str):
+        print(f"[ingest:{self.worker_id}] {msg}")
+
+    def write_spreads(self, latest: Dict[str, Tuple[float, object]]):
+        """One pipelined round trip: SET with TTL per symbol (plus its feature hash) and a single pub/sub update.
+
+        The update carries the aggregates too, so API processes hold them in their L1 cache.
+        """
+        if not latest:
+            return
+        pipe = self.r.pipeline(transaction=False)
+        updates = []
+        for symbol, (spread, ts) in latest.items():
+            pipe.set(f"te:spread_bps:{symbol}", spread, ex=TTL)
+            update = {"symbol": symbol, "spread_bps": spread, "ts": ts}
+            feats = self.aggs.features(symbol) if self.aggs is not None else None
+            if feats is not None:
+                key = f"te:features:{symbol}"
+                pipe.hset(key, mapping=feats)
+                pipe.expire(key, TTL)
+                update["features"] = feats
+            updates.append(update)
+        pipe.publish(SPREAD_CHANNEL, json.dumps(updates))
+        pipe.execute()
+
+    def coalesce(self, values: Iterable[bytes]):
+        """Fold ticks into ``pending``, keeping the newest per symbol (by ``ts``, then arrival order).
+
+        Every tick still feeds the rolling aggregates before it is coalesced away.
+        """
+        latest = self.pending
+        for raw in values:
+            try:
+                v = orjson.loads(raw)
+                symbol = v["symbol"]
+                spread = float(v["spread_bps"])
+            except Exception:
+                ERRORS.labels("decode").inc()
+                continue
+            ts = v.get("ts")
+            if self.aggs is not None:
+                self.aggs.update(symbol, spread, ts)
+            prev = latest.get(symbol)
+            if prev is not None and ts is not None and prev[1] is not None and ts < prev[1]:
+                continue
+            latest[symbol] = (spread, ts)
+
+    def flush(self):
+        """Write and commit what is pending; raises the last Redis error once retries run out.
+
+        On failure nothing is committed and the pending ticks are kept.
+        """
+        if not self.pending_records:
+            return
+        latest = self.pending
+        backoff = 0.1
+        for attempt in range(FLUSH_RETRIES + 1):
+            t0 = time.perf_counter()
+            try:
+                self.write_spreads(latest)
+                break
+            except Exception as e:
+                ERRORS.labels("redis").inc()
+                if attempt == FLUSH_RETRIES or self.stopping:
+                    raise
+                self.log(f"redis flush failed ({e}); retrying in {backoff:.1f}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 5.0)
+        FLUSH.observe((time.perf_counter() - t0) * 1000)
+        BATCH.observe(self.pending_records)
+        WRITTEN.inc(len(latest))
+        now_ms = time.time() * 1000
+        for _, ts in latest.values():
+            if isinstance(ts, (int, float)):
+                TICK_TO_REDIS.observe(max(0.0, now_ms - ts))
+        # offsets only move once everything polled so far is in Redis
+        self.consumer.commit()
+        self.pending = {}
+        self.pending_records = 0
+
+    def on_revoked(self, revoked):
+        REBALANCES.labels("revoked").inc()
+        try:
+            self.flush()
+        except Exception as e:
+            ERRORS.labels("commit").inc()
+            self.log(f"flush before revoke failed: {e}")
+            # uncommitted, so the next owner re-reads these ticks; writing them later could clobber its newer ones
+            self.pending = {}
+            self.pending_records = 0
+        for tp in revoked:
+            LAG.labels(str(tp.partition)).set(0)
+        self.log(f"revoked {sorted(tp.partition for tp in revoked)}")
+
+    def on_assigned(self, assigned):
+        REBALANCES.labels("assigned").inc()
+        self.log(f"assigned {sorted(tp.partition for tp in assigned)}")
+
+    def update_lag(self):
+        for tp in self.consumer.assignment():
+            high = self.consumer.highwater(tp)
+            if high is None:
+                continue
+            LAG.labels(str(tp.partition)).set(max(0, high - self.consumer.position(tp)))
+
+    def stop(self, *_):
+        """Signal-safe: the poll loop exits after the current poll and shuts down cleanly."""
+        self.stopping = True
+
+    def close(self):
+        """Flush and commit what is pending, then leave the group so partitions move right away."""
         try:
-            v = msg.value
-            symbol = v["symbol"]
-            spread = float(v["spread_bps"])
-            write_spread(symbol, spread)
-            print(f"[ingest] {symbol} spread_bps={spread}")
+            self.flush()
         except Exception as e:
-            print(f"[ingest] error: {e} value={getattr(msg,'value',None)}")
+            ERRORS.labels("commit").inc()
+            self.log(f"final flush failed: {e}")
+        self.consumer.close()
+        self.log("stopped")
+
+    def run(self):
+        # Auto-create topics is on by default in Redpanda in dev
+        self.consumer = KafkaConsumer(
+            bootstrap_servers=[BROKERS],
+            group_id=GROUP,
+            client_id=f"ingest-{os.getpid()}",
+            auto_offset_reset="earliest",
+            enable_auto_commit=False,
+            max_poll_records=BATCH_MAX,
+            api_version_auto_timeout_ms=5000,
+        )
+        self.consumer.subscribe([TOPIC], listener=_Rebalance(self))
+        self.log(f"consuming {TOPIC} from {BROKERS} as {GROUP}; TTL={TTL}s, batches of up to {BATCH_MAX}")
+        next_lag = 0.0
+        try:
+            while not self.stopping:
+                polled = self.consumer.poll(timeout_ms=POLL_TIMEOUT_MS, max_records=BATCH_MAX)
+                n = 0
+                for recs in polled.values():
+                    n += len(recs)
+                    self.coalesce(rec.value for rec in recs)
+                if n:
+                    if not self.pending_records:
+                        self.pending_since = time.monotonic()
+                    self.pending_records += n
+                    CONSUMED.inc(n)
+                    self.seen += n
+                    if LOG_EVERY and self.seen >= self.next_log:
+                        self.log(f"{self.seen} records consumed; {len(self.pending)} symbols pending")
+                        self.next_log = self.seen + LOG_EVERY
+                if self.pending_records and (self.pending_records >= BATCH_MAX
+                                             or (time.monotonic() - self.pending_since) * 1000 >= FLUSH_MS):
+                    try:
+                        self.flush()
+                    except Exception as e:
+                        # keep polling (and stay in the group); the ticks stay pending for the next flush
+                        self.log(f"flush failed, {self.pending_records} records pending: {e}")
+                now = time.monotonic()
+                if now >= next_lag:
+                    self.update_lag()
+                    next_lag = now + LAG_INTERVAL_SEC
+        finally:
+            self.close()
+
+
+def _serve(worker: Worker):
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+def _run_worker(worker_id: int):
+    _serve(Worker(worker_id))
+
+
+def supervise(n: int):
+    """Run ``n`` workers in one consumer group and serve their aggregated metrics."""
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(METRICS_PORT, registry=registry)
+
+    ctx = mp.get_context("spawn")
+    procs = {}
+
+    def spawn(i):
+        p = ctx.Process(target=_run_worker, args=(i,), name=f"ingest-{i}", daemon=True)
+        p.start()
+        procs[i] = p
+
+    def stop(*_):
+        for p in procs.values():
+            p.terminate()
+        for p in procs.values():
+            p.join(timeout=10)
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for i in range(n):
+        spawn(i)
+    print(f"[ingest] supervising {n} workers in group {GROUP}; metrics on :{METRICS_PORT}")
+    while True:
+        time.sleep(1.0)
+        for i, p in list(procs.items()):
+            if not p.is_alive():
+                print(f"[ingest] worker {i} (pid {p.pid}) exited with {p.exitcode}; restarting")
+                multiprocess.mark_process_dead(p.pid)
+                spawn(i)
+
+
+def main():
+    if WORKERS > 1:
+        supervise(WORKERS)
+        return
+    start_http_server(METRICS_PORT)
+    _serve(Worker(0))
 
 
 if __name__ == "__main__":
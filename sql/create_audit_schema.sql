@@ -1,6 +1,23 @@
 CREATE SCHEMA IF NOT EXISTS audit;
+
+-- Databases created before partitioning have a plain audit.decisions: keep it as
+-- audit.decisions_legacy, which audit.migrate_legacy() drains into the new table.
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+             WHERE n.nspname = 'audit' AND c.relname = 'decisions' AND c.relkind = 'r') THEN
+    ALTER TABLE audit.decisions ADD COLUMN IF NOT EXISTS feature_source TEXT;
+    ALTER TABLE audit.decisions RENAME TO decisions_legacy;
+    ALTER TABLE audit.decisions_legacy RENAME CONSTRAINT decisions_pkey TO decisions_legacy_pkey;
+  END IF;
+END $$;
+
+-- Shared with the legacy table so ids keep increasing across the migration
+CREATE SEQUENCE IF NOT EXISTS audit.decisions_id_seq;
+
+-- Daily range partitions on ts (UTC days), created ahead by audit.ensure_partitions()
 CREATE TABLE IF NOT EXISTS audit.decisions (
-  id BIGSERIAL PRIMARY KEY,
+  id BIGINT NOT NULL DEFAULT nextval('audit.decisions_id_seq'),
   ts timestamptz NOT NULL DEFAULT now(),
   corr_id TEXT NOT NULL,
   symbol TEXT NOT NULL,
@@ -9,7 +26,245 @@ CREATE TABLE IF NOT EXISTS audit.decisions (
   latency_ms INTEGER,
   reason TEXT,
   model_tag TEXT,
+  -- Per-stage timings; NULL for stages that did not run (kept out of latency_minute)
   feature_ms INTEGER,
   inference_ms INTEGER,
-  policy_ms INTEGER
+  policy_ms INTEGER,
+  -- Which source answered the spread lookup: cache | stream | feast
+  feature_source TEXT,
+  -- Spread the guardrails were applied to; NULL when the lookup found none
+  spread_bps DOUBLE PRECISION,
+  PRIMARY KEY (id, ts)
+) PARTITION BY RANGE (ts);
+ALTER TABLE audit.decisions ADD COLUMN IF NOT EXISTS spread_bps DOUBLE PRECISION;
+ALTER SEQUENCE audit.decisions_id_seq OWNED BY audit.decisions.id;
+
+-- Catches rows outside every daily partition so audit writes never fail
+CREATE TABLE IF NOT EXISTS audit.decisions_default PARTITION OF audit.decisions DEFAULT;
+
+-- Rows arrive in ts order, so a BRIN index stays tiny and still prunes time ranges
+CREATE INDEX IF NOT EXISTS decisions_ts_brin ON audit.decisions USING brin (ts) WITH (pages_per_range = 32);
+CREATE INDEX IF NOT EXISTS decisions_symbol_ts_idx ON audit.decisions (symbol, ts);
+
+CREATE OR REPLACE FUNCTION audit.create_partition(day date) RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+  part text := format('decisions_p%s', to_char(day, 'YYYYMMDD'));
+  lo timestamptz := day::timestamp AT TIME ZONE 'UTC';
+  hi timestamptz := (day + 1)::timestamp AT TIME ZONE 'UTC';
+BEGIN
+  IF to_regclass(format('audit.%I', part)) IS NOT NULL THEN
+    RETURN;
+  END IF;
+  IF EXISTS (SELECT 1 FROM audit.decisions_default WHERE ts >= lo AND ts < hi) THEN
+    -- The day already has rows in the default partition: move them into the new
+    -- partition before attaching it (direct inserts skip the rollup trigger).
+    EXECUTE format('CREATE TABLE audit.%I (LIKE audit.decisions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part);
+    EXECUTE format('WITH moved AS (DELETE FROM audit.decisions_default WHERE ts >= $1 AND ts < $2 RETURNING *) '
+                   'INSERT INTO audit.%I SELECT * FROM moved', part) USING lo, hi;
+    EXECUTE format('ALTER TABLE audit.decisions ATTACH PARTITION audit.%I FOR VALUES FROM (%L) TO (%L)', part, lo, hi);
+  ELSE
+    EXECUTE format('CREATE TABLE audit.%I PARTITION OF audit.decisions FOR VALUES FROM (%L) TO (%L)', part, lo, hi);
+  END IF;
+END $$;
+
+-- Partitions from yesterday through days_ahead days from now
+CREATE OR REPLACE FUNCTION audit.ensure_partitions(days_ahead int DEFAULT 3) RETURNS void
+LANGUAGE plpgsql AS $$
+DECLARE
+  today date := (now() AT TIME ZONE 'UTC')::date;
+BEGIN
+  FOR i IN -1..days_ahead LOOP
+    PERFORM audit.create_partition(today + i);
+  END LOOP;
+END $$;
+
+-- Drops daily partitions that ended more than keep_days ago; returns how many
+CREATE OR REPLACE FUNCTION audit.drop_partitions(keep_days int) RETURNS int
+LANGUAGE plpgsql AS $$
+DECLARE
+  cutoff date := (now() AT TIME ZONE 'UTC')::date - keep_days;
+  part record;
+  dropped int := 0;
+BEGIN
+  FOR part IN
+    SELECT c.relname FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'audit.decisions'::regclass AND c.relname ~ '^decisions_p[0-9]{8}$'
+      AND to_date(substr(c.relname, 12), 'YYYYMMDD') < cutoff
+  LOOP
+    EXECUTE format('ALTER TABLE audit.decisions DETACH PARTITION audit.%I', part.relname);
+    EXECUTE format('DROP TABLE audit.%I', part.relname);
+    dropped := dropped + 1;
+  END LOOP;
+  RETURN dropped;
+END $$;
+
+-- ---------- per-minute rollups ----------
+
+CREATE TABLE IF NOT EXISTS audit.decision_minute (
+  minute timestamptz NOT NULL,
+  model_tag TEXT NOT NULL,
+  decision TEXT NOT NULL,
+  reason TEXT NOT NULL,  -- parameters stripped: stale_event(age_ms=...) -> stale_event
+  n BIGINT NOT NULL,
+  PRIMARY KEY (minute, model_tag, decision, reason)
 );
+
+-- Latency per stage as a histogram over audit.latency_bounds(), so any range of
+-- minutes merges exactly (audit.hist_sum) before taking percentiles
+CREATE TABLE IF NOT EXISTS audit.latency_minute (
+  minute timestamptz NOT NULL,
+  model_tag TEXT NOT NULL,
+  stage TEXT NOT NULL,  -- e2e | feature | inference | policy
+  n BIGINT NOT NULL,
+  sum_ms BIGINT NOT NULL,
+  max_ms INTEGER NOT NULL,
+  buckets BIGINT[] NOT NULL,
+  PRIMARY KEY (minute, model_tag, stage)
+);
+
+-- Lower bounds (ms) of the histogram buckets; the last bucket is open-ended
+CREATE OR REPLACE FUNCTION audit.latency_bounds() RETURNS int[]
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT '{0,1,2,3,4,5,6,8,10,13,16,20,25,32,40,50,65,80,100,130,160,200,250,320,400,500,650,800,1000,1300,1600,2000,3000,5000}'::int[]
+$$;
+
+CREATE OR REPLACE FUNCTION audit.hist_add(a bigint[], b bigint[]) RETURNS bigint[]
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT CASE WHEN a IS NULL THEN b WHEN b IS NULL THEN a
+    ELSE ARRAY(SELECT coalesce(x, 0) + coalesce(y, 0) FROM unnest(a, b) WITH ORDINALITY AS t(x, y, i) ORDER BY i) END
+$$;
+
+-- Dense histogram from sparse (bucket, count) pairs
+CREATE OR REPLACE FUNCTION audit.hist_from(idx int[], counts bigint[]) RETURNS bigint[]
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+  h bigint[] := array_fill(0::bigint, ARRAY[array_length(audit.latency_bounds(), 1)]);
+BEGIN
+  FOR i IN 1..array_length(idx, 1) LOOP
+    h[idx[i]] := h[idx[i]] + counts[i];
+  END LOOP;
+  RETURN h;
+END $$;
+
+CREATE OR REPLACE AGGREGATE audit.hist_sum(bigint[]) (SFUNC = audit.hist_add, STYPE = bigint[]);
+
+-- q-quantile of a histogram, interpolated linearly inside its bucket
+CREATE OR REPLACE FUNCTION audit.hist_quantile(buckets bigint[], q double precision) RETURNS double precision
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+  bounds int[] := audit.latency_bounds();
+  total bigint := 0;
+  rank double precision;
+  seen bigint := 0;
+  c bigint;
+BEGIN
+  SELECT sum(x) INTO total FROM unnest(buckets) AS x;
+  IF total IS NULL OR total = 0 THEN
+    RETURN NULL;
+  END IF;
+  rank := q * total;
+  FOR i IN 1..array_length(buckets, 1) LOOP
+    c := buckets[i];
+    IF c > 0 AND seen + c >= rank THEN
+      IF i = array_length(bounds, 1) THEN
+        RETURN bounds[i];
+      END IF;
+      RETURN bounds[i] + (bounds[i + 1] - bounds[i]) * (rank - seen) / c;
+    END IF;
+    seen := seen + c;
+  END LOOP;
+  RETURN bounds[array_length(bounds, 1)];
+END $$;
+
+-- Folds each inserted batch (one COPY flush) into the rollups. Keys are locked in a
+-- fixed order so concurrent writers cannot deadlock on the same minute.
+CREATE OR REPLACE FUNCTION audit.rollup_decisions() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  INSERT INTO audit.decision_minute AS d (minute, model_tag, decision, reason, n)
+  SELECT date_trunc('minute', ts), coalesce(model_tag, ''), decision, coalesce(split_part(reason, '(', 1), ''), count(*)
+  FROM new_rows GROUP BY 1, 2, 3, 4 ORDER BY 1, 2, 3, 4
+  ON CONFLICT (minute, model_tag, decision, reason) DO UPDATE SET n = d.n + EXCLUDED.n;
+
+  WITH obs AS (
+    SELECT date_trunc('minute', r.ts) AS minute, coalesce(r.model_tag, '') AS model_tag, s.stage, s.ms,
+           greatest(width_bucket(s.ms, audit.latency_bounds()), 1) AS bucket
+    FROM new_rows r,
+         LATERAL (VALUES ('e2e', r.latency_ms), ('feature', r.feature_ms),
+                         ('inference', r.inference_ms), ('policy', r.policy_ms)) AS s(stage, ms)
+    WHERE s.ms IS NOT NULL
+  ), per_bucket AS (
+    SELECT minute, model_tag, stage, bucket, count(*) AS n, sum(ms) AS sum_ms, max(ms) AS max_ms
+    FROM obs GROUP BY 1, 2, 3, 4
+  ), per_key AS (
+    SELECT minute, model_tag, stage, sum(n) AS n, sum(sum_ms) AS sum_ms, max(max_ms) AS max_ms,
+           audit.hist_from(array_agg(bucket), array_agg(n)) AS buckets
+    FROM per_bucket GROUP BY 1, 2, 3
+  )
+  INSERT INTO audit.latency_minute AS l (minute, model_tag, stage, n, sum_ms, max_ms, buckets)
+  SELECT minute, model_tag, stage, n, sum_ms, max_ms, buckets FROM per_key ORDER BY 1, 2, 3
+  ON CONFLICT (minute, model_tag, stage) DO UPDATE SET
+    n = l.n + EXCLUDED.n, sum_ms = l.sum_ms + EXCLUDED.sum_ms,
+    max_ms = greatest(l.max_ms, EXCLUDED.max_ms), buckets = audit.hist_add(l.buckets, EXCLUDED.buckets);
+  RETURN NULL;
+END $$;
+
+CREATE OR REPLACE TRIGGER decisions_rollup AFTER INSERT ON audit.decisions
+  REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION audit.rollup_decisions();
+
+-- ---------- maintenance ----------
+
+-- Moves the oldest batch_rows rows of audit.decisions_legacy into the partitioned
+-- table (and its rollups); drops the legacy table once empty. Returns rows moved,
+-- 0 when done and -1 when another session is migrating.
+CREATE OR REPLACE FUNCTION audit.migrate_legacy(batch_rows int DEFAULT 50000) RETURNS bigint
+LANGUAGE plpgsql AS $$
+DECLARE
+  moved bigint;
+  day date;
+BEGIN
+  IF to_regclass('audit.decisions_legacy') IS NULL THEN
+    RETURN 0;
+  END IF;
+  IF NOT pg_try_advisory_xact_lock(hashtext('audit.migrate_legacy')) THEN
+    RETURN -1;
+  END IF;
+  CREATE TEMP TABLE legacy_batch ON COMMIT DROP AS
+    SELECT * FROM audit.decisions_legacy ORDER BY id LIMIT batch_rows;
+  FOR day IN SELECT DISTINCT (ts AT TIME ZONE 'UTC')::date FROM legacy_batch LOOP
+    PERFORM audit.create_partition(day);
+  END LOOP;
+  INSERT INTO audit.decisions (id, ts, corr_id, symbol, decision, confidence, latency_ms, reason, model_tag,
+                               feature_ms, inference_ms, policy_ms, feature_source)
+  SELECT id, ts, corr_id, symbol, decision, confidence, latency_ms, reason, model_tag,
+         -- legacy abstains wrote 0 for stages that never ran
+         CASE WHEN decision = 'ABSTAIN' THEN nullif(feature_ms, 0) ELSE feature_ms END,
+         CASE WHEN decision = 'ABSTAIN' THEN nullif(inference_ms, 0) ELSE inference_ms END,
+         CASE WHEN decision = 'ABSTAIN' THEN nullif(policy_ms, 0) ELSE policy_ms END,
+         feature_source FROM legacy_batch;
+  GET DIAGNOSTICS moved = ROW_COUNT;
+  DELETE FROM audit.decisions_legacy l USING legacy_batch b WHERE l.id = b.id;
+  IF moved = 0 THEN
+    DROP TABLE audit.decisions_legacy;
+  END IF;
+  RETURN moved;
+END $$;
+
+-- One maintenance pass, run by at most one session at a time: partitions ahead,
+-- retention of raw partitions and of rollups. Returns false if another session holds it.
+CREATE OR REPLACE FUNCTION audit.maintain(days_ahead int, keep_days int, rollup_keep_days int) RETURNS boolean
+LANGUAGE plpgsql AS $$
+BEGIN
+  IF NOT pg_try_advisory_xact_lock(hashtext('audit.maintain')) THEN
+    RETURN false;
+  END IF;
+  PERFORM audit.ensure_partitions(days_ahead);
+  PERFORM audit.drop_partitions(keep_days);
+  DELETE FROM audit.decision_minute WHERE minute < now() - make_interval(days => rollup_keep_days);
+  DELETE FROM audit.latency_minute WHERE minute < now() - make_interval(days => rollup_keep_days);
+  RETURN true;
+END $$;
+
+SELECT audit.ensure_partitions();
@@ -0,0 +1,109 @@
+"""Local stand-ins for the API's external services, for in-process benchmarks.
+
+- Redis (spread stream + Feast online store): fakeredis sharing one FakeServer
+- Triton: a KServe v2 infer stub behind httpx.MockTransport, speaking both the
+  JSON and binary tensor protocols, with configurable per-call latency
+- Postgres audit: an in-memory sink replacing db.write_decisions; maintenance is a no-op
+"""
+import os
+import json
+import asyncio
+import functools
+import tempfile
+from typing import List
+import numpy as np
+import httpx
+import fakeredis
+
+HEADER_LEN = "Inference-Header-Content-Length"
+
+
+def configure_env(microbatch_window_us: int = 300, l1_cache: bool = True, ood_min_count: int = 100):
+    """Set env read at import time; call before importing ``app.main``."""
+    state = tempfile.mkdtemp(prefix="rt-tec-bench-")
+    os.environ.update({
+        "MICROBATCH_WINDOW_US": str(microbatch_window_us),
+        "FEATURE_CACHE_ENABLED": "true" if l1_cache else "false",
+        "OOD_MIN_COUNT": str(ood_min_count),
+        "OOD_SNAPSHOT_PATH": os.path.join(state, "ood_stats.npz"),
+        "OOD_SNAPSHOT_SEC": "0",
+        "CANARY_ENABLED": "false",
+    })
+
+
+class StubTriton:
+    """Minimal v2 infer endpoint: P(trade) = sigmoid(mean(features)), after ``latency_ms``."""
+
+    def __init__(self, latency_ms: float = 0.5):
+        self.latency_s = latency_ms / 1000.0
+        self.status = 200  # anything else makes every call fail
+        self.calls = 0
+        self.rows = 0
+        self.max_rows = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency_s > 0:
+            await asyncio.sleep(self.latency_s)
+        if self.status != 200:
+            return httpx.Response(self.status, text="stub failure")
+        body = request.content
+        header_len = request.headers.get(HEADER_LEN)
+        if header_len is not None:
+            hl = int(header_len)
+            header = json.loads(body[:hl])
+            shape = header["inputs"][0]["shape"]
+            x = np.frombuffer(body, dtype=np.float32, offset=hl).reshape(shape)
+        else:
+            header = json.loads(body)
+            x = np.asarray(header["inputs"][0]["data"], dtype=np.float32).reshape(header["inputs"][0]["shape"])
+        p = 1.0 / (1.0 + np.exp(-x.mean(axis=1)))
+        prob = np.stack([1.0 - p, p], axis=1).astype(np.float32)
+        self.calls += 1
+        self.rows += x.shape[0]
+        self.max_rows = max(self.max_rows, x.shape[0])
+        if header_len is None:
+            return httpx.Response(200, json={"outputs": [{"name": "prob", "datatype": "FP32",
+                                                          "shape": list(prob.shape), "data": prob.ravel().tolist()}]})
+        out = json.dumps({"outputs": [{"name": "prob", "datatype": "FP32", "shape": list(prob.shape),
+                                       "parameters": {"binary_data_size": prob.nbytes}}]}).encode()
+        return httpx.Response(200, content=out + prob.tobytes(), headers={HEADER_LEN: str(len(out))})
+
+
+class AuditSink:
+    def __init__(self):
+        self.rows: List[dict] = []
+        self.flushes = 0
+
+    def write(self, rows: List[dict]):
+        self.flushes += 1
+        self.rows.extend(rows)
+
+
+def install(main, symbols, spread_bps: float = 2.0, infer_latency_ms: float = 0.5):
+    """Point an imported ``app.main`` at the fakes; returns (stub_triton, audit_sink)."""
+    from app import audit, db, feature_cache, features, inference
+    from app.feast_reader import FeastRedisReader
+
+    main.ensure_schema = lambda: None
+    db.warm = lambda timeout=None: None
+    db.maintain_audit = lambda *args: True
+    db.migrate_legacy = lambda batch_rows: 0
+
+    server = fakeredis.FakeServer()
+    sync_r = fakeredis.FakeRedis(server=server)
+    for s in symbols:
+        sync_r.set(f"te:spread_bps:{s}", spread_bps)
+    features._r = functools.lru_cache(maxsize=1)(lambda: fakeredis.FakeRedis(server=server))
+    features._ar = functools.lru_cache(maxsize=1)(lambda: fakeredis.FakeAsyncRedis(server=server))
+    features._reader = FeastRedisReader()
+    # the pub/sub subscriber would dial the real Redis; fakeredis values never change,
+    # so reads may fill the cache as if updates were being pushed
+    main.FEATURE_CACHE_ENABLED = False
+    feature_cache.cache.mark_live()
+
+    stub = StubTriton(infer_latency_ms)
+    inference.client._http = httpx.AsyncClient(transport=httpx.MockTransport(stub.handle))
+
+    sink = AuditSink()
+    audit.write_decisions = sink.write
+    return stub, sink
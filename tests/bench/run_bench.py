@@ -0,0 +1,254 @@
+"""In-process benchmark for POST /v1/score with fake Triton, Redis and Postgres.
+
+    python tests/bench/run_bench.py --out bench.json
+    python tests/bench/run_bench.py --baseline bench.json --max-regression 0.15
+
+Reports end-to-end latency and throughput per concurrency level plus per-stage
+latency (feature, inference, policy, audit enqueue) as p50/p99/p999 JSON,
+CPU per request, and the decode+encode CPU of each /v1/score wire codec.
+With --baseline, exits non-zero if p99 or throughput regress past the tolerance.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import itertools
+import platform
+from collections import defaultdict
+
+import logging
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, "services", "api"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes
+
+STAGES = ("feature", "inference", "policy", "audit")
+
+
+def percentiles(samples):
+    if not samples:
+        return {"n": 0}
+    a = np.asarray(samples)
+    p50, p99, p999 = np.percentile(a, [50, 99, 99.9])
+    return {"n": len(samples), "mean": float(a.mean()), "p50": float(p50), "p99": float(p99), "p999": float(p999)}
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def wrap_async(self, fn, stage):
+        async def timed(*a, **kw):
+            t0 = time.perf_counter()
+            try:
+                return await fn(*a, **kw)
+            finally:
+                self.samples[stage].append((time.perf_counter() - t0) * 1000)
+        return timed
+
+    def wrap_sync(self, fn, stage):
+        def timed(*a, **kw):
+            t0 = time.perf_counter()
+            try:
+                return fn(*a, **kw)
+            finally:
+                self.samples[stage].append((time.perf_counter() - t0) * 1000)
+        return timed
+
+    def reset(self):
+        self.samples.clear()
+
+
+def instrument(main, timer: StageTimer):
+    main.fetch_spread_bps = timer.wrap_async(main.fetch_spread_bps, "feature")
+    main.batcher.submit = timer.wrap_async(main.batcher.submit, "inference")
+    main.decide = timer.wrap_sync(main.decide, "policy")
+    main.audit_writer.submit = timer.wrap_sync(main.audit_writer.submit, "audit")
+
+
+def make_payloads(symbols, n, width=8, seed=7):
+    rng = random.Random(seed)
+    return [{"symbol": rng.choice(symbols), "ts_ns": 0, "freshness_ms": 60_000,
+             "features": [round(rng.gauss(0.0, 1.0), 4) for _ in range(width)]} for _ in range(n)]
+
+
+def codec_cpu_us(n=20000):
+    """CPU per request (µs) to decode, validate and encode a /v1/score exchange, per codec."""
+    import msgspec
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from app.codec import MSGPACK, decode_score, respond
+    from app.schemas import FeatureVector
+
+    body = make_payloads(["BTC"], 1)[0]
+    result = {"decision": "TRADE", "conf": 0.91, "corr_id": "0b7c1d9e-5f7e-4f59-9a43-2c1d0e6f8a11",
+              "spread_bps": 2.0, "latency_ms": 3, "reason": "ok"}
+    raw_json, raw_msgpack = json.dumps(body).encode(), msgspec.msgpack.encode(body)
+
+    def pydantic_json():
+        # what FastAPI does for a `payload: FeatureVector` body and a dict return value
+        FeatureVector.model_validate(json.loads(raw_json), from_attributes=True)
+        JSONResponse(jsonable_encoder(result))
+
+    def msgspec_json():
+        decode_score(raw_json, "application/json")
+        respond(result, False)
+
+    def msgpack():
+        decode_score(raw_msgpack, MSGPACK)
+        respond(result, True)
+
+    out = {}
+    for name, fn in (("pydantic+json", pydantic_json), ("msgspec+orjson", msgspec_json), ("msgpack", msgpack)):
+        for _ in range(1000):
+            fn()
+        t0 = time.process_time()
+        for _ in range(n):
+            fn()
+        out[name] = (time.process_time() - t0) / n * 1e6
+    return out
+
+
+async def run_level(client, payloads, concurrency, codec="json"):
+    import msgspec
+    lat = []
+    it = itertools.count()
+    statuses = defaultdict(int)
+    headers = {"content-type": "application/msgpack"} if codec == "msgpack" else {}
+
+    async def worker():
+        while True:
+            i = next(it)
+            if i >= len(payloads):
+                return
+            body = dict(payloads[i], ts_ns=time.time_ns())
+            content = msgspec.msgpack.encode(body) if codec == "msgpack" else msgspec.json.encode(body)
+            t0 = time.perf_counter()
+            r = await client.post("/v1/score", content=content, headers=headers)
+            lat.append((time.perf_counter() - t0) * 1000)
+            if r.status_code != 200:
+                statuses[str(r.status_code)] += 1
+                continue
+            res = msgspec.msgpack.decode(r.content) if codec == "msgpack" else r.json()
+            statuses[res.get("reason", "200")] += 1
+
+    t0, cpu0 = time.perf_counter(), time.process_time()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    return lat, wall, cpu, dict(statuses)
+
+
+async def bench(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("psycopg.pool").setLevel(logging.CRITICAL)
+    fakes.configure_env(microbatch_window_us=args.window_us, l1_cache=not args.no_l1)
+    import httpx
+    from app import main
+
+    symbols = ["".join(chr(65 + (i // 26 ** k) % 26) for k in range(3)) for i in range(args.symbols)]
+    stub, sink = fakes.install(main, symbols, infer_latency_ms=args.infer_latency_ms)
+    timer = StageTimer()
+    instrument(main, timer)
+
+    report = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(), "time": int(time.time()),
+                 "requests": args.requests, "infer_latency_ms": args.infer_latency_ms,
+                 "microbatch_window_us": args.window_us, "l1_cache": not args.no_l1, "symbols": args.symbols,
+                 "codec": args.codec},
+        "levels": {},
+    }
+    await main.app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await run_level(client, make_payloads(symbols, args.warmup, seed=1), min(8, args.concurrency[0]), args.codec)
+            for c in args.concurrency:
+                timer.reset()
+                calls0, rows0 = stub.calls, stub.rows
+                lat, wall, cpu, statuses = await run_level(client, make_payloads(symbols, args.requests), c, args.codec)
+                calls = stub.calls - calls0
+                report["levels"][str(c)] = {
+                    "throughput_rps": len(lat) / wall,
+                    # client and server share the process, so this is an upper bound for the server
+                    "cpu_us_per_request": cpu / len(lat) * 1e6,
+                    "e2e_ms": percentiles(lat),
+                    "stages_ms": {s: percentiles(timer.samples.get(s, [])) for s in STAGES},
+                    "infer_calls": calls,
+                    "rows_per_infer_call": (stub.rows - rows0) / calls if calls else 0.0,
+                    "outcomes": statuses,
+                }
+    finally:
+        await main.app.router.shutdown()
+    report["meta"]["audit_rows"] = len(sink.rows)
+    report["codecs_cpu_us"] = codec_cpu_us(args.codec_iterations)
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """Return a list of human-readable regressions versus ``baseline``."""
+    problems = []
+    for level, cur in report["levels"].items():
+        base = baseline.get("levels", {}).get(level)
+        if base is None:
+            continue
+        if cur["e2e_ms"]["p99"] > base["e2e_ms"]["p99"] * (1 + tolerance):
+            problems.append(f"c={level}: e2e p99 {cur['e2e_ms']['p99']:.3f}ms vs baseline {base['e2e_ms']['p99']:.3f}ms")
+        if cur["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            problems.append(f"c={level}: throughput {cur['throughput_rps']:.0f} rps vs baseline {base['throughput_rps']:.0f} rps")
+    return problems
+
+
+def print_table(report):
+    print(f"{'conc':>5} {'rps':>9} {'p50':>8} {'p99':>8} {'p999':>8}  " + "  ".join(f"{s}_p99" for s in STAGES), file=sys.stderr)
+    for level, r in report["levels"].items():
+        e = r["e2e_ms"]
+        stages = "  ".join(f"{r['stages_ms'][s].get('p99', 0):>{len(s) + 4}.3f}" for s in STAGES)
+        print(f"{level:>5} {r['throughput_rps']:>9.0f} {e['p50']:>8.3f} {e['p99']:>8.3f} {e['p999']:>8.3f}  {stages}", file=sys.stderr)
+    print("codec cpu/request: " + ", ".join(f"{k} {v:.1f}us" for k, v in report["codecs_cpu_us"].items()), file=sys.stderr)
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--requests", type=int, default=5000, help="requests per concurrency level")
+    p.add_argument("--warmup", type=int, default=500)
+    p.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 8, 32, 128])
+    p.add_argument("--symbols", type=int, default=50)
+    p.add_argument("--infer-latency-ms", type=float, default=0.5, help="stub Triton latency per call")
+    p.add_argument("--window-us", type=int, default=300, help="MICROBATCH_WINDOW_US")
+    p.add_argument("--no-l1", action="store_true", help="disable the in-process feature cache")
+    p.add_argument("--codec", choices=("json", "msgpack"), default="json", help="request/response encoding")
+    p.add_argument("--codec-iterations", type=int, default=20000)
+    p.add_argument("--out", help="write the JSON report here (default: stdout)")
+    p.add_argument("--baseline", help="JSON report to compare against")
+    p.add_argument("--max-regression", type=float, default=0.15, help="allowed relative regression")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = asyncio.run(bench(args))
+    print_table(report)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.max_regression)
+        for msg in problems:
+            print(f"REGRESSION {msg}", file=sys.stderr)
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import os, sys
+from datetime import date, datetime, timedelta, timezone
+import pytest
+
+pytest.importorskip("psycopg_pool")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "api"))
+sys.path.insert(0, os.path.join(ROOT, "tests", "bench"))
+
+from app import db
+
+LEGACY_DDL = """
+CREATE SCHEMA audit;
+CREATE TABLE audit.decisions (
+  id BIGSERIAL PRIMARY KEY,
+  ts timestamptz NOT NULL DEFAULT now(),
+  corr_id TEXT NOT NULL,
+  symbol TEXT NOT NULL,
+  decision TEXT NOT NULL CHECK (decision IN ('TRADE','NO_TRADE','ABSTAIN')),
+  confidence DOUBLE PRECISION,
+  latency_ms INTEGER,
+  reason TEXT,
+  model_tag TEXT,
+  feature_ms INTEGER,
+  inference_ms INTEGER,
+  policy_ms INTEGER
+);
+"""
+
+
+@pytest.fixture(scope="module")
+def pg(tmp_path_factory):
+    """A throwaway Postgres holding a pre-partitioning audit.decisions with 1000 rows."""
+    pgserver = pytest.importorskip("pgserver")
+    server = pgserver.get_server(str(tmp_path_factory.mktemp("pgdata")), cleanup_mode="stop")
+    dsn, db.DSN = db.DSN, server.get_uri()
+    db.close()
+    yesterday = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    with db.get_pool().connection() as conn:
+        conn.execute(LEGACY_DDL)
+        with conn.cursor() as cur:
+            # legacy abstains carry 0 ms for the stages they skipped
+            cur.executemany(
+                "INSERT INTO audit.decisions (ts, corr_id, symbol, decision, latency_ms, reason, model_tag,"
+                " feature_ms, inference_ms, policy_ms) VALUES (%s, %s, 'BTC', %s, 3, %s, 'legacy', %s, %s, %s)",
+                [(yesterday + timedelta(seconds=i), f"old-{i}", "NO_TRADE", "low_conf", 1, 4, 0) if i % 10 else
+                 (yesterday + timedelta(seconds=i), f"old-{i}", "ABSTAIN", "stale_features", 1, 0, 0)
+                 for i in range(1000)])
+        conn.commit()
+    db.ensure_schema()
+    yield server
+    db.close()
+    db.DSN = dsn
+
+
+def _count(sql: str, *args) -> int:
+    with db.get_pool().connection() as conn:
+        return conn.execute(sql, args).fetchone()[0]
+
+
+def test_legacy_rows_migrate_in_batches_with_rollups(pg):
+    assert _count("SELECT count(*) FROM audit.decisions") == 0
+    moved = []
+    while (n := db.migrate_legacy(300)) > 0:
+        moved.append(n)
+    assert moved == [300, 300, 300, 100]
+    assert _count("SELECT count(to_regclass('audit.decisions_legacy'))") == 0
+    assert _count("SELECT count(*) FROM audit.decisions_default") == 0
+    # ids keep counting from the legacy sequence
+    db.write_decisions([{"corr_id": "new", "symbol": "BTC", "decision": "TRADE", "reason": "ok", "model_tag": "legacy"}])
+    assert _count("SELECT id FROM audit.decisions WHERE corr_id = 'new'") > 1000
+
+    now = datetime.now(timezone.utc)
+    stats = db.audit_stats(now - timedelta(days=2), now + timedelta(minutes=1), "legacy")
+    assert stats["total"] == 1001
+    assert stats["reasons"] == {"low_conf": 900, "stale_features": 100, "ok": 1}
+    legacy = stats["latency_ms"]["legacy"]
+    assert legacy["e2e"]["n"] == legacy["feature"]["n"] == 1000
+    assert legacy["inference"]["n"] == 900 and legacy["inference"]["p50"] >= 4
+    # policy ran in 0 ms for the guardrail outcomes only
+    assert legacy["policy"]["n"] == 900
+
+
+def test_stats_percentiles_come_from_histograms(pg):
+    ts = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    rows = [{"ts": ts, "corr_id": f"h-{i}", "symbol": "ETH", "decision": "TRADE", "confidence": 0.9,
+             "latency_ms": i % 100 + 1, "reason": "stale_event(age_ms=12)" if i % 10 == 0 else "ok",
+             "model_tag": "hist", "feature_ms": 1, "inference_ms": 2, "policy_ms": 0} for i in range(2000)]
+    for i in range(0, len(rows), 500):
+        db.write_decisions(rows[i:i + 500])
+
+    stats = db.audit_stats(ts, ts + timedelta(minutes=1), "hist")
+    assert stats["total"] == 2000
+    assert stats["reasons"] == {"ok": 1800, "stale_event": 200}
+    e2e = stats["latency_ms"]["hist"]["e2e"]
+    assert e2e["n"] == 2000 and e2e["max"] == 100
+    assert e2e["mean"] == pytest.approx(50.5)
+    # within one bucket of the exact value
+    assert 40 <= e2e["p50"] <= 65 and 80 <= e2e["p90"] <= 100 and e2e["p99"] <= 100
+    assert stats["latency_ms"]["hist"]["policy"]["p99"] == 0
+
+
+def test_abstains_leave_skipped_stage_percentiles_alone(pg):
+    ts = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    window = (ts, ts + timedelta(minutes=1), "skip")
+    scored = [{"ts": ts, "corr_id": f"s-{i}", "symbol": "ETH", "decision": "TRADE", "reason": "ok", "model_tag": "skip",
+               "latency_ms": 30, "feature_ms": 2, "inference_ms": 20 + i % 10, "policy_ms": 0} for i in range(200)]
+    db.write_decisions(scored)
+    before = db.audit_stats(*window)["latency_ms"]["skip"]
+    # shaped like the API's abstains: stages that did not run are NULL
+    abstains = [{"ts": ts, "corr_id": f"a-{i}", "symbol": "ETH", "decision": "ABSTAIN", "reason": reason,
+                 "model_tag": "skip", "latency_ms": 1, "feature_ms": None, "inference_ms": None, "policy_ms": None}
+                for i, reason in enumerate(["ood", "stale_event(age_ms=5)", "breaker_open_inference"] * 100)]
+    db.write_decisions(abstains)
+    after = db.audit_stats(*window)["latency_ms"]["skip"]
+    assert after["inference"] == before["inference"] and after["policy"] == before["policy"]
+    assert after["e2e"]["n"] == 500
+
+
+def test_maintenance_creates_ahead_and_drops_past_retention(pg):
+    old = date.today() - timedelta(days=40)
+    with db.get_pool().connection() as conn:
+        conn.execute("SELECT audit.create_partition(%s)", (old,))
+        conn.commit()
+    assert db.maintain_audit(5, 30, 400)
+    names = lambda d: f"decisions_p{d:%Y%m%d}"
+    present = lambda d: _count("SELECT count(to_regclass(%s))", f"audit.{names(d)}")
+    assert present(date.today() + timedelta(days=5)) == 1
+    assert present(old) == 0
+
+
+def test_stats_endpoint_window(monkeypatch):
+    pytest.importorskip("fakeredis")
+    pytest.importorskip("feast")
+    pytest.importorskip("msgspec")
+    from fastapi.testclient import TestClient
+    import fakes
+
+    fakes.configure_env()
+    from app import main
+
+    calls = []
+
+    def audit_stats(since, until, model_tag=None):
+        calls.append((since, until, model_tag))
+        return {"total": 0, "decisions": {}, "reasons": {}, "latency_ms": {}}
+
+    monkeypatch.setattr(db, "audit_stats", audit_stats)
+    client = TestClient(main.app)
+    body = client.get("/v1/audit/stats", params={"minutes": 15, "model_tag": "m1"}).json()
+    since, until, tag = calls[-1]
+    assert until - since == timedelta(minutes=15) and tag == "m1"
+    assert body["window"]["since"] == since.isoformat() and "query_ms" in body
+
+    r = client.get("/v1/audit/stats", params={"since": "2026-01-02T00:00:00", "until": "2026-01-01T00:00:00"})
+    assert r.status_code == 422
@@ -0,0 +1,44 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+pytest.importorskip("fakeredis")
+pytest.importorskip("feast")
+
+BENCH = os.path.join(os.path.dirname(__file__), "bench", "run_bench.py")
+
+
+def _run(tmp_path, *extra):
+    out = tmp_path / "bench.json"
+    proc = subprocess.run([sys.executable, BENCH, "--requests", "200", "--warmup", "50",
+                           "--concurrency", "1,16", "--out", str(out), *extra],
+                          capture_output=True, text=True, timeout=300)
+    return proc, out
+
+
+def test_bench_reports_stage_percentiles(tmp_path):
+    proc, out = _run(tmp_path)
+    assert proc.returncode == 0, proc.stderr
+    report = json.loads(out.read_text())
+    assert set(report["levels"]) == {"1", "16"}
+    for level in report["levels"].values():
+        assert level["e2e_ms"]["n"] == 200
+        assert level["throughput_rps"] > 0
+        for stage in ("feature", "inference", "policy", "audit"):
+            assert level["stages_ms"][stage]["p99"] >= level["stages_ms"][stage]["p50"]
+    assert report["meta"]["audit_rows"] >= 400
+
+
+def test_bench_flags_regression_against_baseline(tmp_path):
+    proc, out = _run(tmp_path)
+    report = json.loads(out.read_text())
+    for level in report["levels"].values():
+        level["e2e_ms"]["p99"] /= 100
+        level["throughput_rps"] *= 100
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(report))
+    proc, _ = _run(tmp_path, "--baseline", str(baseline), "--max-regression", "0.5")
+    assert proc.returncode == 1
+    assert "REGRESSION" in proc.stderr
@@ -0,0 +1,77 @@
+import os, sys, json
+import pytest
+
+msgspec = pytest.importorskip("msgspec")
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "api"))
+
+from app.codec import MSGPACK, decode_score, respond, wants_msgpack
+from app.schemas import FeatureVector
+
+app = FastAPI()
+
+
+def _echo(payload):
+    # repr keeps int/float, NaN and big ints comparable across both encoders
+    return {"symbol": payload.symbol, "ts_ns": repr(payload.ts_ns),
+            "features": [repr(f) for f in payload.features], "freshness_ms": repr(payload.freshness_ms)}
+
+
+@app.post("/pydantic")
+async def pydantic_route(payload: FeatureVector):
+    return _echo(payload)
+
+
+@app.post("/fast")
+async def fast_route(request: Request):
+    ct = request.headers.get("content-type", "")
+    payload, _ = decode_score(await request.body(), ct)
+    return respond(_echo(payload), wants_msgpack(ct, request.headers.get("accept", "")))
+
+
+client = TestClient(app)
+
+BASE = {"symbol": "BTC", "ts_ns": 1, "features": [0.1] * 8, "freshness_ms": 5}
+
+
+def _bodies():
+    for key, values in {
+        "ts_ns": [1, "1", 1.0, 1.5, True, "abc", None, -1, 2 ** 70, "1e3", " 1", "1_000"],
+        "freshness_ms": [True, "2", 2.0, "2.0", None, 2.5],
+        "symbol": ["BTC\n", "btc", "A" * 15, "A" * 16, "", 1, "BRK.B", "Å"],
+        "features": [[1] * 8, ["1.5"] * 8, [True] * 8, [None] * 8, [0.1] * 7, [0.1] * 64,
+                     [0.1] * 65, ["inf"] * 8, [" 1"] * 8, "x"],
+    }.items():
+        for v in values:
+            yield json.dumps({**BASE, key: v})
+    yield json.dumps({k: v for k, v in BASE.items() if k != "freshness_ms"})
+    yield json.dumps({**BASE, "extra": 1})
+    yield '{"symbol":"BTC","ts_ns":1,"features":[NaN,0,0,0,0,0,0,0]}'
+    yield '{"symbol":"BTC","ts_ns":1,"features":[0,0,0,0,0,0,0,0],"ts_ns":2}'
+    for raw in ("[]", "{}", "null", "{", "", '"BTC"'):
+        yield raw
+
+
+@pytest.mark.parametrize("content_type", [None, "application/json", "application/json; charset=utf-8",
+                                          "application/vnd.te+json", "text/plain"])
+@pytest.mark.parametrize("body", list(_bodies()))
+def test_fast_path_matches_pydantic(body, content_type):
+    headers = {"content-type": content_type} if content_type else {}
+    ref = client.post("/pydantic", content=body, headers=headers)
+    fast = client.post("/fast", content=body, headers=headers)
+    assert fast.status_code == ref.status_code
+    assert fast.json() == ref.json()
+
+
+def test_msgpack_round_trip():
+    body = msgspec.msgpack.encode(BASE)
+    r = client.post("/fast", content=body, headers={"content-type": MSGPACK})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == MSGPACK
+    assert msgspec.msgpack.decode(r.content) == {"symbol": "BTC", "ts_ns": "1", "features": ["0.1"] * 8,
+                                                 "freshness_ms": "5"}
+    bad = msgspec.msgpack.encode({**BASE, "features": [0.1] * 7})
+    assert client.post("/fast", content=bad, headers={"content-type": MSGPACK}).status_code == 422
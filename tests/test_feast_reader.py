@@ -0,0 +1,91 @@
+import os, sys, socket, threading
+from datetime import datetime, timedelta, timezone
+import pytest
+
+pytest.importorskip("feast")
+fakeredis = pytest.importorskip("fakeredis")
+import pandas as pd
+import redis
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "api"))
+sys.path.insert(0, os.path.join(ROOT, "feast_repo"))
+
+from feast import FeatureStore
+from app.feast_reader import FeastRedisReader
+
+SYMBOLS = ["BTC", "ETH", "BRK.B"]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def redis_port():
+    port = _free_port()
+    server = fakeredis.TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    yield port
+    server.shutdown()
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory, redis_port):
+    # Same project/view as feast_repo/, pointed at the throwaway Redis
+    repo = tmp_path_factory.mktemp("feast_repo")
+    (repo / "feature_store.yaml").write_text(
+        "project: trade_eligibility\n"
+        f"registry: {repo / 'registry.db'}\n"
+        "provider: local\n"
+        "online_store:\n"
+        "  type: redis\n"
+        f"  connection_string: \"127.0.0.1:{redis_port},db=0\"\n"
+        "offline_store:\n"
+        "  type: file\n"
+        "entity_key_serialization_version: 2\n"
+    )
+    from entities import symbol
+    from features import microstructure
+    fs = FeatureStore(repo_path=str(repo))
+    fs.apply([symbol, microstructure])
+    now = datetime.now(timezone.utc)
+    fs.write_to_online_store("microstructure", pd.DataFrame({
+        "symbol": SYMBOLS + ["OLD"],
+        "spread_bps": [1.25, 7.5, 3.1, 4.0],
+        "event_timestamp": [now] * len(SYMBOLS) + [now - timedelta(seconds=600)],
+        "created": [now] * (len(SYMBOLS) + 1),
+    }))
+    return fs
+
+
+def test_direct_reader_matches_sdk(store, redis_port):
+    symbols = SYMBOLS + ["MISSING"]
+    sdk = store.get_online_features(
+        entity_rows=[{"symbol": s} for s in symbols],
+        features=["microstructure:spread_bps"],
+    ).to_dict()["spread_bps"]
+    reader = FeastRedisReader.from_store(store)
+    direct = reader.read_many(redis.Redis(port=redis_port), symbols)
+    assert [direct[s] for s in symbols] == pytest.approx(sdk, nan_ok=True)
+    assert direct["MISSING"] is None
+
+
+def test_direct_reader_key_matches_sdk_encoding(store):
+    from feast.infra.online_stores.helpers import _mmh3, _redis_key
+    from feast.protos.feast.types.EntityKey_pb2 import EntityKey
+    from feast.protos.feast.types.Value_pb2 import Value
+    reader = FeastRedisReader.from_store(store)
+    for s in SYMBOLS:
+        ek = EntityKey(join_keys=["symbol"], entity_values=[Value(string_val=s)])
+        assert reader.redis_key(s) == _redis_key(store.project, ek, entity_key_serialization_version=2)
+    assert reader.fields[0] == _mmh3("microstructure:spread_bps")
+
+
+def test_direct_reader_applies_view_ttl(store, redis_port):
+    reader = FeastRedisReader.from_store(store)
+    assert reader.ttl_sec == 120
+    assert reader.read_many(redis.Redis(port=redis_port), ["OLD"])["OLD"] is None
@@ -0,0 +1,54 @@
+import os, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "api"))
+
+from app.feature_cache import FeatureCache, SpreadSubscriber
+
+
+def test_reads_only_fill_the_cache_while_updates_are_pushed():
+    cache = FeatureCache(ttl_sec=30)
+    cache.fill("BTC", 1.0, cache.generation)
+    assert cache.get("BTC") is None  # subscriber not connected yet
+
+    cache.mark_live()
+    gen = cache.generation
+    cache.fill("BTC", 1.0, gen)
+    assert cache.get("BTC") == (1.0, None)
+
+    cache.clear()  # pub/sub dropped
+    cache.fill("BTC", 2.0, gen)
+    cache.fill("BTC", 2.0, cache.generation)
+    assert cache.get("BTC") is None
+
+    # a read that started before a reconnect may predate updates the cache missed
+    cache.mark_live()
+    cache.fill("BTC", 3.0, gen)
+    assert cache.get("BTC") is None
+
+
+def test_a_racing_read_never_overwrites_a_newer_push():
+    cache = FeatureCache(ttl_sec=30)
+    cache.mark_live()
+    gen = cache.generation
+    cache.put("BTC", 2.0, event_ts_ms=2000)
+    cache.fill("BTC", 1.0, gen)  # Redis answered with the value from before the push
+    assert cache.get("BTC") == (2.0, 2000)
+
+    cache.put("BTC", 1.5, event_ts_ms=1500)  # out-of-order publish
+    assert cache.get("BTC") == (2.0, 2000)
+    cache.put("BTC", 3.0, event_ts_ms=3000)
+    assert cache.get("BTC") == (3.0, 3000)
+
+
+def test_pushed_aggregates_follow_the_cached_spread():
+    cache = FeatureCache(ttl_sec=30)
+    sub = SpreadSubscriber(cache, "redis://unused")
+    sub.apply(b'[{"symbol": "BTC", "spread_bps": 2.0, "ts": 2000, "features": {"ewma_spread_bps": 1.9}}]')
+    assert cache.get("BTC") == (2.0, 2000)
+    assert cache.aggregates("BTC") == {"ewma_spread_bps": 1.9}
+
+    sub.apply(b'{"symbol": "BTC", "spread_bps": 1.0, "ts": 1000, "features": {"ewma_spread_bps": 0.5}}')
+    assert cache.aggregates("BTC") == {"ewma_spread_bps": 1.9}  # older event ignored
+    sub.apply(b'{"symbol": "BTC", "spread_bps": 3.0, "ts": 3000}')
+    assert cache.aggregates("BTC") is None and cache.aggregates("ETH") is None
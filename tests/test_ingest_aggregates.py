@@ -0,0 +1,50 @@
+import os, sys, time, tracemalloc, statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services", "ingest"))
+
+from aggregates import BYTES_PER_SYMBOL_BUDGET, RollingAggregates
+
+
+def test_rolling_features():
+    aggs = RollingAggregates(window=4, alpha=0.5)
+    ticks = [(2.0, 0), (4.0, 1000), (6.0, 2000), (8.0, 3000), (10.0, 4000)]
+    for spread, ts in ticks:
+        aggs.update("BTC", spread, ts)
+    f = aggs.features("BTC")
+    window = [4.0, 6.0, 8.0, 10.0]
+    assert f["n"] == 4
+    assert f["spread_bps"] == 10.0
+    assert f["ewma_spread_bps"] == 8.125
+    assert abs(f["vol_bps"] - statistics.pstdev(window)) < 1e-9
+    assert abs(f["zscore"] - (10.0 - 7.0) / statistics.pstdev(window)) < 1e-9
+    assert f["tick_rate_hz"] == 1.0
+    assert aggs.features("ETH") is None
+
+
+def test_symbol_cap_evicts_least_recent():
+    aggs = RollingAggregates(window=8, max_symbols=2)
+    for s in ("A", "B", "A", "C"):
+        aggs.update(s, 1.0, 0)
+    assert len(aggs) == 2
+    assert aggs.features("B") is None and aggs.features("A") is not None
+
+
+def test_memory_budget_and_throughput():
+    # Benchmark: 20k symbols must fit the documented per-symbol budget
+    n_symbols = 20000
+    symbols = [f"S{i:05d}" for i in range(n_symbols)]
+    aggs = RollingAggregates(max_symbols=n_symbols)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for i, s in enumerate(symbols):
+        aggs.update(s, 1.0 + (i % 7), i)
+    per_symbol = (tracemalloc.get_traced_memory()[0] - base) / n_symbols
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    ticks = 200000
+    for i in range(ticks):
+        aggs.update(symbols[i % n_symbols], 1.0 + (i % 11), i)
+    rate = ticks / (time.perf_counter() - t0)
+    print(f"\naggregates: {per_symbol:.0f} B/symbol (budget {BYTES_PER_SYMBOL_BUDGET}), {rate:,.0f} ticks/s")
+    assert per_symbol <= BYTES_PER_SYMBOL_BUDGET
@@ -0,0 +1,92 @@
+import os, sys, signal, importlib.util
+from types import SimpleNamespace
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("kafka")
+pytest.importorskip("orjson")
+
+INGEST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "services", "ingest")
+sys.path.insert(0, INGEST)
+
+# services/api also has an ``app``; load the ingest one under its own name
+_spec = importlib.util.spec_from_file_location("ingest_app", os.path.join(INGEST, "app.py"))
+ingest = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(ingest)
+
+
+class FakeConsumer:
+    """Hands out one poll of ticks, then delivers SIGTERM to the worker's handler."""
+
+    def __init__(self, **kwargs):
+        self.commits = 0
+        self.closed = False
+        self.polls = 0
+
+    def subscribe(self, topics, listener=None):
+        pass
+
+    def poll(self, timeout_ms, max_records):
+        self.polls += 1
+        if self.polls == 1:
+            return {0: [SimpleNamespace(value=b'{"symbol": "BTC", "spread_bps": 2.5, "ts": 1}'),
+                        SimpleNamespace(value=b'{"symbol": "BTC", "spread_bps": 3.5, "ts": 2}')]}
+        signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+        return {}
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        self.closed = True
+
+    def assignment(self):
+        return set()
+
+
+def test_sigterm_flushes_pending_ticks_and_leaves_the_group(monkeypatch):
+    monkeypatch.setattr(ingest, "KafkaConsumer", FakeConsumer)
+    monkeypatch.setattr(ingest, "FLUSH_MS", 60_000)  # only the shutdown flush can write
+    monkeypatch.setattr(ingest.redis, "from_url", lambda *a, **kw: fakeredis.FakeRedis())
+    previous = {s: signal.getsignal(s) for s in (signal.SIGTERM, signal.SIGINT)}
+    worker = ingest.Worker(0)
+    updates = worker.r.pubsub(ignore_subscribe_messages=True)
+    updates.subscribe(ingest.SPREAD_CHANNEL)
+    try:
+        ingest._serve(worker)
+    finally:
+        for s, handler in previous.items():
+            signal.signal(s, handler)
+    assert worker.r.get("te:spread_bps:BTC") == b"3.5"
+    assert worker.consumer.commits == 1 and worker.consumer.closed
+    assert worker.pending_records == 0
+    # the pushed update carries the rolling aggregates for the API's L1 cache
+    msg = next(filter(None, (updates.get_message(timeout=1) for _ in range(3))))
+    [update] = ingest.json.loads(msg["data"])
+    assert update["spread_bps"] == 3.5 and update["features"] == worker.aggs.features("BTC")
+
+
+def test_flush_gives_up_after_retries_and_keeps_ticks_pending(monkeypatch):
+    monkeypatch.setattr(ingest.redis, "from_url", lambda *a, **kw: fakeredis.FakeRedis())
+    monkeypatch.setattr(ingest.time, "sleep", lambda s: None)
+    worker = ingest.Worker(0)
+    worker.consumer = FakeConsumer()
+    worker.coalesce([b'{"symbol": "BTC", "spread_bps": 2.5, "ts": 1}'])
+    worker.pending_records = 1
+    attempts = []
+
+    def redis_down(latest):
+        attempts.append(latest)
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(worker, "write_spreads", redis_down)
+    with pytest.raises(ConnectionError):
+        worker.flush()
+    assert len(attempts) == ingest.FLUSH_RETRIES + 1
+    assert worker.consumer.commits == 0 and worker.pending_records == 1
+
+    # shutting down: one attempt, and close() still leaves the group
+    attempts.clear()
+    worker.stop()
+    worker.close()
+    assert len(attempts) == 1 and worker.consumer.closed and worker.consumer.commits == 0
@@ -0,0 +1,23 @@
+import os, sys
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "api"))
+
+from app.ood import OODGuard
+
+
+def test_repeated_outliers_stay_flagged(tmp_path):
+    guard = OODGuard(min_count=500, path=tmp_path / "ood.npz", snapshot_sec=0)
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        guard.check(rng.normal(size=(64, 8)), "v1")
+    outlier = np.full((16, 8), 10.0)
+    for _ in range(200):
+        assert guard.check(outlier, "v1").all()
+    st = guard._stats[("v1", 8)]
+    assert st.n == 640 and np.all(np.abs(st.mean) < 0.2)
+    # inliers in the same batch are still learned from
+    mixed = np.vstack([rng.normal(size=(4, 8)), outlier[:1]])
+    assert guard.check(mixed, "v1").tolist() == [False] * 4 + [True]
+    assert st.n == 644
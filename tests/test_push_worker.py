@@ -0,0 +1,132 @@
+import os, sys, time, asyncio
+import pytest
+
+pytest.importorskip("fakeredis")
+pytest.importorskip("feast")
+msgspec = pytest.importorskip("msgspec")
+import orjson
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "api"))
+sys.path.insert(0, os.path.join(ROOT, "tests", "bench"))
+
+import fakes
+
+fakes.configure_env()
+from app import main
+from app.push_worker import DECISIONS_TOPIC, MemoryBroker, PushScorer
+
+
+
+@pytest.fixture(scope="module")
+def stub():
+    return fakes.install(main, ["BTC", "ETH"])[0]
+
+
+def _tick(symbol, features, age_ms=0):
+    return orjson.dumps({"symbol": symbol, "ts_ns": time.time_ns() - age_ms * 1_000_000,
+                         "features": features, "freshness_ms": 1000})
+
+
+def _decisions(broker):
+    return [orjson.loads(r.value) for r in broker.topics[DECISIONS_TOPIC]]
+
+
+def test_push_scores_batch_publishes_and_audits(stub):
+    broker, audited = MemoryBroker(), []
+    broker.send("features", _tick("BTC", [3.0] * 8))
+    broker.send("features", _tick("ETH", [-3.0] * 8))
+    broker.send("features", _tick("BTC", [0.0] * 8, age_ms=5000))
+    broker.send("features", _tick("DOGE", [3.0] * 8))
+    broker.send("features", b"not json")
+    scorer = PushScorer(broker, write_audit=audited.extend, batch_max=100)
+    calls0 = stub.calls
+
+    assert asyncio.run(scorer.step()) == 5
+    out = _decisions(broker)
+    assert [d["symbol"] for d in out] == ["BTC", "ETH", "BTC", "DOGE"]
+    assert [d["reason"].split("(")[0] for d in out] == ["ok", "low_conf", "stale_event", "stale_features"]
+    assert out[0]["decision"] == "TRADE" and out[0]["feature_source"] in ("cache", "stream")
+    assert out[2]["feature_source"] is None
+    assert [d["corr_id"] for d in out] == ["features:0:0", "features:0:1", "features:0:2", "features:0:3"]
+    assert [r["corr_id"] for r in audited] == [d["corr_id"] for d in out]
+    assert set(out[0]) >= {"ts", "corr_id", "symbol", "decision", "confidence", "latency_ms", "reason",
+                           "model_tag", "feature_ms", "inference_ms", "policy_ms", "feature_source", "spread_bps"}
+    assert out[0]["spread_bps"] is not None and out[3]["spread_bps"] is None
+    assert stub.calls - calls0 == 1
+    assert broker.committed == 5
+
+
+def test_push_filters_symbols_and_commits_only_after_delivery(stub):
+    broker = MemoryBroker()
+    for _ in range(3):
+        broker.send("features", _tick("BTC", [1.0] * 8))
+    broker.send("features", _tick("ETH", [1.0] * 8))
+    failures = [RuntimeError("db down")]
+
+    def flaky_audit(rows):
+        if failures:
+            raise failures.pop()
+
+    scorer = PushScorer(broker, write_audit=flaky_audit, symbols=["ETH"], batch_max=2)
+    assert asyncio.run(scorer.step()) == 2
+    assert broker.committed == 2 and _decisions(broker) == []
+    assert asyncio.run(scorer.step()) == 2
+    assert [d["symbol"] for d in _decisions(broker)] == ["ETH"]
+    assert broker.committed == 4
+    assert asyncio.run(scorer.step()) == 0
+
+
+def test_failed_step_rewinds_and_rescores(stub, monkeypatch):
+    broker, audited = MemoryBroker(), []
+    broker.send("features", _tick("BTC", [3.0] * 8))
+    broker.send("features", _tick("ETH", [3.0] * 8))
+    scorer = PushScorer(broker, write_audit=audited.extend, batch_max=100)
+    score, failures = scorer.score, [RuntimeError("boom")]
+
+    async def flaky_score(items, corr_ids):
+        if failures:
+            raise failures.pop()
+        return await score(items, corr_ids)
+
+    monkeypatch.setattr(scorer, "score", flaky_score)
+    with pytest.raises(RuntimeError):
+        asyncio.run(scorer.step())
+    assert broker.committed == 0 and broker.position == 0
+    assert asyncio.run(scorer.step()) == 2
+    assert [r["corr_id"] for r in audited] == ["features:0:0", "features:0:1"]
+    assert broker.committed == 2
+
+
+def test_delivery_gives_up_on_stop(stub):
+    broker = MemoryBroker()
+    broker.send("features", _tick("BTC", [3.0] * 8))
+
+    def audit_down(rows):
+        raise RuntimeError("db down")
+
+    scorer = PushScorer(broker, write_audit=audit_down)
+
+    async def run():
+        stop = asyncio.Event()
+        task = asyncio.create_task(scorer.run(stop))
+        await asyncio.sleep(0.3)
+        stop.set()
+        await asyncio.wait_for(task, 2.0)
+
+    asyncio.run(run())
+    assert broker.committed == 0 and broker.position == 0
+
+
+def test_open_inference_breaker_abstains(stub, monkeypatch):
+    from app import push_worker
+    from app.resilience import BreakerOpen
+
+    async def infer_probs(rows):
+        raise BreakerOpen("triton")
+
+    monkeypatch.setattr(push_worker, "infer_probs", infer_probs)
+    broker, audited = MemoryBroker(), []
+    broker.send("features", _tick("BTC", [3.0] * 8))
+    asyncio.run(PushScorer(broker, write_audit=audited.extend).step())
+    assert [(r["reason"], r["inference_ms"]) for r in audited] == [("breaker_open_inference", None)]
@@ -0,0 +1,99 @@
+import os, sys
+import pytest
+
+np = pytest.importorskip("numpy")
+pa = pytest.importorskip("pyarrow")
+pytest.importorskip("onnxruntime")
+import pyarrow.parquet as pq
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "api"))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+from app.guardrails import DECISIONS, REASONS, decide, decide_batch
+import replay
+
+
+def test_decide_batch_matches_decide():
+    rng = np.random.default_rng(7)
+    spread = np.r_[rng.uniform(0, 10, 2000), 5.0, 5.0, np.nan]
+    prob = np.r_[rng.uniform(0, 1, 2000), 0.62, 0.61, 0.9].astype(np.float32)
+    codes = decide_batch(spread, prob)
+    for s, p, c in zip(spread, prob, codes):
+        decision, _, reason = decide(s, p)
+        assert (DECISIONS[c], REASONS[c]) == (decision, reason)
+
+
+def test_replay_parquet_end_to_end(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 5000
+    t0 = 1_700_000_000_000_000_000
+    spreads = pa.table({
+        "symbol": ["AAA", "BBB"],
+        "event_timestamp": pa.array([t0, t0], pa.timestamp("ns", tz="UTC")),
+        "spread_bps": [2.0, 8.0],
+    })
+    pq.write_table(spreads, tmp_path / "spreads.parquet")
+    # CCC has no spread at all; the last 100 rows are past the spread TTL
+    ts = np.r_[np.full(n - 100, t0 + 1_000_000_000), np.full(100, t0 + 300 * 1_000_000_000)]
+    feats = rng.normal(0, 1, (n, 8)).astype(np.float32)
+    ticks = pa.table({
+        "symbol": rng.choice(["AAA", "BBB", "CCC"], n),
+        "ts_ns": ts,
+        "features": pa.array(list(feats), pa.list_(pa.float32())),
+    })
+    pq.write_table(ticks, tmp_path / "ticks.parquet")
+
+    out = tmp_path / "out"
+    summary = replay.replay(replay.parse_args([
+        "--input", str(tmp_path / "ticks.parquet"), "--spreads", str(tmp_path / "spreads.parquet"),
+        "--out", str(out), "--chunk-rows", "700", "--threads", "1",
+    ]))
+    assert summary["rows"] == n
+
+    counts = pq.read_table(out / "decision_counts.parquet").to_pylist()
+    versions = {r["version"] for r in counts}
+    assert len(versions) >= 1
+    for v in versions:
+        assert sum(r["rows"] for r in counts if r["version"] == v) == n
+    by = lambda sym, reason: sum(r["rows"] for r in counts if r["symbol"] == sym and r["reason"] == reason)
+    syms = ticks.column("symbol").to_numpy(zero_copy_only=False)
+    stale = (syms == "CCC") | (ts > t0 + 120 * 1_000_000_000)
+    for v in versions:
+        assert sum(r["rows"] for r in counts if r["version"] == v and r["reason"] == "stale_features") == stale.sum()
+    assert by("AAA", "wide_spread") == 0 and by("BBB", "ok") == 0
+
+    hist = pq.read_table(out / "prob_hist.parquet").to_pylist()
+    assert sum(r["rows"] for r in hist) == n * len(versions)
+    disagreement = pq.read_table(out / "disagreement.parquet").to_pylist()
+    assert sum(r["rows"] for r in disagreement) == n * (len(versions) - 1)
+
+
+def test_replay_postgres_end_to_end(tmp_path, monkeypatch):
+    pgserver = pytest.importorskip("pgserver")
+    import psycopg
+    server = pgserver.get_server(str(tmp_path / "pgdata"), cleanup_mode="stop")
+    with psycopg.connect(server.get_uri()) as conn:
+        conn.execute((replay.ROOT / "sql" / "create_audit_schema.sql").read_text())
+        conn.cursor().executemany(
+            "INSERT INTO audit.decisions (ts, corr_id, symbol, decision, confidence, reason, spread_bps)"
+            " VALUES (now(), %s, 'AAA', %s, %s, %s, %s)",
+            [("a", "TRADE", 0.9, "ok", 2.0), ("b", "ABSTAIN", 0.3, "low_conf", 2.0),
+             ("c", "NO_TRADE", 0.9, "wide_spread", 8.0),
+             # recorded before spread_bps was: the reason settles the spread check, or nothing does
+             ("d", "NO_TRADE", 0.9, "wide_spread", None), ("e", "ABSTAIN", 0.3, "low_conf", None),
+             # never reached the policy
+             ("f", "ABSTAIN", 0.0, "deadline_inference", 2.0), ("g", "ABSTAIN", 0.0, "breaker_open_features", None),
+             ("h", "ABSTAIN", 0.0, "stale_event(age_ms=900)", None)])
+    for key, value in {"POSTGRES_HOST": str(tmp_path / "pgdata"), "POSTGRES_DB": "postgres",
+                       "POSTGRES_USER": "postgres", "POSTGRES_PASSWORD": ""}.items():
+        monkeypatch.setenv(key, value)
+
+    def run(*extra):
+        summary = replay.replay(replay.parse_args(["--input", "postgres", "--out", str(tmp_path / "out"), *extra]))
+        return summary["rows"], summary["versions"]["recorded"]
+
+    assert run() == (5, {"TRADE:ok": 1, "ABSTAIN:low_conf": 2, "NO_TRADE:wide_spread": 2})
+    # lower the confidence bar: b now trades, e has no spread to check
+    assert run("--conf-thresh", "0.2") == (5, {"TRADE:ok": 2, "NO_TRADE:wide_spread": 2,
+                                               "ABSTAIN:stale_features": 1})
@@ -0,0 +1,185 @@
+import os, sys, time, asyncio
+import pytest
+
+pytest.importorskip("fakeredis")
+pytest.importorskip("feast")
+pytest.importorskip("msgspec")
+from fastapi.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "api"))
+sys.path.insert(0, os.path.join(ROOT, "tests", "bench"))
+
+import fakes
+
+fakes.configure_env()
+from app import main
+from app import features, resilience
+from app.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, Deadline
+
+
+@pytest.fixture(scope="module")
+def installed():
+    return fakes.install(main, ["BTC"])
+
+
+@pytest.fixture(scope="module")
+def stub(installed):
+    return installed[0]
+
+
+@pytest.fixture(scope="module")
+def sink(installed):
+    return installed[1]
+
+
+@pytest.fixture(scope="module")
+def client(stub):
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(autouse=True)
+def healthy(stub, monkeypatch):
+    # app.main may already be imported with other settings: every call goes straight to the backend
+    monkeypatch.setattr(main.batcher, "window_s", 0)
+    yield
+    stub.latency_s, stub.status = 0.0005, 200
+    main.inference_breaker.reset()
+
+
+def _body(**kw):
+    return {"symbol": "BTC", "ts_ns": time.time_ns(), "freshness_ms": 60_000, "features": [1.0] * 8, **kw}
+
+
+def test_breaker_trips_on_errors_and_slow_calls_then_probes_half_open():
+    cb = CircuitBreaker("t", slow_ms=10, window=10, min_calls=4, error_rate=0.5, slow_rate=0.75,
+                        open_sec=0.05, probes=2)
+    for ok in (True, False, True, False):
+        assert cb.acquire()
+        cb.record(ok, 1)
+    assert cb.state == OPEN and not cb.acquire()
+
+    time.sleep(0.06)
+    assert cb.acquire() and cb.acquire() and not cb.acquire()  # two probes only
+    assert cb.state == HALF_OPEN
+    cb.record(True, 1)
+    cb.record(True, 1)
+    assert cb.state == CLOSED
+
+    for _ in range(3):
+        cb.record(True, 50)
+    assert cb.state == CLOSED
+    cb.record(True, 50)
+    assert cb.state == OPEN
+
+    time.sleep(0.06)
+    assert cb.acquire()
+    cb.record(True, 50)  # a slow probe reopens
+    assert cb.state == OPEN
+
+
+def test_deadline_header_is_capped_and_falls_back_to_config():
+    t0 = time.perf_counter()
+    assert Deadline.from_header("5", start=t0).at == pytest.approx(t0 + 0.005)
+    assert Deadline.from_header("1e9", start=t0).at == pytest.approx(t0 + resilience.REQUEST_DEADLINE_MAX_MS / 1000)
+    assert Deadline.from_header("soon", start=t0).at == pytest.approx(t0 + resilience.REQUEST_DEADLINE_MS / 1000)
+    for value in ("nan", "inf", "-inf"):
+        assert Deadline.from_header(value, start=t0).at == pytest.approx(t0 + resilience.REQUEST_DEADLINE_MS / 1000)
+
+
+def test_non_finite_deadline_header_still_times_out_the_batch(client, stub):
+    stub.latency_s = 0.5
+    t0 = time.perf_counter()
+    r = client.post("/v1/score:batch", json={"items": [_body(), _body()]}, headers={"x-deadline-ms": "nan"})
+    assert [x["reason"] for x in r.json()["results"]] == ["deadline_inference"] * 2
+    assert time.perf_counter() - t0 < 0.3
+
+
+def test_slow_inference_abstains_at_the_request_deadline(client, stub):
+    stub.latency_s = 0.5
+    t0 = time.perf_counter()
+    r = client.post("/v1/score", json=_body(), headers={"x-deadline-ms": "30"})
+    assert r.json()["reason"] == "deadline_inference"
+    assert time.perf_counter() - t0 < 0.3
+    r = client.post("/v1/score", json=_body(), headers={"x-deadline-ms": "0"})
+    assert r.json()["reason"] == "deadline_features"
+
+
+def test_timed_out_batch_chunks_are_audited_with_inference_time(client, stub, sink):
+    stub.latency_s = 0.5
+    r = client.post("/v1/score:batch", json={"items": [_body(), _body()]},
+                    headers={"x-deadline-ms": "40", "x-corr-id": "slow-batch"})
+    assert [x["reason"] for x in r.json()["results"]] == ["deadline_inference"] * 2
+    for _ in range(100):
+        rows = [row for row in sink.rows if row["corr_id"].startswith("slow-batch:")]
+        if len(rows) == 2:
+            break
+        time.sleep(0.01)
+    assert all(row["inference_ms"] is not None and row["inference_ms"] > 0 for row in rows)
+    assert all(row["policy_ms"] is None for row in rows)
+
+
+def test_failing_triton_opens_the_breaker(client, stub, monkeypatch):
+    monkeypatch.setattr(main.inference_breaker, "min_calls", 5)
+    stub.status = 500
+    reasons = [client.post("/v1/score", json=_body()).json()["reason"] for _ in range(8)]
+    assert reasons[:5] == ["infer_error"] * 5
+    assert set(reasons[5:]) == {"breaker_open_inference"}
+    calls = stub.calls
+    r = client.post("/v1/score:batch", json={"items": [_body(), _body()]})
+    assert [x["reason"] for x in r.json()["results"]] == ["breaker_open_inference"] * 2
+    assert stub.calls == calls
+    metrics = client.get("/metrics").text
+    assert 'circuit_breaker_state{breaker="inference@1"} 2.0' in metrics
+    assert 'fallback_total{reason="breaker_open_inference"}' in metrics
+
+
+def test_calls_cut_off_by_the_deadline_open_the_breaker(client, stub, monkeypatch):
+    monkeypatch.setattr(main.inference_breaker, "min_calls", 5)
+    stub.latency_s = 0.5
+    # the budget is below INFERENCE_SLOW_MS, so only counting the cut-off as slow can trip it
+    reasons = [client.post("/v1/score", json=_body(), headers={"x-deadline-ms": "15"}).json()["reason"]
+               for _ in range(7)]
+    assert reasons[:5] == ["deadline_inference"] * 5
+    assert set(reasons[5:]) == {"breaker_open_inference"}
+
+
+def test_only_a_lost_hedge_is_not_held_against_the_breaker():
+    async def cancelled(msg):
+        cb = CircuitBreaker("hedge", slow_ms=1000, min_calls=1, slow_rate=1.0)
+        task = asyncio.ensure_future(features._guarded(cb, lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0.001)
+        task.cancel(msg)
+        await asyncio.gather(task, return_exceptions=True)
+        return cb.state
+
+    assert asyncio.run(cancelled(features.HEDGE_LOST)) == CLOSED
+    assert asyncio.run(cancelled(None)) == OPEN
+
+
+def test_feature_abstains_are_audited_before_and_after_the_lookup(client, sink, monkeypatch):
+    async def timed_out(symbol, deadline_ms):
+        await asyncio.sleep(deadline_ms / 1000)
+        return None, "timeout"
+
+    monkeypatch.setattr(main, "fetch_spread_bps", timed_out)
+    client.post("/v1/score", json=_body(), headers={"x-deadline-ms": "0", "x-corr-id": "before"})
+    client.post("/v1/score", json=_body(), headers={"x-deadline-ms": "15", "x-corr-id": "after"})
+    for _ in range(100):
+        rows = {r["corr_id"]: r for r in sink.rows if r["corr_id"] in ("before", "after")}
+        if len(rows) == 2:
+            break
+        time.sleep(0.01)
+    assert rows["before"]["reason"] == "deadline_features" and rows["before"]["feature_ms"] is None
+    assert rows["after"]["inference_ms"] is None and rows["after"]["policy_ms"] is None
+    assert rows["after"]["reason"] == "deadline_features" and rows["after"]["feature_ms"] >= 5
+
+
+def test_requests_over_the_inflight_limit_are_shed(client, monkeypatch):
+    monkeypatch.setattr(main.limiter, "limit", 1)
+    monkeypatch.setattr(main.limiter, "inflight", 1)
+    assert client.post("/v1/score", json=_body()).json()["reason"] == "shed"
+    r = client.post("/v1/score:batch", json={"items": [_body()]})
+    assert r.json()["results"][0]["reason"] == "shed"
+    assert 'requests_shed_total{route="/v1/score"}' in client.get("/metrics").text
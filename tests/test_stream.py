@@ -0,0 +1,85 @@
+import os, sys, time
+import pytest
+
+pytest.importorskip("fakeredis")
+pytest.importorskip("feast")
+msgspec = pytest.importorskip("msgspec")
+from fastapi.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "api"))
+sys.path.insert(0, os.path.join(ROOT, "tests", "bench"))
+
+import fakes
+
+fakes.configure_env(microbatch_window_us=2000)
+from app import main
+
+SYMBOLS = ["BTC", "ETH"]
+
+
+def _frame(i, **kw):
+    return {"id": i, "symbol": SYMBOLS[i % 2], "ts_ns": time.time_ns(), "freshness_ms": 60_000,
+            "features": [0.1 * (i % 7)] * 8, **kw}
+
+
+@pytest.fixture(scope="module")
+def stub():
+    return fakes.install(main, SYMBOLS, infer_latency_ms=2)[0]
+
+
+@pytest.fixture(scope="module")
+def client(stub):
+    with TestClient(main.app) as c:
+        yield c
+
+
+def test_stream_scores_frames_and_batches_them(client, stub):
+    calls0 = stub.calls
+    with client.websocket_connect("/v1/score/stream", headers={"x-corr-id": "conn"}) as ws:
+        for i in range(40):
+            ws.send_json(_frame(i))
+        replies = [ws.receive_json() for _ in range(40)]
+    assert sorted(r["id"] for r in replies) == list(range(40))
+    assert all(r["decision"] in ("TRADE", "NO_TRADE", "ABSTAIN") for r in replies)
+    assert {r["corr_id"] for r in replies} == {f"conn:{i}" for i in range(40)}
+    assert stub.calls - calls0 < 40
+
+
+def test_stream_rejects_invalid_frames_and_keeps_going(client):
+    with client.websocket_connect("/v1/score/stream") as ws:
+        ws.send_json(_frame(1, features=[0.1] * 7))
+        err = ws.receive_json()
+        assert err["id"] == 1 and err["error"] == "invalid_frame"
+        assert err["detail"][0]["loc"] == ["features"]
+        ws.send_text("{")
+        assert ws.receive_json()["error"] == "invalid_frame"
+        ws.send_json(_frame(2))
+        assert ws.receive_json()["id"] == 2
+
+
+def test_stream_msgpack_frames(client):
+    with client.websocket_connect("/v1/score/stream") as ws:
+        ws.send_bytes(msgspec.msgpack.encode(_frame(3)))
+        reply = msgspec.msgpack.decode(ws.receive_bytes())
+    assert reply["id"] == 3 and "decision" in reply
+
+
+def test_stream_caps_inflight_frames(client, stub, monkeypatch):
+    monkeypatch.setattr(main, "WS_MAX_INFLIGHT", 3)
+    stub.max_rows = 0
+    with client.websocket_connect("/v1/score/stream") as ws:
+        for i in range(30):
+            ws.send_json(_frame(i))
+        assert len([ws.receive_json() for _ in range(30)]) == 30
+    assert 1 <= stub.max_rows <= 3
+
+
+def test_scored_replies_carry_pushed_aggregates(client, monkeypatch):
+    monkeypatch.setattr(main, "FEATURE_CACHE_ENABLED", True)
+    main.feature_cache.put("BTC", 2.0, time.time_ns() // 1_000_000, aggregates={"ewma_spread_bps": 1.9})
+    with client.websocket_connect("/v1/score/stream") as ws:
+        ws.send_json(_frame(0, features=[3.0] * 8))
+        assert ws.receive_json()["stream_features"] == {"ewma_spread_bps": 1.9}
+    r = client.post("/v1/score:batch", json={"items": [_frame(0, features=[3.0] * 8), _frame(1, features=[3.0] * 8)]})
+    assert [x.get("stream_features") for x in r.json()["results"]] == [{"ewma_spread_bps": 1.9}, None]
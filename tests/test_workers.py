@@ -0,0 +1,78 @@
+import os, sys, asyncio, subprocess, textwrap
+import pytest
+
+pytest.importorskip("fakeredis")
+pytest.importorskip("feast")
+pytest.importorskip("msgspec")
+from fastapi.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "services", "api"))
+sys.path.insert(0, os.path.join(ROOT, "tests", "bench"))
+
+import fakes
+
+fakes.configure_env()
+from app import main
+from app.warmup import WARMUP_BATCH_SIZES, Warmup
+
+
+@pytest.fixture(scope="module")
+def stub():
+    return fakes.install(main, ["BTC"])[0]
+
+
+def test_startup_warms_every_batch_size_before_ready(stub):
+    stub.max_rows = 0
+    with TestClient(main.app) as client:
+        r = client.get("/readyz")
+        assert r.status_code == 200
+        assert r.json()["steps"]["inference"] and r.json()["steps"]["features"]
+    assert stub.max_rows == max(WARMUP_BATCH_SIZES)
+
+
+def test_warmup_retries_required_steps_and_ignores_optional_ones():
+    attempts = {"flaky": 0}
+
+    async def flaky():
+        attempts["flaky"] += 1
+        if attempts["flaky"] < 3:
+            raise ConnectionError("down")
+
+    async def broken():
+        raise ConnectionError("still down")
+
+    async def run():
+        w = Warmup({"flaky": flaky, "broken": broken}, required=("flaky",), retry_sec=0.01)
+        w.start()
+        assert not w.ready
+        assert await w.wait(2)
+        status = w.status()
+        await w.stop()
+        return status
+
+    status = asyncio.run(run())
+    assert attempts["flaky"] == 3
+    assert status["steps"] == {"flaky": True, "broken": False}
+    assert "still down" in status["errors"]["broken"]
+
+
+def test_metrics_are_merged_across_worker_processes(tmp_path):
+    script = textwrap.dedent(f"""
+        import os, sys
+        sys.path[:0] = [{os.path.join(ROOT, "services", "api")!r}, {os.path.join(ROOT, "tests", "bench")!r}]
+        import fakes
+        fakes.configure_env()
+        from app import main
+        for _ in range(int(sys.argv[1])):
+            main.REQS.labels(route="/v1/score", status="200").inc()
+        if sys.argv[1] == "0":
+            from prometheus_client import generate_latest
+            sys.stdout.write(generate_latest(main._registry()).decode())
+    """)
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    for n in ("2", "3"):
+        subprocess.run([sys.executable, "-c", script, n], env=env, check=True, timeout=120)
+    out = subprocess.run([sys.executable, "-c", script, "0"], env=env, check=True, timeout=120,
+                         capture_output=True, text=True).stdout
+    assert 'requests_total{route="/v1/score",status="200"} 5.0' in out